@@ -1,10 +1,14 @@
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 import json
 import os
+import asyncio
 from gpt_researcher.utils.websocket_manager import WebSocketManager
+from gpt_researcher.utils.tracing import start_trace
+from gpt_researcher.utils.metrics import REGISTRY, monitor_event_loop_lag
 from .utils import write_md_to_pdf
 
 
@@ -31,11 +35,22 @@ def startup_event():
         os.makedirs("outputs")
     app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
 
+
+@app.on_event("startup")
+async def start_event_loop_monitor():
+    app.state.event_loop_monitor = asyncio.create_task(monitor_event_loop_lag())
+
+
 @app.get("/")
 async def read_root(request: Request):
     return templates.TemplateResponse('index.html', {"request": request, "report": None})
 
 
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
@@ -46,9 +61,12 @@ async def websocket_endpoint(websocket: WebSocket):
                 json_data = json.loads(data[6:])
                 task = json_data.get("task")
                 report_type = json_data.get("report_type")
+                run_id = json_data.get("run_id")
                 if task and report_type:
-                    report = await manager.start_streaming(task, report_type, websocket)
-                    path = await write_md_to_pdf(report)
+                    with start_trace("research.request", manager.trace_dir, manager.tracing, task=task,
+                                     report_type=report_type):
+                        report = await manager.start_streaming(task, report_type, websocket, run_id)
+                        path = await write_md_to_pdf(report)
                     await websocket.send_json({"type": "path", "output": path})
                 else:
                     print("Error: not enough parameters provided.")
@@ -1,7 +1,9 @@
 import aiofiles
+import os
 import urllib
 import uuid
 from md2pdf.core import md2pdf
+from gpt_researcher.utils.tracing import span
 
 async def write_to_file(filename: str, text: str) -> None:
     """Asynchronously write text to a file in UTF-8 encoding.
@@ -27,18 +29,21 @@ async def write_md_to_pdf(text: str) -> str:
     """
     task = uuid.uuid4().hex
     file_path = f"outputs/{task}"
-    await write_to_file(f"{file_path}.md", text)
-
-    try:
-        md2pdf(f"{file_path}.pdf",
-               md_content=None,
-               md_file_path=f"{file_path}.md",
-               css_file_path=None,
-               base_url=None)
-        print(f"Report written to {file_path}.pdf")
-    except Exception as e:
-        print(f"Error in converting Markdown to PDF: {e}")
-        return ""
+    with span("report.pdf", path=f"{file_path}.pdf", chars=len(text)) as pdf_span:
+        await write_to_file(f"{file_path}.md", text)
+
+        try:
+            md2pdf(f"{file_path}.pdf",
+                   md_content=None,
+                   md_file_path=f"{file_path}.md",
+                   css_file_path=None,
+                   base_url=None)
+            pdf_span.set(bytes=os.path.getsize(f"{file_path}.pdf"))
+            print(f"Report written to {file_path}.pdf")
+        except Exception as e:
+            pdf_span.set(error=str(e))
+            print(f"Error in converting Markdown to PDF: {e}")
+            return ""
 
     encoded_file_path = urllib.parse.quote(f"{file_path}.pdf")
     return encoded_file_path
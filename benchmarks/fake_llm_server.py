@@ -0,0 +1,112 @@
+# Fake OpenAI-compatible chat completions server for offline benchmarks
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from fixture_server import WORDS
+
+ASPECTS = ("outlook", "risks", "history", "comparison", "data", "expert opinions")
+
+
+def complete(messages: list, completion_tokens: int) -> str:
+    """Answers a request deterministically, in the format each gpt-researcher prompt asks for"""
+    text = messages[-1]["content"]
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    if text.startswith("task:"):
+        return json.dumps({"server": "📊 Benchmark Agent",
+                           "agent_role_prompt": "You are a benchmark research assistant writing objective reports."})
+    if "google search queries" in text:
+        count = int(re.search(r"Write (\d+) google search queries", text).group(1))
+        question = re.findall(r'Task or question: "(.*)"', text)[-1]
+        return json.dumps([f"{question} {aspect}" for aspect in rng.sample(ASPECTS, min(count, len(ASPECTS)))])
+    if "plan the sections" in text:
+        titles = ["Introduction", "Background", "Key findings", "Analysis", "Conclusion"]
+        return json.dumps({"title": "Benchmark report",
+                           "sections": [{"title": title, "description": f"The {title.lower()}"} for title in titles]})
+    if "JSON object mapping the url" in text:
+        urls = re.findall(r'<source url="([^"]+)">', text)
+        return json.dumps({url: " ".join(rng.choice(WORDS) for _ in range(completion_tokens // max(len(urls), 1)))
+                           for url in urls})
+    words = [rng.choice(WORDS) for _ in range(completion_tokens)]
+    # Paragraph breaks, so that streamed reports are flushed paragraph by paragraph
+    return " ".join(word + ("\n" if i % 40 == 39 else "") for i, word in enumerate(words))
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Serves POST /v1/chat/completions, streamed or not, at the token throughput of the server options"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        options = self.server.options
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self.respond(404, {"error": {"message": "Not found"}})
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        completion_tokens = min(request.get("max_tokens") or options.completion_tokens, options.completion_tokens)
+        content = complete(request["messages"], completion_tokens)
+        tokens = content.split(" ")
+        prompt_tokens = sum(len(message["content"]) for message in request["messages"]) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        created, model = int(time.time()), request.get("model", "fake")
+        time.sleep(options.ttft)
+
+        if not request.get("stream"):
+            time.sleep(len(tokens) / options.tokens_per_second)
+            return self.respond(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            time.sleep(1 / options.tokens_per_second)
+            delta = {"content": token if i == 0 else " " + token}
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        done = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.close_connection = True
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8902)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds to the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="completion token throughput")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="maximum completion tokens")
+    return parser.parse_args(args)
+
+
+def serve(options):
+    server = ThreadingHTTPServer((options.host, options.port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.options = options
+    print(f"Fake LLM server listening on http://{options.host}:{server.server_port}/v1", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve(parse_args())
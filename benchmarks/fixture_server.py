@@ -0,0 +1,126 @@
+# Fixture web server for offline benchmarks: a generated corpus of HTML and PDF pages, and a search endpoint
+import json
+import time
+import random
+import hashlib
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+WORDS = ("market revenue growth forecast analyst earnings quarter margin product demand supply chain risk "
+         "regulation investment capital share price valuation competitor strategy customer innovation research "
+         "study data survey evidence trend policy energy climate health technology software hardware network "
+         "security privacy model training inference cost latency throughput scale adoption").split()
+
+
+def page_text(page: int, paragraphs: int, words_per_paragraph: int) -> list:
+    """Generates the deterministic paragraphs of a fixture page"""
+    rng = random.Random(page)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_paragraph)).capitalize() + "."
+            for _ in range(paragraphs)]
+
+
+def render_html(page: int, paragraphs: int, words_per_paragraph: int) -> bytes:
+    body = "".join(f"<p>{paragraph}</p>\n" for paragraph in page_text(page, paragraphs, words_per_paragraph))
+    return (f"<html><head><title>Fixture page {page}</title><style>p {{margin: 0}}</style>"
+            f"<script>var page = {page};</script></head>"
+            f"<body><h1>Fixture page {page}</h1>\n{body}</body></html>").encode("utf-8")
+
+
+def render_pdf(page: int, paragraphs: int, words_per_paragraph: int) -> bytes:
+    """Renders the paragraphs of a fixture page as a minimal single-page PDF"""
+    lines = []
+    for paragraph in page_text(page, paragraphs, words_per_paragraph):
+        words = paragraph.split()
+        lines += [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+    text = "".join(f"({line}) Tj T* " for line in lines[:60])
+    stream = f"BT /F1 9 Tf 11 TL 36 800 Td {text}ET".encode("latin-1")
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+               b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents 4 0 R "
+               b"/Resources << /Font << /F1 5 0 R >> >> >>",
+               b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pdf, offsets = b"%PDF-1.4\n", []
+    for number, content in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + content + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves /search, /pages/<n>.html and /docs/<n>.pdf with the latency and errors of the server options"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        options = self.server.options
+        parts = urlsplit(self.path)
+        rng = random.Random()
+        time.sleep(max(options.latency + rng.uniform(-options.jitter, options.jitter), 0))
+        if parts.path != "/search":
+            if rng.random() < options.timeout_rate:
+                time.sleep(options.timeout_seconds)
+            if rng.random() < options.error_rate:
+                return self.respond(500, b"Injected error", "text/plain")
+
+        if parts.path == "/search":
+            query = parse_qs(parts.query).get("q", [""])[0]
+            count = int(parse_qs(parts.query).get("n", ["5"])[0])
+            # Every query maps to a deterministic set of pages, some of them shared with other queries
+            seed = int(hashlib.sha256(query.encode("utf-8")).hexdigest(), 16)
+            pages = random.Random(seed).sample(range(options.pages), min(count, options.pages))
+            base = f"http://{self.headers.get('Host')}"
+            results = [{"href": f"{base}/docs/{page}.pdf" if page % options.pdf_every == 0
+                        else f"{base}/pages/{page}.html",
+                        "body": page_text(page, 1, options.words)[0]} for page in pages]
+            return self.respond(200, json.dumps(results).encode("utf-8"), "application/json")
+        name, _, extension = parts.path.rpartition("/")[2].partition(".")
+        if not name.isdigit() or int(name) >= options.pages:
+            return self.respond(404, b"Not found", "text/plain")
+        if parts.path.startswith("/pages/") and extension == "html":
+            return self.respond(200, render_html(int(name), options.paragraphs, options.words), "text/html")
+        if parts.path.startswith("/docs/") and extension == "pdf":
+            return self.respond(200, render_pdf(int(name), options.paragraphs, options.words), "application/pdf")
+        return self.respond(404, b"Not found", "text/plain")
+
+    def respond(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Fixture web server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--pages", type=int, default=200, help="number of pages in the corpus")
+    parser.add_argument("--paragraphs", type=int, default=30, help="paragraphs per page")
+    parser.add_argument("--words", type=int, default=60, help="words per paragraph")
+    parser.add_argument("--pdf-every", type=int, default=10, help="every n-th page is served as a PDF")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.02, help="random +/- seconds of latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of page requests failing with 500")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of page requests hanging")
+    parser.add_argument("--timeout-seconds", type=float, default=5.0, help="how long hanging requests hang")
+    return parser.parse_args(args)
+
+
+def serve(options):
+    server = ThreadingHTTPServer((options.host, options.port), FixtureHandler)
+    server.daemon_threads = True
+    server.options = options
+    print(f"Fixture server listening on http://{options.host}:{server.server_port}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve(parse_args())
@@ -0,0 +1,259 @@
+# Load test of the websocket server: concurrent research sessions on an arrival schedule, at growing concurrency
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+import websockets
+
+from run_benchmark import REPO_DIR, start_server
+
+LAG_METRIC = "gpt_researcher_event_loop_lag_seconds"
+
+
+def percentile(samples, q: float):
+    """Gets the q quantile of the samples by nearest rank, None without samples"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 4)
+
+
+def distribution(samples) -> dict:
+    return {"p50": percentile(samples, 0.5), "p90": percentile(samples, 0.9), "p95": percentile(samples, 0.95),
+            "p99": percentile(samples, 0.99), "max": round(max(samples), 4) if samples else None}
+
+
+def fetch(url: str, timeout: float = 10) -> str:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+
+def lag_histogram(metrics: str) -> dict:
+    """Parses the cumulative buckets, sum and count of the event loop lag histogram from the /metrics text"""
+    histogram = {"buckets": {}, "sum": 0.0, "count": 0}
+    for line in metrics.splitlines():
+        if line.startswith(f"{LAG_METRIC}_bucket"):
+            bound = line.split('le="')[1].split('"')[0]
+            histogram["buckets"][float(bound)] = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{LAG_METRIC}_sum"):
+            histogram["sum"] = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{LAG_METRIC}_count"):
+            histogram["count"] = float(line.rsplit(" ", 1)[1])
+    return histogram
+
+
+def lag_summary(before: dict, after: dict) -> dict:
+    """Summarizes the event loop lag observed between two scrapes, quantiles being bucket upper bounds"""
+    count = after["count"] - before["count"]
+    if count <= 0:
+        return {"samples": 0}
+    buckets = sorted((bound, after["buckets"][bound] - before["buckets"].get(bound, 0.0))
+                     for bound in after["buckets"])
+
+    def upper_bound(q):
+        return next(bound for bound, cumulative in buckets if cumulative >= q * count)
+
+    return {"samples": int(count), "mean": round((after["sum"] - before["sum"]) / count, 4),
+            "p50_le": upper_bound(0.5), "p99_le": upper_bound(0.99)}
+
+
+def arrival_offsets(clients: int, arrival: str, rate: float, rng: random.Random) -> list:
+    """Gets the seconds after the start of a step at which each client sends its start payload"""
+    if arrival == "burst":
+        return [0.0] * clients
+    if arrival == "uniform":
+        return [i / rate for i in range(clients)]
+    offsets, offset = [], 0.0
+    for _ in range(clients):
+        offsets.append(offset)
+        offset += rng.expovariate(rate)
+    return offsets
+
+
+async def run_client(ws_url: str, payload: dict, offset: float, timeout: float) -> dict:
+    """Runs one research session, timing its first log, first report token and completion from the start payload"""
+    await asyncio.sleep(offset)
+    result = {"offset": round(offset, 3), "error": None}
+    try:
+        async with websockets.connect(ws_url, max_size=None, open_timeout=timeout) as ws:
+            sent = time.perf_counter()
+            await ws.send(f"start {json.dumps(payload)}")
+
+            async def receive():
+                async for message in ws:
+                    data = json.loads(message)
+                    elapsed = time.perf_counter() - sent
+                    if data.get("type") == "logs":
+                        result.setdefault("first_log", elapsed)
+                    elif data.get("type") == "report":
+                        result.setdefault("first_report", elapsed)
+                    elif data.get("type") == "path":
+                        result["completion"] = elapsed
+                        return
+
+            await asyncio.wait_for(receive(), timeout)
+            if "completion" not in result:
+                result["error"] = "closed before completion"
+    except asyncio.TimeoutError:
+        result["error"] = "timeout"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def probe_latency(metrics_url: str, interval: float, stop: asyncio.Event, samples: list) -> None:
+    """Times GET /metrics while a step runs, the responsiveness of the server as other clients see it"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(fetch, metrics_url)
+            samples.append(time.perf_counter() - start)
+        except Exception:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def run_step(args, base_url: str, clients: int, step: int, rng: random.Random) -> dict:
+    ws_url = base_url.replace("http", "ws", 1) + "/ws"
+    metrics_url = base_url + "/metrics"
+    offsets = arrival_offsets(clients, args.arrival, args.rate, rng)
+    payloads = [{"task": args.task if args.same_task else f"{args.task} (session {step}.{i})",
+                 "report_type": args.report_type, "agent": "Auto Agent"} for i in range(clients)]
+    lag_before = lag_histogram(await asyncio.to_thread(fetch, metrics_url))
+    stop, probes = asyncio.Event(), []
+    prober = asyncio.create_task(probe_latency(metrics_url, args.probe_interval, stop, probes))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_client(ws_url, payload, offset, args.timeout)
+                                     for payload, offset in zip(payloads, offsets)))
+    duration = time.perf_counter() - start
+    stop.set()
+    await prober
+    lag_after = lag_histogram(await asyncio.to_thread(fetch, metrics_url))
+
+    completed = [result for result in results if result["error"] is None]
+    errors = {}
+    for result in results:
+        if result["error"] is not None:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+    return {
+        "clients": clients,
+        "duration_seconds": round(duration, 3),
+        "completed": len(completed),
+        "error_rate": round(1 - len(completed) / clients, 4),
+        "errors": errors,
+        "sessions_per_minute": round(60 * len(completed) / duration, 3),
+        "time_to_first_log": distribution([r["first_log"] for r in results if "first_log" in r]),
+        "time_to_first_report_token": distribution([r["first_report"] for r in results if "first_report" in r]),
+        "completion_latency": distribution([r["completion"] for r in completed]),
+        "metrics_probe_latency": distribution(probes),
+        "event_loop_lag": lag_summary(lag_before, lag_after),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mocked_server(args):
+    """Starts the fixture and fake LLM servers and a uvicorn worker of the app configured to use them"""
+    fixture, fixture_url = start_server("fixture_server.py", ["--latency", str(args.page_latency)])
+    llm, llm_url = start_server("fake_llm_server.py", ["--ttft", str(args.ttft),
+                                                       "--tokens-per-second", str(args.tokens_per_second)])
+    config = {"retriever": "mock", "memory_backend": "none"}
+    if args.config:
+        with open(args.config, "r") as f:
+            config.update(json.load(f))
+    config_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump(config, config_file)
+    config_file.close()
+    port = free_port()
+    log = open(os.path.join(tempfile.gettempdir(), f"load_test_server_{port}.log"), "w")
+    env = {**os.environ, "CONFIG_PATH": config_file.name, "MOCK_SEARCH_URL": fixture_url,
+           "OPENAI_API_BASE": llm_url, "OPENAI_BASE_URL": llm_url, "OPENAI_API_KEY": "load-test"}
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                               "--port", str(port)], cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while True:
+        try:
+            fetch(base_url + "/metrics", timeout=1)
+            break
+        except Exception:
+            if server.poll() is not None or time.time() > deadline:
+                for process in (server, fixture, llm):
+                    process.terminate()
+                raise RuntimeError(f"Server failed to start, see {log.name}")
+            time.sleep(0.5)
+    print(f"Server with mocked backends at {base_url}, logging to {log.name}", file=sys.stderr)
+    return base_url, [server, fixture, llm], config_file.name
+
+
+async def run_load_test(args) -> dict:
+    processes, config_path = [], None
+    base_url = args.url.rstrip("/") if args.url else None
+    if base_url is None:
+        base_url, processes, config_path = start_mocked_server(args)
+    rng = random.Random(args.seed)
+    steps = []
+    try:
+        for step, clients in enumerate(args.concurrency):
+            result = await run_step(args, base_url, clients, step, rng)
+            steps.append(result)
+            print(f"{clients} clients: {result['completed']} completed, error rate {result['error_rate']}, "
+                  f"first log p95 {result['time_to_first_log']['p95']}s, "
+                  f"first report token p95 {result['time_to_first_report_token']['p95']}s, "
+                  f"completion p95 {result['completion_latency']['p95']}s, "
+                  f"event loop lag mean {result['event_loop_lag'].get('mean')}s", file=sys.stderr)
+            await asyncio.sleep(args.cooldown)
+    finally:
+        for process in processes:
+            process.terminate()
+        if config_path:
+            os.unlink(config_path)
+    return {"url": base_url, "task": args.task, "report_type": args.report_type, "arrival": args.arrival,
+            "rate": args.rate, "same_task": args.same_task, "steps": steps}
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Load test of concurrent research sessions over /ws")
+    parser.add_argument("--url", help="base url of a running server, by default a server with mocked backends "
+                                      "is started")
+    parser.add_argument("--config", help="JSON file of config overrides for the started server")
+    parser.add_argument("--concurrency", type=lambda value: [int(n) for n in value.split(",")], default=[1, 2, 4, 8],
+                        help="comma-separated numbers of sessions per step")
+    parser.add_argument("--arrival", choices=["burst", "uniform", "poisson"], default="poisson",
+                        help="how the sessions of a step start: all at once, evenly or at random intervals")
+    parser.add_argument("--rate", type=float, default=2.0, help="session arrivals per second")
+    parser.add_argument("--task", default="What drives the growth of the cloud computing market?")
+    parser.add_argument("--same-task", action="store_true",
+                        help="send the same task from every session, which the server shares between them")
+    parser.add_argument("--report-type", default="research_report")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds before a session counts as failed")
+    parser.add_argument("--probe-interval", type=float, default=0.25, help="seconds between /metrics probes")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="seconds between steps")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--page-latency", type=float, default=0.05, help="seconds added to every fixture page")
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds to the first fake LLM token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="fake LLM completion throughput")
+    parser.add_argument("--output", help="file to write the JSON results to, stdout by default")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    results = json.dumps(asyncio.run(run_load_test(arguments)), indent=2)
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            f.write(results)
+    else:
+        print(results)
@@ -0,0 +1,87 @@
+# Query latency of the local retriever's BM25 index on a synthetic corpus
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from array import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gpt_researcher.retrievers.local.index import LocalIndex
+
+
+def build_index(index_path, docs, vocabulary, terms_per_doc, seed):
+    """Writes an index of `docs` synthetic documents whose terms follow a Zipf distribution"""
+    rng = np.random.default_rng(seed)
+    doc_ids = np.repeat(np.arange(docs, dtype=np.uint32), terms_per_doc)
+    term_ids = ((rng.zipf(1.1, docs * terms_per_doc) - 1) % vocabulary).astype(np.uint32)
+    pairs, tfs = np.unique(np.stack([term_ids, doc_ids], axis=1), axis=0, return_counts=True)
+    starts = np.searchsorted(pairs[:, 0], np.arange(vocabulary + 1))
+    inverted = {}
+    for term_id in range(vocabulary):
+        start, end = starts[term_id], starts[term_id + 1]
+        if start < end:
+            postings = np.stack([pairs[start:end, 1], tfs[start:end].astype(np.uint32)], axis=1)
+            inverted[f"term{term_id}"] = array("I", postings.astype(np.uint32).tobytes())
+    lengths = np.bincount(doc_ids, minlength=docs)
+    metadata = [[f"/synthetic/{i}.txt", 0, 0, int(lengths[i]), 0, 0] for i in range(docs)]
+    index = LocalIndex(index_path, index_path)
+    index._write(metadata, [b""] * docs, inverted)
+    index.load()
+    return index
+
+
+def time_queries(index, queries, repeats):
+    samples = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, max_results=10)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {"p50_ms": round(samples[len(samples) // 2], 3),
+            "p99_ms": round(samples[min(int(0.99 * len(samples)), len(samples) - 1)], 3),
+            "max_ms": round(samples[-1], 3)}
+
+
+def run_benchmark(args):
+    with tempfile.TemporaryDirectory() as index_path:
+        start = time.perf_counter()
+        index = build_index(index_path, args.docs, args.vocabulary, args.terms_per_doc, args.seed)
+        build_seconds = time.perf_counter() - start
+        by_df = sorted(index.vocab, key=lambda term: index.vocab[term][1])
+        # Terms in 0.1%, 1% and 10% of the documents, and in the most documents
+        rare = [term for term in by_df if index.vocab[term][1] <= args.docs // 1000][-5:]
+        mid = [term for term in by_df if index.vocab[term][1] <= args.docs // 100][-5:]
+        frequent = [term for term in by_df if index.vocab[term][1] <= args.docs // 10][-5:]
+        common = by_df[-5:]
+        classes = {"rare": rare, "mid": mid, "frequent": frequent, "common": common,
+                   "mixed": [" ".join(terms) for terms in zip(rare, mid, common)]}
+        results = {name: {"df": [index.vocab[term][1] for term in queries[0].split()] if name == "mixed"
+                          else [index.vocab[term][1] for term in queries],
+                          **time_queries(index, queries, args.repeats)}
+                   for name, queries in classes.items()}
+        index.close()
+    slowest = max(result["p99_ms"] for result in results.values())
+    return {"docs": args.docs, "build_seconds": round(build_seconds, 2), "target_ms": args.target_ms,
+            "met": slowest <= args.target_ms, "queries": results}
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Query latency of the local BM25 index on a synthetic corpus")
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--terms-per-doc", type=int, default=80)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--target-ms", type=float, default=10.0, help="p99 query latency the index must meet")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    results = run_benchmark(parse_args())
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if results["met"] else 1)
@@ -0,0 +1,147 @@
+# Offline end-to-end benchmark of GPTResearcher.run against the fixture web server and the fake LLM server
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import contextlib
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+
+def start_server(script, args):
+    """Starts a benchmark server on a free port and returns its process and base url"""
+    process = subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, script), "--port", "0", *args],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError(f"{script} failed to start")
+    return process, line.split()[-1]
+
+
+def counter_total(metric, **labels):
+    """Sums the values of a metric over the label sets matching the given labels"""
+    return sum(value for key, value in metric.values.items()
+               if all(dict(zip(metric.labelnames, key)).get(name) == label for name, label in labels.items()))
+
+
+def run_benchmark(args):
+    fixture, fixture_url = start_server("fixture_server.py", [
+        "--pages", str(args.pages), "--latency", str(args.page_latency), "--error-rate", str(args.error_rate),
+        "--timeout-rate", str(args.timeout_rate)])
+    llm, llm_url = start_server("fake_llm_server.py", [
+        "--ttft", str(args.ttft), "--tokens-per-second", str(args.tokens_per_second),
+        "--completion-tokens", str(args.completion_tokens)])
+    os.environ.update({"MOCK_SEARCH_URL": fixture_url, "MOCK_SEARCH_RESULTS": str(args.results),
+                       "OPENAI_API_BASE": llm_url, "OPENAI_BASE_URL": llm_url, "OPENAI_API_KEY": "benchmark"})
+
+    config = {"retriever": "mock", "memory_backend": "none"}
+    if args.config:
+        with open(args.config, "r") as f:
+            config.update(json.load(f))
+    config_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump(config, config_file)
+    config_file.close()
+
+    sys.path.insert(0, REPO_DIR)
+    from gpt_researcher import GPTResearcher
+    from gpt_researcher.utils.metrics import SCRAPES, LLM_TOKENS
+
+    runs = []
+    tracemalloc.start()
+    try:
+        for _ in range(args.runs):
+            tracemalloc.reset_peak()
+            scrapes, pages = counter_total(SCRAPES), counter_total(SCRAPES, outcome="success")
+            tokens = counter_total(LLM_TOKENS, kind="completion")
+            start = time.perf_counter()
+            researcher = GPTResearcher(args.query, args.report_type, config_file.name)
+            report = asyncio.run(researcher.run())
+            wall = time.perf_counter() - start
+            # The latency profile total leaves out the fixed pause at the end of a run
+            seconds = researcher.latency_profile.get("total", wall)
+            usage = researcher.usage.totals()["total"]
+            runs.append({
+                "wall_seconds": round(wall, 3),
+                "stages": researcher.latency_profile,
+                "llm_calls": usage["calls"],
+                "prompt_tokens": usage["prompt_tokens"],
+                "completion_tokens": usage["completion_tokens"],
+                # Counted with the tokenizer for calls whose provider reported no usage
+                "tokens_estimated": usage["estimated"],
+                "urls_fetched": counter_total(SCRAPES) - scrapes,
+                "pages_extracted": counter_total(SCRAPES, outcome="success") - pages,
+                "pages_per_second": round((counter_total(SCRAPES, outcome="success") - pages) / seconds, 3),
+                "completion_tokens_per_second": round((counter_total(LLM_TOKENS, kind="completion") - tokens)
+                                                      / seconds, 3),
+                "report_chars": len(report or ""),
+                "peak_python_mb": round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2),
+            })
+    finally:
+        tracemalloc.stop()
+        fixture.terminate()
+        llm.terminate()
+        os.unlink(config_file.name)
+
+    stages = sorted({stage for run in runs for stage in run["stages"]})
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "query": args.query,
+        "report_type": args.report_type,
+        "config": config,
+        "servers": {"page_latency": args.page_latency, "error_rate": args.error_rate,
+                    "timeout_rate": args.timeout_rate, "ttft": args.ttft,
+                    "tokens_per_second": args.tokens_per_second, "completion_tokens": args.completion_tokens},
+        "runs": runs,
+        "summary": {
+            "stages_median_seconds": {stage: round(statistics.median(run["stages"].get(stage, 0.0) for run in runs), 3)
+                                      for stage in stages},
+            "runs_per_minute": round(60 * len(runs) / sum(run["stages"].get("total", run["wall_seconds"])
+                                                          for run in runs), 3),
+            "pages_per_second_median": statistics.median(run["pages_per_second"] for run in runs),
+            "peak_python_mb": max(run["peak_python_mb"] for run in runs),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        },
+    }
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of GPTResearcher.run")
+    parser.add_argument("--query", default="What drives the growth of the cloud computing market?")
+    parser.add_argument("--report-type", default="research_report")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--config", help="JSON file of config overrides, e.g. research or report modes")
+    parser.add_argument("--output", help="file to write the JSON results to, stdout by default")
+    parser.add_argument("--results", type=int, default=5, help="search results per query")
+    parser.add_argument("--pages", type=int, default=200, help="pages in the fixture corpus")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="seconds added to every page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of page requests failing")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of page requests hanging")
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds to the first LLM token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="LLM completion throughput")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="maximum LLM completion tokens")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    # The researcher prints its progress to stdout, which is kept for the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        results = json.dumps(run_benchmark(arguments), indent=2)
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            f.write(results)
+    else:
+        print(results)
@@ -9,6 +9,7 @@ from langchain.schema.output_parser import StrOutputParser
 from langchain.schema.runnable import RunnableMap
 from langchain.schema.messages import SystemMessage
 from gpt_researcher.retriever.prompts import auto_agent_instructions, generate_search_queries_prompt
+from gpt_researcher.utils.urls import SeenUrls
 from config import Config
 
 CFG = Config()
@@ -34,7 +35,7 @@ scrape_and_summarize = {
         "url": lambda x: x['url']
 }) | (lambda x: f"Source Url: {x['url']}\nSummary: {x['summary']}")
 
-seen_urls = set()
+seen_urls = SeenUrls()
 multi_search = (
     lambda x: [
         {"url": url.get("href"), "question": x["question"]}
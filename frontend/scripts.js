@@ -27,6 +27,8 @@ const GPTResearcher = (() => {
         const data = JSON.parse(event.data);
         if (data.type === 'logs') {
           addAgentResponse(data);
+        } else if (data.type === 'draft') {
+          writeDraft(data, converter);
         } else if (data.type === 'report') {
           writeReport(data, converter);
         } else if (data.type === 'path') {
@@ -59,8 +61,23 @@ const GPTResearcher = (() => {
       updateScroll();
     };
   
+    // Drafts replace each other, and are replaced by the final report as soon as it starts
+    let showingDraft = false;
+
+    const writeDraft = (data, converter) => {
+      const reportContainer = document.getElementById("reportContainer");
+      reportContainer.innerHTML = '<div class="alert alert-info">Draft, research in progress...</div>'
+        + converter.makeHtml(data.output);
+      showingDraft = true;
+      updateScroll();
+    };
+
     const writeReport = (data, converter) => {
       const reportContainer = document.getElementById("reportContainer");
+      if (showingDraft) {
+        reportContainer.innerHTML = "";
+        showingDraft = false;
+      }
       const markdownOutput = converter.makeHtml(data.output);
       reportContainer.innerHTML += markdownOutput;
       updateScroll();
@@ -15,14 +15,63 @@ class Config:
         self.fast_token_limit = 2000
         self.smart_token_limit = 4000
         self.browse_chunk_max_length = 8192
+        self.chunk_overlap = 0
         self.summary_token_limit = 700
+        self.summary_mode = "concat"
+        self.summary_reduce_fan_in = 4
+        self.source_token_budget = 1500
+        self.summary_batching = False
+        self.summary_batch_source_tokens = 800
+        self.summary_batch_token_budget = 6000
+        self.model_routing = False
+        self.model_tiers = None
+        self.model_routes = None
+        self.hedged_requests = False
+        self.hedge_quantile = 0.9
+        self.hedge_min_samples = 20
+        self.hedge_budget = 0.1
         self.temperature = 0.6
         self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko)" \
                           " Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0"
         self.memory_backend = "local"
+        self.memory_path = "outputs/memory.sqlite3"
+        self.memory_similarity_threshold = 0.7
+        self.memory_max_records = 50000
+        self.memory_max_age_days = 30
         self.total_words = 1000
         self.report_format = "apa"
+        self.report_mode = "single"
+        self.progressive_report = False
+        self.report_max_sections = 6
+        self.section_context_tokens = 3000
         self.max_iterations = 3
+        self.seen_urls_backend = "set"
+        self.seen_urls_capacity = 1000000
+        self.seen_urls_error_rate = 0.001
+        self.research_mode = "deep"
+        self.fast_scrape_top_n = 0
+        self.scrape_budget_tokens = 0
+        self.scrape_budget_passages = 0
+        self.scrape_window = 3
+        self.adaptive_research = False
+        self.novelty_threshold = 0.2
+        self.sub_query_similarity_threshold = 0
+        self.replace_duplicate_sub_queries = False
+        self.speculative_sub_queries = False
+        self.speculative_role_similarity = 0.5
+        self.deadline = None
+        self.token_budget = None
+        self.cost_budget = None
+        self.model_prices = None
+        self.budget_split = {"agent": 0.05, "search": 0.1, "scrape": 0.25, "summarize": 0.3, "report": 0.3}
+        self.checkpoint_dir = "outputs/checkpoints"
+        self.report_cache_ttl = 3600
+        self.report_cache_max_entries = 256
+        self.tracing = False
+        self.trace_dir = "outputs/traces"
+        self.cassette_mode = "off"
+        self.cassette_path = "outputs/cassettes/cassette.json.gz"
+        self.cassette_speed = 1.0
 
         self.load_config_file()
 
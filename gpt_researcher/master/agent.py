@@ -1,13 +1,27 @@
 import time
+import json
+import asyncio
+from functools import partial
 from gpt_researcher.config import Config
 from gpt_researcher.master.functions import *
+from gpt_researcher.master.checkpoint import CheckpointStore
+from gpt_researcher.utils.urls import get_seen_urls, restore_seen_urls
+from gpt_researcher.utils.similarity import relevance, shingles
+from gpt_researcher.utils.budget import ResearchBudget, set_current_budget, reset_current_budget
+from gpt_researcher.utils.prompt_cache import PromptCacheStats, set_prompt_cache_stats, reset_prompt_cache_stats
+from gpt_researcher.utils.llm import get_model_router, set_current_router, reset_current_router
+from gpt_researcher.utils.hedging import get_request_hedging, set_current_hedging, reset_current_hedging
+from gpt_researcher.utils.usage import UsageLedger, set_current_usage, reset_current_usage
+from gpt_researcher.utils.cassette import get_cassette, set_current_cassette, reset_current_cassette
+from gpt_researcher.utils.tracing import start_trace, span
+from gpt_researcher.utils.metrics import RETRIEVER_SEARCHES, RETRIEVER_SEARCH_SECONDS
 
 
 class GPTResearcher:
     """
     GPT Researcher
     """
-    def __init__(self, query, report_type, config_path=None, websocket=None):
+    def __init__(self, query, report_type, config_path=None, websocket=None, run_id=None):
         """
         Initialize the GPT Researcher class.
         Args:
@@ -15,6 +29,8 @@ class GPTResearcher:
             report_type:
             config_path:
             websocket:
+            run_id: checkpoints the run under this ID, and resumes it if it was checkpointed before.
+                The checkpoint is deleted once the full report is delivered, so the ID can then be reused for a new run
         """
         self.query = query
         self.agent = None
@@ -24,7 +40,27 @@ class GPTResearcher:
         self.cfg = Config(config_path)
         self.retriever = get_retriever(self.cfg.retriever)
         self.context = []
-        self.visited_urls = set()
+        self.visited_urls = get_seen_urls(self.cfg)
+        self.run_id = run_id
+        self.checkpoints = CheckpointStore(self.cfg.checkpoint_dir) if run_id else None
+        self.sub_queries = []
+        self.completed_sub_queries = []
+        self.budget = ResearchBudget(self.cfg.deadline, self.cfg.token_budget, self.cfg.budget_split,
+                                     self.cfg.cost_budget)
+        self.usage = UsageLedger(self.cfg.model_prices)
+        self.latency_profile = {}
+        self.prompt_cache_stats = PromptCacheStats()
+        self.router = get_model_router(self.cfg)
+        self.hedging = get_request_hedging(self.cfg)
+        self.cassette = get_cassette(self.cfg)
+        self.draft = None
+        self.context_updated = asyncio.Event()
+        self.scrape_stats = {}
+        self.context_shingles = set()
+        # Summarization LLM calls of each sub-query run by this agent
+        self.summarize_calls = []
+        self.adaptive_stats = {"novelty": [], "skipped_sub_queries": [],
+                               "saved_scrapes_estimate": 0, "saved_llm_calls_estimate": 0}
 
     async def run(self):
         """
@@ -33,31 +69,361 @@ class GPTResearcher:
             Report
         """
         print(f"🔎 Running research for '{self.query}'...")
-        # Generate Agent
-        self.agent, self.role = await choose_agent(self.query, self.cfg)
-        await stream_output("logs", self.agent, self.websocket)
+        run_start = time.perf_counter()
+        self.budget = ResearchBudget(self.cfg.deadline, self.cfg.token_budget, self.cfg.budget_split,
+                                     self.cfg.cost_budget)
+        budget_token = set_current_budget(self.budget)
+        usage_token = set_current_usage(self.usage)
+        prompt_cache_token = set_prompt_cache_stats(self.prompt_cache_stats)
+        router_token = set_current_router(self.router)
+        hedging_token = set_current_hedging(self.hedging)
+        cassette_token = set_current_cassette(self.cassette)
+        with start_trace("research.run", self.cfg.trace_dir, self.cfg.tracing, query=self.query,
+                         report_type=self.report_type) as trace:
+            try:
+                await self.restore_checkpoint()
+
+                # Generate Agent and Sub-Queries including original query
+                if not self.sub_queries:
+                    self.sub_queries = await self.plan_research()
+                    self.save_checkpoint()
+                sub_queries = self.sub_queries
+                await stream_output("logs",
+                                         f"🧠 I will conduct my research based on the following queries: {sub_queries}...", self.websocket)
+
+                # Run Sub-Queries
+                await self.conduct_research(sub_queries)
+
+                # Conduct Research
+                await stream_output("logs", f"✍️ Writing {self.report_type} for research task: {self.query}...", self.websocket)
+                partial_note = ""
+                if self.budget.partial:
+                    partial_note = f"> ⚠️ Partial report: research was cut short by its time, token or cost budget after " \
+                                   f"{len(self.context)} of {len(sub_queries)} research queries.\n\n"
+                    await stream_output("report", partial_note, self.websocket)
+                start = time.perf_counter()
+                report_start = self.budget.elapsed()
+                write_report = generate_sectioned_report if self.cfg.report_mode == "sectioned" else generate_report
+                report = await write_report(query=self.query, context=self.context,
+                                            agent_role_prompt=self.role, report_type=self.report_type,
+                                            websocket=self.websocket, cfg=self.cfg)
+                if self.budget.time_left() == 0.0 and not self.budget.partial:
+                    # The report was cut at the deadline
+                    self.budget.partial = True
+                    await stream_output("logs", "⏰ Research deadline reached while writing the report, "
+                                                "the report is partial", self.websocket)
+                report = partial_note + report
+                self.record_latency("report", start)
+                if "report" in self.budget.first_output and not partial_note:
+                    self.latency_profile["report_first_output"] = round(self.budget.first_output["report"] - report_start, 3)
+                if self.budget.first_output:
+                    self.latency_profile["first_output"] = round(min(self.budget.first_output.values()), 3)
+                if not self.budget.partial:
+                    # The report was streamed to the client, there is nothing left to resume
+                    self.delete_checkpoint()
+                trace.set(sub_queries=len(sub_queries), partial=self.budget.partial,
+                          cost=round(self.usage.total_cost(), 6))
+            finally:
+                if self.cassette is not None:
+                    self.cassette.save()
+                reset_current_cassette(cassette_token)
+                reset_current_hedging(hedging_token)
+                reset_current_router(router_token)
+                reset_prompt_cache_stats(prompt_cache_token)
+                reset_current_usage(usage_token)
+                reset_current_budget(budget_token)
+        self.record_latency("total", run_start)
+        if "first_output" in self.latency_profile:
+            await stream_output("logs", f"⚡ Time to first useful output: {self.latency_profile['first_output']}s "
+                                        f"of {self.latency_profile['total']}s", self.websocket)
+        await stream_output("logs", f"⏱️ Latency profile ({self.cfg.research_mode} mode, "
+                                    f"{self.cfg.report_mode} report): "
+                                    f"{json.dumps(self.latency_profile)}", self.websocket)
+        await stream_output("logs", f"🗄️ Prompt cache usage per call type: "
+                                    f"{json.dumps(self.prompt_cache_stats.summary())}", self.websocket)
+        if self.hedging is not None:
+            await stream_output("logs", f"🏁 Hedged requests and latency per call type: "
+                                        f"{json.dumps(self.hedging.summary())}", self.websocket)
+        if self.cassette is not None:
+            await stream_output("logs", f"📼 Cassette: {json.dumps(self.cassette.summary())}", self.websocket)
+        if self.router is not None:
+            await stream_output("logs", f"🧭 Model tier mix and estimated cost: "
+                                        f"{json.dumps(self.router.summary())}", self.websocket)
+        totals = self.usage.totals()
+        total = totals["total"]
+        # Tokens of calls without provider reported usage are counted with the tokenizer
+        approx = "~" if total["estimated"] else ""
+        estimated_note = f" (estimated for {total['estimated_calls']} calls without provider reported usage)" \
+            if total["estimated"] else ""
+        await stream_output("logs", f"💰 Run usage{estimated_note}: {total['calls']} LLM calls, "
+                                    f"{approx}{total['prompt_tokens']} prompt tokens "
+                                    f"({total['cached_tokens']} cached), "
+                                    f"{approx}{total['completion_tokens']} completion tokens, "
+                                    f"{approx}${total['cost']:.4f}", self.websocket)
+        await stream_output("usage", totals, self.websocket, logging=False)
+        await asyncio.sleep(2)
+        return report
 
-        # Generate Sub-Queries including original query
-        sub_queries = await get_sub_queries(self.query, self.role, self.cfg) + [self.query]
-        await stream_output("logs",
-                                 f"🧠 I will conduct my research based on the following queries: {sub_queries}...", self.websocket)
+    async def plan_research(self):
+        """
+        Chooses the agent and generates the sub-queries within the agent and search stage deadlines.
+        The default agent and no sub-queries are used for whatever does not finish in time.
+        Returns:
+            Sub-queries including the original query
+        """
+        if self.cfg.speculative_sub_queries and self.role is None:
+            # Generate Agent and Sub-Queries concurrently
+            try:
+                sub_queries = await asyncio.wait_for(self.choose_agent_with_speculative_sub_queries(),
+                                                     self.budget.time_left_for("search"))
+            except asyncio.TimeoutError:
+                self.agent = self.agent or "Default Agent"
+                self.role = self.role or DEFAULT_AGENT_ROLE_PROMPT
+                sub_queries = []
+                await stream_output("logs", "⏰ Planning ran out of time, researching the original query only",
+                                    self.websocket)
+        else:
+            # Generate Agent, unless it was restored from a checkpoint
+            if self.role is None:
+                start = time.perf_counter()
+                try:
+                    self.agent, self.role = await asyncio.wait_for(choose_agent(self.query, self.cfg),
+                                                                   self.budget.time_left_for("agent"))
+                except asyncio.TimeoutError:
+                    self.agent, self.role = "Default Agent", DEFAULT_AGENT_ROLE_PROMPT
+                self.record_latency("agent", start)
+                self.save_checkpoint()
+            await stream_output("logs", self.agent, self.websocket)
 
-        # Run Sub-Queries
-        for sub_query in sub_queries:
+            # Generate Sub-Queries
+            start = time.perf_counter()
+            try:
+                sub_queries = await asyncio.wait_for(get_sub_queries(self.query, self.role, self.cfg),
+                                                     self.budget.time_left_for("search"))
+            except asyncio.TimeoutError:
+                sub_queries = []
+                await stream_output("logs", "⏰ Sub-query generation ran out of time, researching the original query only",
+                                    self.websocket)
+            self.record_latency("sub_queries", start)
+
+        # Including original query
+        return await self.deduplicate_sub_queries(sub_queries)
+
+    async def conduct_research(self, sub_queries):
+        """
+        Runs the sub-queries one by one into self.context. Once the research stages run out of time or tokens,
+        outstanding work is cancelled and the run is marked as partial. In progressive mode, a draft is
+        refined in the background as the sub-queries complete.
+        Args:
+            sub_queries:
+        """
+        drafting = None
+        if self.cfg.progressive_report:
+            drafting = asyncio.create_task(self.refine_drafts())
+            if self.context:
+                self.context_updated.set()
+        try:
+            await self.run_sub_queries(sub_queries)
+        finally:
+            if drafting is not None:
+                # The final report supersedes any draft still being written
+                drafting.cancel()
+                await asyncio.gather(drafting, return_exceptions=True)
+
+    async def run_sub_queries(self, sub_queries):
+        """
+        Runs the sub-queries one by one into self.context within the research budget.
+        A sub-query running past the deadline is cancelled, but searches and scrapes it runs in
+        asyncio.to_thread cannot be interrupted: their worker threads run on in the background until done.
+        Args:
+            sub_queries:
+        """
+        for i, sub_query in enumerate(sub_queries):
+            if sub_query in self.completed_sub_queries:
+                continue
+            if self.budget.exhausted("summarize"):
+                self.budget.partial = True
+                await stream_output("logs", f"⏰ Research budget exhausted, skipping {len(sub_queries) - i} "
+                                            f"remaining sub-queries", self.websocket)
+                break
             await stream_output("logs", f"\n🔎 Running research for '{sub_query}'...", self.websocket)
-            context = await self.run_sub_query(sub_query)
+            summarize_calls = self.usage_calls("summarize")
+            try:
+                context = await asyncio.wait_for(self.run_sub_query(sub_query), self.budget.time_left_for("summarize"))
+            except asyncio.TimeoutError:
+                self.budget.partial = True
+                await stream_output("logs", f"⏰ Research deadline reached, cancelled '{sub_query}' and "
+                                            f"{len(sub_queries) - i - 1} remaining sub-queries", self.websocket)
+                break
             self.context.append(context)
+            self.completed_sub_queries.append(sub_query)
+            self.summarize_calls.append(self.usage_calls("summarize") - summarize_calls)
+            self.context_updated.set()
+            self.save_checkpoint()
+            if self.cfg.adaptive_research and i < len(sub_queries) - 1:
+                if await self.is_research_saturated(context, sub_queries[i + 1:]):
+                    break
 
-        # Conduct Research
-        await stream_output("logs", f"✍️ Writing {self.report_type} for research task: {self.query}...", self.websocket)
-        report = await generate_report(query=self.query, context=self.context,
-                                       agent_role_prompt=self.role, report_type=self.report_type,
-                                       websocket=self.websocket, cfg=self.cfg)
-        time.sleep(2)
-        return report
+    async def refine_drafts(self):
+        """ Streams a draft executive summary once the first sub-query completes, and refines it with the
+        summaries of every sub-query completed since, until cancelled. Sub-queries completing while a draft
+        is written are folded into the next refinement.
+        """
+        drafted = 0
+        while True:
+            await self.context_updated.wait()
+            self.context_updated.clear()
+            new_context = [item for summaries in self.context[drafted:] for item in summaries if item.get("summary")]
+            drafted = len(self.context)
+            if not new_context or self.budget.exhausted("summarize"):
+                continue
+            draft = await generate_draft(self.query, new_context, self.draft, self.role, self.cfg)
+            if draft and draft != self.draft:
+                self.draft = draft
+                await stream_output("draft", draft, self.websocket)
+
+    async def is_research_saturated(self, context, remaining_sub_queries):
+        """ Measures the share of new shingles a completed sub-query added to the accumulated context,
+        and records the work saved when it falls below cfg.novelty_threshold. A sub-query that added no
+        content, e.g. when its search or scrapes came back empty, never stops the research.
+        Args: context (list[dict]): The summaries of the completed sub-query
+              remaining_sub_queries (list[str]): The sub-queries not run yet
+        Returns: bool: Whether the remaining sub-queries should be skipped
+        """
+        new_shingles = shingles(" ".join(item["summary"] for item in context))
+        if not new_shingles:
+            return False
+        novelty = len(new_shingles - self.context_shingles) / len(new_shingles)
+        self.context_shingles |= new_shingles
+        self.adaptive_stats["novelty"].append(round(novelty, 3))
+        if novelty >= self.cfg.novelty_threshold:
+            return False
+
+        # Estimate the saved work from the sources and summarization calls per completed sub-query so far
+        sources_per_sub_query = sum(len(summaries) for summaries in self.context) / len(self.context)
+        calls_per_sub_query = sum(self.summarize_calls) / len(self.summarize_calls) if self.summarize_calls else 0
+        self.adaptive_stats["skipped_sub_queries"] = list(remaining_sub_queries)
+        self.adaptive_stats["saved_scrapes_estimate"] = round(sources_per_sub_query * len(remaining_sub_queries))
+        self.adaptive_stats["saved_llm_calls_estimate"] = round(calls_per_sub_query * len(remaining_sub_queries))
+        await stream_output("logs", f"🛑 Last sub-query added only {novelty:.0%} new information, skipping "
+                                    f"{len(remaining_sub_queries)} remaining sub-queries "
+                                    f"(~{self.adaptive_stats['saved_scrapes_estimate']} scrapes and "
+                                    f"~{self.adaptive_stats['saved_llm_calls_estimate']} summarization calls saved)",
+                            self.websocket)
+        return True
+
+    async def restore_checkpoint(self):
+        """ Restores the agent, sub-queries, completed sub-query summaries and visited urls
+        from the last checkpoint of self.run_id.
+        Returns: dict: The checkpointed state, or None if there is nothing to resume
+        """
+        if self.checkpoints is None:
+            return None
+        state = self.checkpoints.load(self.run_id)
+        if not state or state.get("query") != self.query or state.get("report_type") != self.report_type:
+            return None
+        self.agent, self.role = state["agent"], state["role"]
+        self.sub_queries = state["sub_queries"]
+        self.completed_sub_queries = [sub_query for sub_query, _ in state["context"]]
+        self.context = [summaries for _, summaries in state["context"]]
+        self.visited_urls = restore_seen_urls(state["visited_urls"])
+        for summaries in self.context:
+            self.context_shingles |= shingles(" ".join(item["summary"] for item in summaries))
+        await stream_output("logs", f"♻️ Resuming run {self.run_id}: {len(self.completed_sub_queries)} of "
+                                    f"{len(self.sub_queries) or '?'} research queries already completed",
+                            self.websocket)
+        return state
+
+    def save_checkpoint(self):
+        """ Checkpoints the state of the run under self.run_id.
+        """
+        if self.checkpoints is None:
+            return
+        self.checkpoints.save(self.run_id, {
+            "query": self.query,
+            "report_type": self.report_type,
+            "agent": self.agent,
+            "role": self.role,
+            "sub_queries": self.sub_queries,
+            "context": [[sub_query, summaries] for sub_query, summaries in zip(self.completed_sub_queries, self.context)],
+            "visited_urls": self.visited_urls.to_state(),
+        })
+
+    def delete_checkpoint(self):
+        """ Deletes the checkpoint of self.run_id once the run completed.
+        """
+        if self.checkpoints is not None:
+            self.checkpoints.delete(self.run_id)
+
+    def record_latency(self, stage, start):
+        """ Adds the time elapsed since start to the latency profile of a stage.
+        Args: stage (str): The stage name
+              start (float): time.perf_counter() at the start of the stage
+        """
+        elapsed = time.perf_counter() - start
+        self.latency_profile[stage] = round(self.latency_profile.get(stage, 0.0) + elapsed, 3)
+
+    def usage_calls(self, call_type):
+        """ Gets the number of LLM calls of a call type made so far in this run.
+        Args: call_type (str): The research stage making the calls
+        Returns: int: The number of calls
+        """
+        return self.usage.call_types.get(call_type, {}).get("calls", 0)
+
+    async def choose_agent_with_speculative_sub_queries(self):
+        """ Chooses the agent while speculatively generating the sub-queries with the default role prompt.
+        The sub-queries are only generated again when the chosen role prompt shares less than
+        cfg.speculative_role_similarity of its distinctive terms with the default one.
+        Returns: list[str]: The sub-queries
+        """
+        async def timed(coroutine):
+            start = time.perf_counter()
+            result = await coroutine
+            return result, time.perf_counter() - start
+
+        start = time.perf_counter()
+        (agent, agent_time), (sub_queries, sub_queries_time) = await asyncio.gather(
+            timed(choose_agent(self.query, self.cfg)),
+            timed(get_sub_queries(self.query, DEFAULT_AGENT_ROLE_PROMPT, self.cfg)))
+        self.agent, self.role = agent
+        await stream_output("logs", self.agent, self.websocket)
+        self.latency_profile["agent"] = round(agent_time, 3)
+
+        similarity = role_similarity(self.agent, self.role)
+        reused = similarity >= self.cfg.speculative_role_similarity
+        if not reused:
+            sub_queries, sub_queries_time = await timed(get_sub_queries(self.query, self.role, self.cfg))
+        # Only the time spent on sub-queries after the agent was chosen counts towards the sub_queries stage
+        self.record_latency("sub_queries", start + agent_time)
+
+        saved = agent_time + sub_queries_time - (time.perf_counter() - start)
+        self.latency_profile["speculation_saved"] = round(saved, 3)
+        await stream_output("logs", f"⚡ Speculative sub-queries {'reused' if reused else 'regenerated'} "
+                                    f"(role similarity {similarity:.2f}), {saved:.2f}s saved", self.websocket)
+        return sub_queries
+
+    async def deduplicate_sub_queries(self, sub_queries):
+        """ Merges near-duplicate sub-queries, optionally asking for replacements, and prepends the original query.
+        The original query runs first so that an adaptive early stop never skips it.
+        Args: sub_queries (list[str]): The generated sub-queries
+        Returns: list[str]: The original query followed by the distinct sub-queries
+        """
+        threshold = self.cfg.sub_query_similarity_threshold
+        if not threshold:
+            return [self.query] + sub_queries
+        unique, duplicates = merge_duplicate_sub_queries(self.query, sub_queries, threshold)
+        if duplicates:
+            await stream_output("logs", f"🧹 Merged near-duplicate sub-queries: {duplicates}", self.websocket)
+            if self.cfg.replace_duplicate_sub_queries:
+                replacements = await get_replacement_sub_queries(self.query, unique, len(duplicates),
+                                                                 self.role, self.cfg)
+                unique, _ = merge_duplicate_sub_queries(self.query, unique[1:] + replacements, threshold)
+        return unique
 
     async def get_new_urls(self, url_set_input):
         """ Gets the new urls from the given url set.
+        Urls are compared by their canonical form, so http/https, tracking parameter and AMP variants
+        of an already visited page are skipped.
         Args: url_set_input (set[str]): The url set to get the new urls from
         Returns: list[str]: The new urls from the given url set
         """
@@ -81,18 +447,99 @@ class GPTResearcher:
         Returns:
             Summary
         """
-        # Get Urls
-        retriever = self.retriever(sub_query)
-        search_results = retriever.search()
-        new_search_urls = await self.get_new_urls([url.get("href") for url in search_results])
+        with span("research.sub_query", sub_query=sub_query):
+            # Get Urls
+            start = time.perf_counter()
+            retriever_name = self.retriever.__name__
+            # The retriever is created inside the search, which a replayed cassette does without API keys
+            search = lambda: self.retriever(sub_query).search()
+            if self.cassette is not None:
+                search = partial(self.cassette.call, "search", {"retriever": retriever_name, "query": sub_query},
+                                 retriever_name, search)
+            with span("retriever.search", retriever=retriever_name, query=sub_query) as search_span:
+                try:
+                    search_results = await asyncio.to_thread(search) or []
+                except Exception:
+                    RETRIEVER_SEARCHES.inc(retriever=retriever_name, outcome="error")
+                    raise
+                finally:
+                    RETRIEVER_SEARCH_SECONDS.observe(time.perf_counter() - start, retriever=retriever_name)
+                search_span.set(results=len(search_results))
+            RETRIEVER_SEARCHES.inc(retriever=retriever_name, outcome="success" if search_results else "empty")
+            self.record_latency("search", start)
+            new_search_urls = await self.get_new_urls([url.get("href") for url in search_results])
+
+            if self.cfg.research_mode == "fast":
+                new_results = [result for result in search_results if result.get("href") in new_search_urls]
+                return await self.run_fast_sub_query(sub_query, new_results)
+
+            # Scrape Urls
+            # await stream_output("logs", f"📝Scraping urls {new_search_urls}...\n", self.websocket)
+            start = time.perf_counter()
+            if self.cfg.scrape_budget_tokens or self.cfg.scrape_budget_passages:
+                content = await self.scrape_by_relevance(sub_query, search_results, new_search_urls)
+            else:
+                content = await asyncio.to_thread(scrape_urls, new_search_urls, self.cfg)
+            self.record_latency("scrape", start)
+            await stream_output("logs", f"🤔Researching for relevant information...\n", self.websocket)
+            # Summarize Raw Data
+            start = time.perf_counter()
+            summary = await summarize(query=sub_query, content=content, agent_role_prompt=self.role, cfg=self.cfg, websocket=self.websocket)
+            self.record_latency("summarize", start)
+
+            # Run Tasks
+            return summary
+
+    async def scrape_by_relevance(self, sub_query, search_results, urls):
+        """
+        Scrapes the urls in order of snippet relevance to the sub-query, stopping once the content budget is met
+        Args:
+            sub_query:
+            search_results: search results with 'href' and 'body'
+            urls: new urls to scrape
+
+        Returns:
+            Scraped content
+        """
+        snippets = {result.get("href"): result.get("body") or "" for result in search_results}
+        ranked_urls = sorted(urls, key=lambda url: relevance(sub_query, snippets.get(url, "")), reverse=True)
+        content, stats = await asyncio.to_thread(scrape_urls_until_budget, ranked_urls, sub_query, self.cfg)
+        self.scrape_stats[sub_query] = stats
+        await stream_output("logs", f"📚 Scraped {stats['fetched']} of {len(ranked_urls)} urls for '{sub_query}' "
+                                    f"({stats['skipped']} skipped, {stats['cancelled']} cancelled "
+                                    f"once the content budget was met)", self.websocket)
+        return content
+
+    async def run_fast_sub_query(self, sub_query, search_results):
+        """
+        Builds the context of a sub-query from the search snippets, scraping and summarizing
+        only the cfg.fast_scrape_top_n results whose snippets are most relevant to the sub-query
+        Args:
+            sub_query:
+            search_results: new search results with 'href' and 'body'
+
+        Returns:
+            Summary
+        """
+        ranked = sorted(search_results, key=lambda result: relevance(sub_query, result.get("body") or ""),
+                        reverse=True)
+        top_results, rest = ranked[:self.cfg.fast_scrape_top_n], ranked[self.cfg.fast_scrape_top_n:]
 
-        # Scrape Urls
-        # await stream_output("logs", f"📝Scraping urls {new_search_urls}...\n", self.websocket)
-        content = scrape_urls(new_search_urls, self.cfg)
-        await stream_output("logs", f"🤔Researching for relevant information...\n", self.websocket)
-        # Summarize Raw Data
-        summary = await summarize(query=sub_query, content=content, agent_role_prompt=self.role, cfg=self.cfg, websocket=self.websocket)
+        summary = []
+        if top_results:
+            start = time.perf_counter()
+            content = await asyncio.to_thread(scrape_urls, [result["href"] for result in top_results], self.cfg)
+            self.record_latency("scrape", start)
+            start = time.perf_counter()
+            summary = await summarize(query=sub_query, content=content, agent_role_prompt=self.role,
+                                      cfg=self.cfg, websocket=self.websocket)
+            self.record_latency("summarize", start)
+            # Fall back to the snippet of any top result that could not be scraped
+            summarized = {item["url"] for item in summary if item["summary"]}
+            rest = [result for result in top_results if result["href"] not in summarized] + rest
 
-        # Run Tasks
+        summary += [{"url": result["href"], "summary": result["body"]} for result in rest if result.get("body")]
+        await stream_output("logs", f"⚡ Using {len(summary)} search snippets and summaries for '{sub_query}'",
+                            self.websocket)
         return summary
 
@@ -0,0 +1,55 @@
+import os
+import re
+import json
+
+
+class CheckpointStore:
+    """
+    Local store of research run checkpoints, one JSON file per run ID
+    """
+    def __init__(self, directory):
+        """
+        Initialize the CheckpointStore class.
+        Args:
+            directory: directory holding the checkpoint files
+        """
+        self.directory = directory
+
+    def path(self, run_id):
+        """ Gets the checkpoint file path of a run.
+        Args: run_id (str): The run ID
+        Returns: str: The checkpoint file path
+        """
+        safe_run_id = re.sub(r"[^\w.-]", "_", str(run_id))
+        return os.path.join(self.directory, f"{safe_run_id}.json")
+
+    def load(self, run_id):
+        """ Loads the last checkpoint of a run.
+        Args: run_id (str): The run ID
+        Returns: dict: The checkpointed state, or None if the run has no readable checkpoint
+        """
+        try:
+            with open(self.path(run_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, run_id, state):
+        """ Atomically replaces the checkpoint of a run.
+        Args: run_id (str): The run ID
+              state (dict): The JSON serializable state
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(run_id)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    def delete(self, run_id):
+        """ Deletes the checkpoint of a run.
+        Args: run_id (str): The run ID
+        """
+        try:
+            os.remove(self.path(run_id))
+        except FileNotFoundError:
+            pass
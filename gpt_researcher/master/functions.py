@@ -1,10 +1,30 @@
+import os
 import asyncio
+import time
+import re
 from gpt_researcher.utils.llm import *
 from gpt_researcher.scraper import Scraper
 from gpt_researcher.master.prompts import *
+from gpt_researcher.utils.similarity import relevance, tokenize, stem_terms, jaccard
+from gpt_researcher.utils.tokens import count_tokens
+from gpt_researcher.utils.chunking import chunk_text
+from gpt_researcher.utils.budget import get_current_budget
+from gpt_researcher.utils.urls import canonicalize_url
+from gpt_researcher.utils.usage import get_current_usage
+from gpt_researcher.memory import get_memory
 import json
 
 
+DEFAULT_AGENT_ROLE_PROMPT = "You are an AI critical thinker research assistant. Your sole purpose is to write well " \
+                            "written, critically acclaimed, objective and structured reports on given text."
+# Terms every role prompt shares, from the default prompt and the examples of auto_agent_instructions
+ROLE_PROMPT_BOILERPLATE = frozenset(
+    "you ai assistant your sole main primary purpose goal objective write compose produce draft well written "
+    "comprehensive insightful astute impartial unbiased methodically systematically arranged structured engaging "
+    "report based provided given data experienced seasoned".split()
+)
+
+
 def get_retriever(retriever):
     """
     Gets the retriever
@@ -31,6 +51,12 @@ def get_retriever(retriever):
         case "serp":
             from gpt_researcher.retrievers import SerpSearch
             retriever = SerpSearch
+        case "local":
+            from gpt_researcher.retrievers import LocalSearch
+            retriever = LocalSearch
+        case "mock":
+            from gpt_researcher.retrievers import MockSearch
+            retriever = MockSearch
 
         case _:
             raise Exception("Retriever not found.")
@@ -56,12 +82,31 @@ async def choose_agent(query, cfg):
                 {"role": "system", "content": f"{auto_agent_instructions()}"},
                 {"role": "user", "content": f"task: {query}"}],
             temperature=0,
-            llm_provider=cfg.llm_provider
+            llm_provider=cfg.llm_provider,
+            call_type="agent",
+            validate=lambda response: json.loads(response)["agent_role_prompt"]
         )
         agent_dict = json.loads(response)
         return agent_dict["server"], agent_dict["agent_role_prompt"]
     except Exception as e:
-        return "Default Agent", "You are an AI critical thinker research assistant. Your sole purpose is to write well written, critically acclaimed, objective and structured reports on given text."
+        return "Default Agent", DEFAULT_AGENT_ROLE_PROMPT
+
+
+def role_similarity(agent, agent_role_prompt, default_role_prompt=DEFAULT_AGENT_ROLE_PROMPT):
+    """
+    Compares a chosen role to the default one by the terms that set the role prompts apart
+    Args:
+        agent: chosen server, e.g. "💰 Finance Agent"
+        agent_role_prompt: chosen agent role prompt
+        default_role_prompt: role prompt to compare with
+
+    Returns:
+        word Jaccard similarity of the role prompts without their shared boilerplate, 1 for the default agent
+    """
+    if agent == "Default Agent" or agent_role_prompt == default_role_prompt:
+        return 1.0
+    return jaccard(stem_terms(agent_role_prompt) - ROLE_PROMPT_BOILERPLATE,
+                   stem_terms(default_role_prompt) - ROLE_PROMPT_BOILERPLATE)
 
 
 async def get_sub_queries(query, agent_role_prompt, cfg):
@@ -83,12 +128,87 @@ async def get_sub_queries(query, agent_role_prompt, cfg):
             {"role": "system", "content": f"{agent_role_prompt}"},
             {"role": "user", "content": generate_search_queries_prompt(query, max_iterations=max_research_iterations)}],
         temperature=0,
-        llm_provider=cfg.llm_provider
+        llm_provider=cfg.llm_provider,
+        call_type="sub_queries",
+        validate=lambda response: isinstance(json.loads(response), list)
     )
     sub_queries = json.loads(response)
     return sub_queries
 
 
+def merge_duplicate_sub_queries(query, sub_queries, threshold):
+    """
+    Keeps one query per group of sub queries asking for the same angle of the original query.
+    Queries are compared by the words they add to the original query, so that a shared wording does not make
+    "... in children" and "... in adults" duplicates. Sub queries adding no word to the original query are
+    dropped, as the original query is always run.
+    Args:
+        query: original query
+        sub_queries: generated sub queries
+        threshold: word Jaccard similarity of the added words from which two queries are considered duplicates
+
+    Returns:
+        unique: the original query followed by the distinct sub queries
+        duplicates: the dropped queries
+
+    """
+    query_terms = stem_terms(query)
+    kept, kept_angles, duplicates = [], [], []
+    for candidate in sub_queries:
+        angle = stem_terms(candidate) - query_terms
+        if not angle or any(jaccard(angle, other) >= threshold for other in kept_angles):
+            duplicates.append(candidate)
+            continue
+        kept.append(candidate)
+        kept_angles.append(angle)
+    return [query] + kept, duplicates
+
+
+async def get_replacement_sub_queries(query, existing_queries, count, agent_role_prompt, cfg):
+    """
+    Asks for sub queries covering other angles than the existing ones
+    Args:
+        query: original query
+        existing_queries: queries already planned
+        count: number of queries to ask for
+        agent_role_prompt: agent role prompt
+        cfg: Config
+
+    Returns:
+        sub_queries: List of sub queries
+
+    """
+    try:
+        response = await create_chat_completion(
+            model=cfg.smart_llm_model,
+            messages=[
+                {"role": "system", "content": f"{agent_role_prompt}"},
+                {"role": "user", "content": generate_replacement_queries_prompt(query, existing_queries, count)}],
+            temperature=0,
+            llm_provider=cfg.llm_provider,
+            call_type="sub_queries",
+            validate=lambda response: isinstance(json.loads(response), list)
+        )
+        return json.loads(response)[:count]
+    except Exception as e:
+        print(f"{Fore.RED}Error in get_replacement_sub_queries: {e}{Style.RESET_ALL}")
+        return []
+
+
+def get_local_docs_path(cfg):
+    """
+    Gets the directory the scraper may read file:// links from: the documents of the local retriever
+    Args:
+        cfg: Config (optional)
+
+    Returns:
+        str: LOCAL_DOCS_PATH when the local retriever is used, None otherwise
+    """
+    if cfg is None or cfg.retriever != "local":
+        return None
+    return os.environ.get("LOCAL_DOCS_PATH")
+
+
 def scrape_urls(urls, cfg=None):
     """
     Scrapes the urls
@@ -103,12 +223,48 @@ def scrape_urls(urls, cfg=None):
     content = []
     user_agent = cfg.user_agent if cfg else "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0"
     try:
-        content = Scraper(urls, user_agent).run()
+        content = Scraper(urls, user_agent, get_local_docs_path(cfg)).run()
     except Exception as e:
         print(f"{Fore.RED}Error in scrape_urls: {e}{Style.RESET_ALL}")
     return content
 
 
+def scrape_urls_until_budget(urls, query, cfg):
+    """
+    Scrapes the urls in the given order, cfg.scrape_window at a time, until cfg.scrape_budget_tokens tokens or
+    cfg.scrape_budget_passages distinct passages relevant to the query were gathered
+    Args:
+        urls: List of urls, most relevant first
+        query: sub query the content is gathered for
+        cfg: Config
+
+    Returns:
+        content: list of dictionaries with 'url' and 'raw_content'
+        stats: fetched, skipped and cancelled url counts
+
+    """
+    tokens = 0
+    passages = set()
+
+    def is_enough(item):
+        nonlocal tokens
+        tokens += count_tokens(item['raw_content'])
+        for paragraph in item['raw_content'].split("\n"):
+            terms = tokenize(paragraph)
+            if len(terms) >= 10 and relevance(query, paragraph) >= 0.5:
+                passages.add(" ".join(terms))
+        return bool((cfg.scrape_budget_tokens and tokens >= cfg.scrape_budget_tokens) or
+                    (cfg.scrape_budget_passages and len(passages) >= cfg.scrape_budget_passages))
+
+    content, stats = [], {"fetched": 0, "skipped": 0, "cancelled": 0}
+    try:
+        scraper = Scraper(urls, cfg.user_agent, get_local_docs_path(cfg))
+        content, stats = scraper.run_until(is_enough, window=cfg.scrape_window)
+    except Exception as e:
+        print(f"{Fore.RED}Error in scrape_urls_until_budget: {e}{Style.RESET_ALL}")
+    return content, stats
+
+
 async def summarize(query, content, agent_role_prompt, cfg, websocket=None):
     """
     Asynchronously summarizes a list of URLs.
@@ -123,25 +279,44 @@ async def summarize(query, content, agent_role_prompt, cfg, websocket=None):
         list: A list of dictionaries with 'url' and 'summary'.
     """
 
+    memory = get_memory(cfg)
+
     # Function to handle each summarization task for a chunk
     async def handle_task(url, chunk):
+        remembered = await memory.lookup(url, chunk, query, agent_role_prompt,
+                                         cfg.memory_similarity_threshold) if memory else None
+        if remembered:
+            await stream_output("logs", f"♻️ Reusing summary of url: {url}", websocket)
+            return url, remembered
+        budget = get_current_budget()
+        if budget is not None and budget.exhausted("summarize"):
+            return url, ""
         summary = await summarize_url(query, chunk, agent_role_prompt, cfg)
+        if summary and memory:
+            await memory.add(url, chunk, query, agent_role_prompt, summary)
         if summary:
             await stream_output("logs", f"🌐 Summarizing url: {url}", websocket)
             await stream_output("logs", f"📃 {summary}", websocket)
         return url, summary
 
-    # Function to split raw content into chunks of 10,000 words
-    def chunk_content(raw_content, chunk_size=10000):
-        words = raw_content.split()
-        for i in range(0, len(words), chunk_size):
-            yield ' '.join(words[i:i+chunk_size])
+    # Function to split raw content into sentence aligned chunks of cfg.browse_chunk_max_length tokens
+    def chunk_content(raw_content):
+        return chunk_text(raw_content, cfg.browse_chunk_max_length, overlap=cfg.chunk_overlap,
+                          length=lambda text: count_tokens(text, cfg.fast_llm_model))
+
+    # Pack short sources into shared requests
+    batched_summaries = {}
+    if cfg.summary_batching:
+        batched_summaries = await summarize_short_sources(query, content, agent_role_prompt, cfg, memory, websocket)
 
     # Process each item one by one, but process chunks in parallel
     concatenated_summaries = []
     for item in content:
         url = item['url']
         raw_content = item['raw_content']
+        if url in batched_summaries:
+            concatenated_summaries.append({'url': url, 'summary': batched_summaries[url]})
+            continue
 
         # Create tasks for all chunks of the current URL
         chunk_tasks = [handle_task(url, chunk) for chunk in chunk_content(raw_content)]
@@ -151,12 +326,156 @@ async def summarize(query, content, agent_role_prompt, cfg, websocket=None):
 
         # Aggregate and concatenate summaries for the current URL
         summaries = [summary for _, summary in chunk_summaries if summary]
+        if cfg.summary_mode == "map_reduce" and len(summaries) > 1:
+            summaries, levels, calls = await reduce_summaries(query, summaries, agent_role_prompt, cfg)
+            if levels:
+                await stream_output("logs", f"🌲 Reduced the chunk summaries of url: {url} "
+                                            f"in {levels} levels with {calls} calls", websocket)
         concatenated_summary = ' '.join(summaries)
         concatenated_summaries.append({'url': url, 'summary': concatenated_summary})
 
     return concatenated_summaries
 
 
+async def summarize_short_sources(query, content, agent_role_prompt, cfg, memory=None, websocket=None):
+    """
+    Summarizes the sources of at most cfg.summary_batch_source_tokens tokens in shared requests
+    of up to cfg.summary_batch_token_budget tokens of content each.
+    Args:
+        query: sub query
+        content: list of dictionaries with 'url' and 'raw_content'
+        agent_role_prompt: agent role prompt
+        cfg: Config
+        memory: summary memory, if enabled
+        websocket: websocket
+
+    Returns:
+        summaries: url -> summary of the sources summarized in batches. Sources left out
+        of a batch response are missing, and are summarized on their own by the caller.
+
+    """
+    instructions_tokens = count_tokens(agent_role_prompt + generate_summary_prompt(query, ""), cfg.fast_llm_model)
+    summaries, batches, batch, batch_tokens, unbatched_tokens = {}, [], [], 0, 0
+    for item in content:
+        tokens = count_tokens(item['raw_content'], cfg.fast_llm_model)
+        if tokens > cfg.summary_batch_source_tokens:
+            continue
+        remembered = await memory.lookup(item['url'], item['raw_content'].strip(), query, agent_role_prompt,
+                                         cfg.memory_similarity_threshold) if memory else None
+        if remembered:
+            summaries[item['url']] = remembered
+            continue
+        unbatched_tokens += instructions_tokens + tokens
+        if batch and batch_tokens + tokens > cfg.summary_batch_token_budget:
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    # A single source gains nothing from batching
+    batches = [batch for batch in batches if len(batch) > 1]
+    if not batches:
+        return summaries
+
+    budget = get_current_budget()
+    if budget is not None and budget.exhausted("summarize"):
+        return summaries
+    results = await asyncio.gather(*[summarize_batch(query, batch, agent_role_prompt, cfg) for batch in batches])
+    missing = 0
+    for batch, result in zip(batches, results):
+        for item in batch:
+            summary = result.get(item['url'])
+            missing += not summary
+            if summary:
+                summaries[item['url']] = summary
+                if memory:
+                    await memory.add(item['url'], item['raw_content'].strip(), query, agent_role_prompt, summary)
+
+    num_sources = sum(len(batch) for batch in batches)
+    batched_tokens = sum(instructions_tokens + sum(count_tokens(item['raw_content'], cfg.fast_llm_model)
+                                                   for item in batch) for batch in batches)
+    await stream_output("logs", f"📦 Summarized {num_sources} short sources in {len(batches)} requests "
+                                f"(~{batched_tokens} prompt tokens) instead of {num_sources} requests "
+                                f"(~{unbatched_tokens} prompt tokens), {missing} left out of the responses "
+                                f"are summarized separately", websocket)
+    return summaries
+
+
+async def summarize_batch(query, sources, agent_role_prompt, cfg):
+    """
+    Summarizes several sources in a single request
+    Args:
+        query: sub query
+        sources: list of dictionaries with 'url' and 'raw_content'
+        agent_role_prompt: agent role prompt
+        cfg: Config
+
+    Returns:
+        summaries: url -> summary, empty if the response could not be parsed
+
+    """
+    try:
+        response = await create_chat_completion(
+            model=cfg.fast_llm_model,
+            messages=[
+                {"role": "system", "content": f"{agent_role_prompt}"},
+                {"role": "user", "content": f"{generate_batch_summary_prompt(query, sources)}"}],
+            temperature=0,
+            llm_provider=cfg.llm_provider,
+            call_type="summarize",
+            validate=lambda response: isinstance(parse_json_response(response), dict)
+        )
+        summaries = parse_json_response(response)
+        return {url: summary for url, summary in summaries.items() if isinstance(summary, str)}
+    except Exception as e:
+        print(f"{Fore.RED}Error in summarize_batch: {e}{Style.RESET_ALL}")
+        return {}
+
+
+def parse_json_response(response):
+    """
+    Parses a JSON response, tolerating a surrounding markdown code block
+    Args:
+        response: LLM response
+
+    Returns:
+        The parsed JSON value
+    """
+    response = re.sub(r"^```\w*\s*|\s*```$", "", response.strip())
+    return json.loads(response)
+
+
+async def reduce_summaries(query, summaries, agent_role_prompt, cfg):
+    """
+    Reduces the chunk summaries of a source in a tree of cfg.summary_reduce_fan_in summaries per
+    reduce step, until they fit cfg.source_token_budget tokens. Reduce steps of a level run in parallel.
+    Args:
+        query: sub query
+        summaries: chunk summaries of the source, in document order
+        agent_role_prompt: agent role prompt
+        cfg: Config
+
+    Returns:
+        summaries: the reduced summaries
+        levels: number of reduce levels
+        calls: number of reduce calls
+
+    """
+    fan_in = max(cfg.summary_reduce_fan_in, 2)
+    levels = calls = 0
+    while len(summaries) > 1 and count_tokens(' '.join(summaries)) > cfg.source_token_budget:
+        groups = [summaries[i:i + fan_in] for i in range(0, len(summaries), fan_in)]
+        reduced = await asyncio.gather(*[summarize_url(query, "\n\n".join(group), agent_role_prompt, cfg)
+                                         for group in groups if len(group) > 1])
+        reduced = iter(reduced)
+        # A failed reduce step keeps its group concatenated, so every level still shrinks the list
+        summaries = [(next(reduced) or "\n\n".join(group)) if len(group) > 1 else group[0] for group in groups]
+        levels += 1
+        calls += sum(1 for group in groups if len(group) > 1)
+    return summaries, levels, calls
+
+
 async def summarize_url(query, raw_data, agent_role_prompt, cfg):
     """
     Summarizes the text
@@ -178,7 +497,9 @@ async def summarize_url(query, raw_data, agent_role_prompt, cfg):
                 {"role": "system", "content": f"{agent_role_prompt}"},
                 {"role": "user", "content": f"{generate_summary_prompt(query, raw_data)}"}],
             temperature=0,
-            llm_provider=cfg.llm_provider
+            llm_provider=cfg.llm_provider,
+            call_type="summarize",
+            validate=lambda response: response.strip()
         )
     except Exception as e:
         print(f"{Fore.RED}Error in summarize: {e}{Style.RESET_ALL}")
@@ -203,6 +524,17 @@ async def generate_report(query, context, agent_role_prompt, report_type, websoc
     """
     generate_prompt = get_report_by_type(report_type)
     report = ""
+    max_tokens = cfg.smart_token_limit
+    budget = get_current_budget()
+    if budget is not None and budget.tokens_left_for("report") is not None:
+        # Leave the report at least a short answer even when the research used up the budget
+        prompt_tokens = count_tokens(generate_prompt(query, context, cfg.report_format, cfg.total_words))
+        max_tokens = max(min(max_tokens, budget.tokens_left_for("report") - prompt_tokens), 256)
+    ledger = get_current_usage()
+    if budget is not None and budget.cost_left_for("report") is not None and ledger is not None:
+        prompt_tokens = count_tokens(generate_prompt(query, context, cfg.report_format, cfg.total_words))
+        max_tokens = max(min(max_tokens, ledger.affordable_completion_tokens(
+            cfg.smart_llm_model, prompt_tokens, budget.cost_left_for("report"))), 256)
     try:
         report = await create_chat_completion(
             model=cfg.smart_llm_model,
@@ -213,7 +545,8 @@ async def generate_report(query, context, agent_role_prompt, report_type, websoc
             llm_provider=cfg.llm_provider,
             stream=True,
             websocket=websocket,
-            max_tokens=cfg.smart_token_limit
+            max_tokens=max_tokens,
+            call_type="report"
         )
     except Exception as e:
         print(f"{Fore.RED}Error in generate_report: {e}{Style.RESET_ALL}")
@@ -221,6 +554,161 @@ async def generate_report(query, context, agent_role_prompt, report_type, websoc
     return report
 
 
+async def generate_draft(query, context, previous_draft, agent_role_prompt, cfg):
+    """
+    drafts an executive summary of the research done so far, or refines the previous draft with new summaries
+    Args:
+        query:
+        context: the summaries added since the previous draft, with 'url' and 'summary'
+        previous_draft: the previous draft, None for the first one
+        agent_role_prompt:
+        cfg:
+
+    Returns:
+        draft: the new draft, the previous draft if it could not be refined
+
+    """
+    try:
+        draft = await create_chat_completion(
+            model=cfg.fast_llm_model,
+            messages=[
+                {"role": "system", "content": f"{agent_role_prompt}"},
+                {"role": "user", "content": generate_draft_prompt(query, context, previous_draft)}],
+            temperature=0,
+            llm_provider=cfg.llm_provider,
+            max_tokens=cfg.fast_token_limit,
+            call_type="draft"
+        )
+        return draft or previous_draft
+    except Exception as e:
+        print(f"{Fore.RED}Error in generate_draft: {e}{Style.RESET_ALL}")
+        return previous_draft
+
+
+async def generate_sectioned_report(query, context, agent_role_prompt, report_type, websocket, cfg):
+    """
+    generates the final report section by section: an outline is planned first, then every section is written
+    concurrently from the context most relevant to it, and the sections are streamed in order as they finish,
+    followed by a shared reference list. Falls back to generate_report if no outline could be planned.
+    Args:
+        query:
+        context: list of the summary lists of every sub-query, with 'url' and 'summary'
+        agent_role_prompt:
+        report_type:
+        websocket:
+        cfg:
+
+    Returns:
+        report:
+
+    """
+    items = [item for summaries in context for item in summaries if item.get("summary")]
+    if report_type != "research_report" or not items:
+        return await generate_report(query, context, agent_role_prompt, report_type, websocket, cfg)
+
+    # Plan the outline from the start of every summary
+    overview = [{"url": item["url"], "summary": item["summary"][:500]} for item in items]
+    budget = get_current_budget()
+    try:
+        outline = parse_json_response(await asyncio.wait_for(create_chat_completion(
+            model=cfg.smart_llm_model,
+            messages=[
+                {"role": "system", "content": f"{agent_role_prompt}"},
+                {"role": "user", "content": generate_report_outline_prompt(query, overview, cfg.total_words,
+                                                                           cfg.report_max_sections)}],
+            temperature=0,
+            llm_provider=cfg.llm_provider,
+            call_type="report",
+            validate=lambda response: parse_json_response(response)["sections"]
+        ), budget.time_left() if budget is not None else None))
+        title = outline.get("title") or query
+        sections = [section for section in outline["sections"] if section.get("title")][:cfg.report_max_sections]
+    except Exception as e:
+        print(f"{Fore.RED}Error in generate_sectioned_report: {e}{Style.RESET_ALL}")
+        sections = []
+    if not sections:
+        return await generate_report(query, context, agent_role_prompt, report_type, websocket, cfg)
+    titles = [section["title"] for section in sections]
+    await stream_output("logs", f"🗂️ Writing {len(sections)} report sections in parallel: {titles}", websocket)
+
+    words = max(cfg.total_words // len(sections), 100)
+    max_tokens = min(cfg.smart_token_limit, words * 3)
+    if budget is not None and budget.tokens_left_for("report") is not None:
+        max_tokens = max(min(max_tokens, budget.tokens_left_for("report") // len(sections)
+                             - cfg.section_context_tokens), 256)
+    ledger = get_current_usage()
+    if budget is not None and budget.cost_left_for("report") is not None and ledger is not None:
+        max_tokens = max(min(max_tokens, ledger.affordable_completion_tokens(
+            cfg.smart_llm_model, cfg.section_context_tokens, budget.cost_left_for("report") / len(sections))), 256)
+
+    # Function to select the items most relevant to a section, up to cfg.section_context_tokens tokens
+    def section_context(section):
+        topic = f"{query} {section['title']} {section.get('description', '')}"
+        selected, tokens = [], 0
+        for item in sorted(items, key=lambda item: relevance(topic, item["summary"]), reverse=True):
+            item_tokens = count_tokens(item["summary"], cfg.smart_llm_model)
+            if selected and tokens + item_tokens > cfg.section_context_tokens:
+                continue
+            selected.append(item)
+            tokens += item_tokens
+        return selected
+
+    async def write_section(section, section_items):
+        try:
+            return await create_chat_completion(
+                model=cfg.smart_llm_model,
+                messages=[
+                    {"role": "system", "content": f"{agent_role_prompt}"},
+                    {"role": "user", "content": generate_report_section_prompt(
+                        query, section["title"], section.get("description", ""), titles, section_items,
+                        cfg.report_format, words)}],
+                temperature=0,
+                llm_provider=cfg.llm_provider,
+                max_tokens=max_tokens,
+                call_type="report"
+            )
+        except Exception as e:
+            print(f"{Fore.RED}Error in write_section: {e}{Style.RESET_ALL}")
+            return ""
+
+    section_items = [section_context(section) for section in sections]
+    tasks = [asyncio.create_task(write_section(section, selected))
+             for section, selected in zip(sections, section_items)]
+
+    # Stream the sections in order, each as soon as it and all sections before it are written,
+    # until the research deadline
+    time_left = budget.time_left() if budget is not None else None
+    deadline = time.monotonic() + time_left if time_left is not None else None
+    report = heading = f"# {title}\n\n"
+    try:
+        for i, task in enumerate(tasks):
+            try:
+                section = (await asyncio.wait_for(task, None if deadline is None
+                                                  else max(deadline - time.monotonic(), 0.0))).strip()
+            except asyncio.TimeoutError:
+                await stream_output("logs", f"⏰ Research deadline reached, leaving out {len(tasks) - i} "
+                                            f"unwritten report sections", websocket)
+                break
+            if section:
+                report += section + "\n\n"
+                await stream_output("report", heading + section + "\n\n", websocket)
+                heading = ""
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # Deduplicate the sources of all sections by their canonical url, in order of first use
+    references, seen = [], set()
+    for selected in section_items:
+        for item in selected:
+            if canonicalize_url(item["url"]) not in seen:
+                seen.add(canonicalize_url(item["url"]))
+                references.append(item["url"])
+    references = "## References\n\n" + "\n".join(f"- {url}" for url in references) + "\n"
+    await stream_output("report", references, websocket)
+    return report + references
+
+
 async def stream_output(type, output, websocket=None, logging=True):
     """
     Streams output to the websocket
@@ -231,6 +719,10 @@ async def stream_output(type, output, websocket=None, logging=True):
     Returns:
         None
     """
+    if type in ("draft", "report"):
+        budget = get_current_budget()
+        if budget is not None:
+            budget.record_output(type)
     if not websocket or logging:
         print(output)
 
@@ -1,4 +1,14 @@
-from datetime import datetime
+from datetime import date
+
+# Prompts start with their stable instructions and end with the variable payload (query, context, text),
+# so that providers can reuse the cached prefix of repeated calls. The date only changes once per day.
+
+
+def current_date():
+    """ Gets the current date, pinned to day granularity so that prompt prefixes stay stable within a day.
+    Returns: str: The current date, e.g. "January 01, 2024"
+    """
+    return date.today().strftime("%B %d, %Y")
 
 
 def generate_search_queries_prompt(question, max_iterations=3):
@@ -7,9 +17,27 @@ def generate_search_queries_prompt(question, max_iterations=3):
     Returns: str: The search queries prompt for the given question
     """
 
-    return f'Write {max_iterations} google search queries to search online that form an objective opinion from the following: "{question}"' \
-           f'Use the current date if needed: {datetime.now().strftime("%B %d, %Y")}.\n' \
-           f'You must respond with a list of strings in the following format: ["query 1", "query 2", "query 3"].'
+    return f'Write {max_iterations} google search queries to search online that form an objective opinion from the task or question below.\n' \
+           f'Use the current date if needed: {current_date()}.\n' \
+           f'You must respond with a list of strings in the following format: ["query 1", "query 2", "query 3"].\n\n' \
+           f'Task or question: "{question}"'
+
+
+def generate_replacement_queries_prompt(question, existing_queries, count):
+    """ Generates the prompt asking for search queries that cover different angles than the existing ones.
+    Args: question (str): The question to generate the search queries for
+            existing_queries (list[str]): The queries already planned
+            count (int): The number of new queries
+    Returns: str: The replacement search queries prompt
+    """
+
+    return f'Write {count} google search queries to search online that form an objective opinion from the task or question below.\n' \
+           f'Each new query must cover a different angle of the question than all of the already planned queries, ' \
+           f'and must not be a paraphrase of them or of each other.\n' \
+           f'Use the current date if needed: {current_date()}.\n' \
+           f'You must respond with a list of strings in the following format: ["query 1", "query 2", "query 3"].\n\n' \
+           f'Task or question: "{question}"\n' \
+           f'Already planned queries: {existing_queries}'
 
 
 def generate_report_prompt(question, context, report_format="apa", total_words=1000):
@@ -19,9 +47,7 @@ def generate_report_prompt(question, context, report_format="apa", total_words=1
     Returns: str: The report prompt for the given question and research summary
     """
 
-    return f'Information: """{context}"""\n\n' \
-           f'Using the above information, answer the following' \
-           f' query or task: "{question}" in a detailed report --' \
+    return f'Using the information below, answer the query or task below in a detailed report --' \
            " The report should focus on the answer to the query, should be well structured, informative," \
            f" in depth and comprehensive, with facts and numbers if available and a minimum of {total_words} words.\n" \
            "You should strive to write the report as long as you can using all relevant and necessary information provided.\n" \
@@ -34,7 +60,77 @@ def generate_report_prompt(question, context, report_format="apa", total_words=1
             relevant results that answer the query accurately. Place these citations at the end \
             of the sentence or paragraph that reference them.\n"\
             f"Please do your best, this is very important to my career. " \
-            f"Assume that the current date is {datetime.now().strftime('%B %d, %Y')}"
+            f"Assume that the current date is {current_date()}.\n\n" \
+            f'Query or task: "{question}"\n\n' \
+            f'Information: """{context}"""'
+
+
+def generate_report_outline_prompt(question, context, total_words=1000, max_sections=6):
+    """ Generates the prompt asking for the outline of a report written section by section.
+    Args: question (str): The question to outline the report for
+            context (str): The research summary to outline the report from
+            total_words (int): The minimum length of the whole report
+            max_sections (int): The maximum number of sections
+    Returns: str: The report outline prompt for the given question and research summary
+    """
+
+    return f'Using the information below, plan the sections of a detailed research report of at least {total_words} words' \
+           f' answering the query or task below. Use at most {max_sections} sections, including an introduction' \
+           ' and a conclusion, and do not plan a references section.\n' \
+           'You must respond with a JSON object in the following format: {"title": "report title", "sections": ' \
+           '[{"title": "section title", "description": "what the section covers"}]}.\n\n' \
+           f'Query or task: "{question}"\n\n' \
+           f'Information: """{context}"""'
+
+
+def generate_report_section_prompt(question, title, description, outline, context, report_format="apa",
+                                   total_words=200):
+    """ Generates the prompt writing one section of a report written section by section.
+    Args: question (str): The question the report answers
+            title (str): The title of the section
+            description (str): What the section covers
+            outline (list[str]): The titles of all sections of the report, in order
+            context (str): The research summary relevant to the section
+            report_format (str): The citation format
+            total_words (int): The minimum length of the section
+    Returns: str: The report section prompt
+    """
+
+    return f'Using the information below, write one section of a detailed report answering the query or task below.' \
+           f' The section should be well structured, informative, in depth, with facts and numbers if available' \
+           f' and a minimum of {total_words} words.\n' \
+           'You must write the section with markdown syntax, starting with its title as a "##" heading.\n' \
+           'Use an unbiased and journalistic tone. Only cover what the section is about, the other sections of' \
+           ' the report are written separately.\n' \
+           f'Cite search results using inline notations in {report_format} format, with the source url. Do NOT write a' \
+           ' references list, it is added to the report separately.\n' \
+           f'Assume that the current date is {current_date()}.\n\n' \
+           f'Query or task: "{question}"\n\n' \
+           f'Report sections: {outline}\n\n' \
+           f'Section: "{title}" - {description}\n\n' \
+           f'Information: """{context}"""'
+
+
+def generate_draft_prompt(question, context, previous_draft=None):
+    """ Generates the prompt drafting an executive summary while the research is still in progress.
+    Args: question (str): The question the research answers
+            context (str): The research summaries gathered since the previous draft
+            previous_draft (str): The previous draft, None for the first one
+    Returns: str: The draft prompt
+    """
+
+    if previous_draft is None:
+        return 'Using the information below, write a short executive summary in markdown syntax answering the' \
+               ' query or task below. The research is still in progress, so state the key findings so far and' \
+               ' what is still open. Use bullet points and include facts and numbers if available.\n\n' \
+               f'Query or task: "{question}"\n\n' \
+               f'Information: """{context}"""'
+    return 'Refine and extend the draft executive summary below with the new information below, keeping its' \
+           ' markdown structure. Add the new key findings, correct what the new information contradicts and' \
+           ' keep it short. The research is still in progress.\n\n' \
+           f'Query or task: "{question}"\n\n' \
+           f'Draft: """{previous_draft}"""\n\n' \
+           f'New information: """{context}"""'
 
 
 def generate_resource_report_prompt(question, context, report_format="apa", total_words=1000):
@@ -47,13 +143,15 @@ def generate_resource_report_prompt(question, context, report_format="apa", tota
     Returns:
         str: The resource report prompt for the given question and research summary.
     """
-    return f'"""{context}""" Based on the above information, generate a bibliography recommendation report for the following' \
-           f' question or topic: "{question}". The report should provide a detailed analysis of each recommended resource,' \
+    return 'Based on the information below, generate a bibliography recommendation report for the question' \
+           ' or topic below. The report should provide a detailed analysis of each recommended resource,' \
            ' explaining how each source can contribute to finding answers to the research question.' \
            ' Focus on the relevance, reliability, and significance of each source.' \
            ' Ensure that the report is well-structured, informative, in-depth, and follows Markdown syntax.' \
            ' Include relevant facts, figures, and numbers whenever available.' \
-           ' The report should have a minimum length of 1,200 words.'
+           ' The report should have a minimum length of 1,200 words.\n\n' \
+           f'Question or topic: "{question}"\n\n' \
+           f'Information: """{context}"""'
 
 
 def generate_outline_report_prompt(question, context, report_format="apa", total_words=1000):
@@ -63,11 +161,13 @@ def generate_outline_report_prompt(question, context, report_format="apa", total
     Returns: str: The outline report prompt for the given question and research summary
     """
 
-    return f'"""{context}""" Using the above information, generate an outline for a research report in Markdown syntax' \
-           f' for the following question or topic: "{question}". The outline should provide a well-structured framework' \
+    return 'Using the information below, generate an outline for a research report in Markdown syntax' \
+           ' for the question or topic below. The outline should provide a well-structured framework' \
            ' for the research report, including the main sections, subsections, and key points to be covered.' \
            ' The research report should be detailed, informative, in-depth, and a minimum of 1,200 words.' \
-           ' Use appropriate Markdown syntax to format the outline and ensure readability.'
+           ' Use appropriate Markdown syntax to format the outline and ensure readability.\n\n' \
+           f'Question or topic: "{question}"\n\n' \
+           f'Information: """{context}"""'
 
 
 def get_report_by_type(report_type):
@@ -113,7 +213,25 @@ def generate_summary_prompt(query, data):
     Returns: str: The summary prompt for the given question and text
     """
 
-    return f'{data}\n Using the above text, summarize it based on the following task or query: "{query}".\n If the ' \
+    return f'Summarize the text below based on the task or query below.\n If the ' \
            f'query cannot be answered using the text, YOU MUST summarize the text in short.\n Include all factual ' \
-           f'information such as numbers, stats, quotes, etc if available. '
+           f'information such as numbers, stats, quotes, etc if available.\n\n' \
+           f'Task or query: "{query}"\n\n' \
+           f'Text: """{data}"""'
+
+
+def generate_batch_summary_prompt(query, sources):
+    """ Generates the prompt summarizing several sources in one request.
+    Args: query (str): The question to generate the summary prompt for
+            sources (list[dict]): The sources, with 'url' and 'raw_content'
+    Returns: str: The batch summary prompt for the given question and sources
+    """
 
+    sections = "\n\n".join(f'<source url="{source["url"]}">\n{source["raw_content"]}\n</source>' for source in sources)
+    return f'Summarize each of the sources below separately based on the task or query below.\n ' \
+           f'If the query cannot be answered using a source, YOU MUST summarize that source in short.\n ' \
+           f'Include all factual information such as numbers, stats, quotes, etc if available.\n ' \
+           f'You must respond with a JSON object mapping the url of every source to its summary, in the following ' \
+           f'format: {{"url 1": "summary 1", "url 2": "summary 2"}}.\n\n' \
+           f'Task or query: "{query}"\n\n' \
+           f'{sections}'
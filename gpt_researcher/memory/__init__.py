@@ -0,0 +1,3 @@
+from .local import LocalMemory, get_memory
+
+__all__ = ['LocalMemory', 'get_memory']
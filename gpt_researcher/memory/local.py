@@ -0,0 +1,167 @@
+import os
+import math
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+from gpt_researcher.utils.similarity import tokenize
+
+_memories = {}
+_memories_lock = threading.Lock()
+# Inserts between two evictions of the records beyond the size and age bounds
+PRUNE_INTERVAL = 100
+
+
+def get_memory(cfg):
+    """
+    Gets the summary memory configured by cfg.memory_backend
+    Args:
+        cfg: Config
+
+    Returns:
+        memory: LocalMemory, or None when the memory is disabled
+    """
+    if cfg.memory_backend != "local":
+        return None
+    with _memories_lock:
+        memory = _memories.get(cfg.memory_path)
+        if memory is None:
+            memory = LocalMemory(cfg.memory_path, cfg.memory_max_records, cfg.memory_max_age_days)
+            _memories[cfg.memory_path] = memory
+    return memory
+
+
+def cosine_similarity(first, second):
+    """
+    Cosine similarity of the term frequencies of two texts
+    Args:
+        first: first text
+        second: second text
+
+    Returns:
+        similarity: float between 0 and 1
+    """
+    first_terms, second_terms = Counter(tokenize(first)), Counter(tokenize(second))
+    dot = sum(count * second_terms[term] for term, count in first_terms.items())
+    norm = math.sqrt(sum(c * c for c in first_terms.values())) * math.sqrt(sum(c * c for c in second_terms.values()))
+    return dot / norm if norm else 0.0
+
+
+class LocalMemory:
+    """
+    Persistent memory of page summaries across research runs, stored in SQLite.
+    A summary is reused when the same content was summarized before, with the same agent role prompt,
+    for a similar enough sub-query. Queries run in a worker thread, off the event loop.
+    """
+    def __init__(self, path, max_records=50000, max_age_days=30):
+        """
+        Initialize the LocalMemory class.
+        Args:
+            path: SQLite database file
+            max_records: number of summaries kept, least recently used ones are evicted first
+            max_age_days: summaries older than this are evicted
+        """
+        self.max_records = max_records
+        self.max_age = max_age_days * 24 * 3600
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                sub_query TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                role_hash TEXT NOT NULL DEFAULT ''
+            )""")
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(summaries)")]
+        if "role_hash" not in columns:
+            # Summaries stored before the role was part of the key are never matched again
+            self.connection.execute("ALTER TABLE summaries ADD COLUMN role_hash TEXT NOT NULL DEFAULT ''")
+        self.connection.execute("DROP INDEX IF EXISTS summaries_content")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS summaries_content_role ON summaries (content_hash, url, role_hash)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+        self.connection.commit()
+        self.inserts = 0
+        self.prune()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(content.encode("utf-8", errors="replace")).hexdigest()
+
+    async def lookup(self, url, content, sub_query, agent_role_prompt, threshold):
+        """
+        Finds a summary of the same content made with the same role prompt for a similar sub-query
+        Args:
+            url: source url
+            content: the summarized content
+            sub_query: the sub-query the summary is needed for
+            agent_role_prompt: the agent role prompt the summary is needed with
+            threshold: minimal cosine similarity between the sub-queries
+
+        Returns:
+            summary: the best matching summary, or None
+        """
+        return await asyncio.to_thread(self._lookup, url, content, sub_query, agent_role_prompt, threshold)
+
+    def _lookup(self, url, content, sub_query, agent_role_prompt, threshold):
+        content_hash, role_hash = self.content_hash(content), self.content_hash(agent_role_prompt)
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, sub_query, summary FROM summaries "
+                "WHERE content_hash = ? AND url = ? AND role_hash = ? AND created >= ?",
+                (content_hash, url, role_hash, time.time() - self.max_age)).fetchall()
+            best_id, best_summary, best_similarity = None, None, threshold
+            for row_id, previous_sub_query, summary in rows:
+                similarity = cosine_similarity(sub_query, previous_sub_query)
+                if similarity >= best_similarity:
+                    best_id, best_summary, best_similarity = row_id, summary, similarity
+            if best_id is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.connection.execute("UPDATE summaries SET last_used = ? WHERE id = ?", (time.time(), best_id))
+            self.connection.commit()
+            return best_summary
+
+    async def add(self, url, content, sub_query, agent_role_prompt, summary):
+        """
+        Stores a summary, evicting the records beyond the size and age bounds every PRUNE_INTERVAL inserts
+        Args:
+            url: source url
+            content: the summarized content
+            sub_query: the sub-query the summary was made for
+            agent_role_prompt: the agent role prompt the summary was made with
+            summary: the summary
+        """
+        await asyncio.to_thread(self._add, url, content, sub_query, agent_role_prompt, summary)
+
+    def _add(self, url, content, sub_query, agent_role_prompt, summary):
+        content_hash, role_hash = self.content_hash(content), self.content_hash(agent_role_prompt)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO summaries (url, content_hash, role_hash, sub_query, summary, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (url, content_hash, role_hash, sub_query, summary, now, now))
+            self.connection.commit()
+            self.inserts += 1
+            if self.inserts % PRUNE_INTERVAL == 0:
+                self.prune()
+
+    def prune(self):
+        """Evicts the records older than the age bound, then the least recently used ones beyond the size bound"""
+        with self.lock:
+            self.connection.execute("DELETE FROM summaries WHERE created < ?", (time.time() - self.max_age,))
+            excess = self.connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0] - self.max_records
+            if excess > 0:
+                self.connection.execute(
+                    "DELETE FROM summaries WHERE id IN (SELECT id FROM summaries ORDER BY last_used LIMIT ?)", (excess,))
+            self.connection.commit()
@@ -3,5 +3,7 @@ from .duckduckgo.duckduckgo import Duckduckgo
 from .google.google import GoogleSearch
 from .serper.serper import SerpSearch
 from .searx.searx import SearxSearch
+from .local.local import LocalSearch
+from .mock.mock import MockSearch
 
-__all__ = ["TavilySearch", "Duckduckgo", "SerpSearch", "GoogleSearch", "SearxSearch"]
+__all__ = ["TavilySearch", "Duckduckgo", "SerpSearch", "GoogleSearch", "SearxSearch", "LocalSearch", "MockSearch"]
@@ -0,0 +1,359 @@
+# On-disk inverted index for the local retriever
+
+# libraries
+import os
+import re
+import json
+import mmap
+import math
+import threading
+from array import array
+import numpy as np
+from bs4 import BeautifulSoup
+
+SUPPORTED_EXTENSIONS = (".html", ".htm", ".pdf", ".txt", ".md")
+INDEX_VERSION = 1
+SNIPPET_CHARS = 8000
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase index terms
+    Args:
+        text: text to tokenize
+
+    Returns:
+        list[str]: terms
+    """
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+def load_document(path):
+    """
+    Extracts the plain text of a local HTML, PDF or text file
+    Args:
+        path: path to the file
+
+    Returns:
+        str: The text of the file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        import fitz  # PyMuPDF
+        with fitz.open(path) as doc:
+            return "\n".join(page.get_text() for page in doc)
+    with open(path, "rb") as f:
+        data = f.read()
+    if extension in (".html", ".htm"):
+        soup = BeautifulSoup(data, "lxml")
+        for script_or_style in soup(["script", "style"]):
+            script_or_style.extract()
+        lines = (line.strip() for line in soup.get_text("\n").splitlines())
+        return "\n".join(line for line in lines if line)
+    return data.decode("utf-8", errors="replace")
+
+
+class LocalIndex:
+    """
+    BM25 inverted index over a directory of documents.
+
+    The index lives in `index_path` as four files:
+        meta.json     - one [path, mtime, size, length, snippet_offset, snippet_length] row per document
+        vocab.json    - term -> [postings offset, document frequency]
+        postings.bin  - per term, `df` (doc_id, term_frequency) uint32 pairs, memory-mapped at query time
+        snippets.bin  - the first SNIPPET_CHARS characters of every document, used to build result bodies
+
+    Queries are scored with numpy directly over the memory-mapped postings, so that terms occurring in
+    most documents of a large index do not cost a Python loop iteration per posting.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, docs_path, index_path=None):
+        """
+        Initializes the LocalIndex object
+        Args:
+            docs_path: directory holding the documents
+            index_path: directory holding the index files. Defaults to `<docs_path>/.gptr_index`
+        """
+        self.docs_path = os.path.abspath(docs_path)
+        self.index_path = os.path.abspath(index_path or os.path.join(self.docs_path, ".gptr_index"))
+        self.docs = []
+        self.vocab = {}
+        self.length_norms = np.zeros(0)
+        self._postings_file = None
+        self._postings = None
+        self._snippets_file = None
+        self._snippets = None
+        # Held while the index files are replaced, as searches read them through memory maps
+        self.lock = threading.RLock()
+        # Serializes re-indexing, which reads the current index while writing the next one
+        self._update_lock = threading.Lock()
+        self.load()
+
+    def _file(self, name):
+        return os.path.join(self.index_path, name)
+
+    def load(self):
+        """
+        Loads the index from disk and memory-maps its postings
+        """
+        self.close()
+        self.docs, self.vocab, self.length_norms = [], {}, np.zeros(0)
+        if not os.path.exists(self._file("meta.json")):
+            return
+        with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            return
+        with open(self._file("vocab.json"), "r", encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self.docs = meta["docs"]
+        # BM25 length normalization k1 * (1 - b + b * length / average length) of every document
+        lengths = np.array([doc[3] for doc in self.docs], dtype=np.float64)
+        avg_length = lengths.mean() if len(lengths) and lengths.mean() else 1.0
+        self.length_norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        self._postings_file, self._postings = self._map(self._file("postings.bin"))
+        self._snippets_file, self._snippets = self._map(self._file("snippets.bin"))
+
+    @staticmethod
+    def _map(path):
+        f = open(path, "rb")
+        if os.fstat(f.fileno()).st_size == 0:
+            return f, b""
+        return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """
+        Releases the memory maps
+        """
+        for mapped in (self._postings, self._snippets):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for f in (self._postings_file, self._snippets_file):
+            if f is not None:
+                f.close()
+        self._postings = self._snippets = None
+        self._postings_file = self._snippets_file = None
+
+    def scan(self):
+        """
+        Lists the indexable files under the documents directory
+        Returns:
+            dict: path -> (mtime, size)
+        """
+        files = {}
+        for root, dirs, names in os.walk(self.docs_path):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != self.index_path and not d.startswith(".")]
+            for name in names:
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def postings(self, term):
+        """
+        Reads the postings list of a term from the memory-mapped postings file
+        Args:
+            term: index term
+
+        Returns:
+            array: flat (doc_id, term_frequency) pairs
+        """
+        entry = self.vocab.get(term)
+        pairs = array("I")
+        if entry is None:
+            return pairs
+        offset, df = entry
+        pairs.frombytes(self._postings[offset:offset + df * 2 * pairs.itemsize])
+        return pairs
+
+    def update(self):
+        """
+        Incrementally re-indexes the documents directory.
+        Only new and modified files are parsed; postings of unchanged files are carried over.
+        The new index files are written next to the current ones while searches keep running,
+        and only swapped in under `lock`.
+        Returns:
+            dict: counts of added, updated, removed and unchanged files
+        """
+        with self._update_lock:
+            files = self.scan()
+            known = {doc[0]: (doc_id, doc) for doc_id, doc in enumerate(self.docs)}
+            unchanged = {path for path, (doc_id, doc) in known.items() if files.get(path) == (doc[1], doc[2])}
+            changed = [path for path in files if path not in unchanged]
+            removed = [path for path in known if path not in files]
+            stats = {"added": len([p for p in changed if p not in known]),
+                     "updated": len([p for p in changed if p in known]),
+                     "removed": len(removed), "unchanged": len(unchanged)}
+            if not changed and not removed and os.path.exists(self._file("meta.json")):
+                return stats
+
+            # Carry over unchanged documents with compacted ids. The rows are copied, as searches
+            # still read the offsets of the current snippets from them
+            keep = [doc_id for doc_id, doc in enumerate(self.docs) if doc[0] in unchanged]
+            docs = [list(self.docs[doc_id]) for doc_id in keep]
+            snippets = [bytes(self._snippets[doc[4]:doc[4] + doc[5]]) for doc in docs]
+            inverted = self._carry_over(keep)
+
+            # Parse new and modified documents
+            added = {}
+            for path in sorted(changed):
+                try:
+                    text = load_document(path)
+                except Exception as e:
+                    print(f"Failed to index {path}: {e}")
+                    continue
+                frequencies = {}
+                terms = tokenize(text)
+                for term in terms:
+                    frequencies[term] = frequencies.get(term, 0) + 1
+                doc_id = len(docs)
+                for term, tf in frequencies.items():
+                    pairs = added.setdefault(term, array("I"))
+                    pairs.append(doc_id)
+                    pairs.append(tf)
+                mtime, size = files[path]
+                snippets.append(text[:SNIPPET_CHARS].encode("utf-8"))
+                docs.append([path, mtime, size, len(terms), 0, 0])
+            # New documents have the highest ids, so appending keeps every postings list sorted by doc_id
+            for term, pairs in added.items():
+                carried = inverted.get(term)
+                inverted[term] = pairs if carried is None else \
+                    np.concatenate((carried, np.frombuffer(pairs, dtype=np.uint32)))
+
+            self._write_files(docs, snippets, inverted)
+            with self.lock:
+                self.close()
+                self._replace_files()
+                self.load()
+            return stats
+
+    def _carry_over(self, keep):
+        """
+        Copies the postings of the kept documents out of the memory-mapped postings file,
+        renumbering them to their position in `keep`
+        Args:
+            keep: ids of the documents to carry over, in increasing order
+
+        Returns:
+            dict: term -> flat (doc_id, term_frequency) uint32 array
+        """
+        if not keep or not self.vocab:
+            return {}
+        postings = np.frombuffer(self._postings, dtype=np.uint32).reshape(-1, 2)
+        remap = np.full(len(self.docs), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        new_ids = remap[postings[:, 0]]
+        kept = new_ids >= 0
+        compacted = np.empty((int(kept.sum()), 2), dtype=np.uint32)
+        compacted[:, 0] = new_ids[kept]
+        compacted[:, 1] = postings[kept, 1]
+        compacted = compacted.ravel()
+        # Position of every pair in the compacted postings, to slice out each term's kept pairs
+        positions = np.concatenate(([0], np.cumsum(kept)))
+        terms = list(self.vocab)
+        starts = np.array([self.vocab[term][0] for term in terms], dtype=np.int64) // (2 * compacted.itemsize)
+        ends = starts + np.array([self.vocab[term][1] for term in terms], dtype=np.int64)
+        inverted = {}
+        for term, start, end in zip(terms, positions[starts].tolist(), positions[ends].tolist()):
+            if end > start:
+                inverted[term] = compacted[2 * start:2 * end]
+        return inverted
+
+    def _write(self, docs, snippets, inverted):
+        self._write_files(docs, snippets, inverted)
+        self._replace_files()
+
+    def _write_files(self, docs, snippets, inverted):
+        os.makedirs(self.index_path, exist_ok=True)
+        vocab = {}
+        with open(self._file("postings.bin.tmp"), "wb") as f:
+            offset = 0
+            for term in sorted(inverted):
+                pairs = inverted[term]
+                f.write(pairs)
+                vocab[term] = [offset, len(pairs) // 2]
+                offset += len(pairs) * pairs.itemsize
+        with open(self._file("snippets.bin.tmp"), "wb") as f:
+            offset = 0
+            for doc, snippet in zip(docs, snippets):
+                f.write(snippet)
+                doc[4], doc[5] = offset, len(snippet)
+                offset += len(snippet)
+        # json.dumps rather than json.dump, which streams through the much slower pure-Python encoder
+        with open(self._file("vocab.json.tmp"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(vocab))
+        with open(self._file("meta.json.tmp"), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"version": INDEX_VERSION, "docs_path": self.docs_path, "docs": docs}))
+
+    def _replace_files(self):
+        # meta.json goes last so a crash mid-write never exposes a mismatched index
+        for name in ("postings.bin", "snippets.bin", "vocab.json", "meta.json"):
+            os.replace(self._file(f"{name}.tmp"), self._file(name))
+
+    def search(self, query, max_results=5):
+        """
+        Scores the documents against the query with BM25
+        Args:
+            query: search query
+            max_results: number of documents to return
+
+        Returns:
+            list[tuple[float, int]]: (score, doc_id) pairs, best first
+        """
+        with self.lock:
+            num_docs = len(self.docs)
+            if not num_docs or max_results <= 0:
+                return []
+            scores = np.zeros(num_docs)
+            k1 = self.k1
+            for term in set(tokenize(query)):
+                entry = self.vocab.get(term)
+                if entry is None:
+                    continue
+                offset, df = entry
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                pairs = np.frombuffer(self._postings, dtype=np.uint32, count=df * 2, offset=offset).reshape(-1, 2)
+                doc_ids = pairs[:, 0].astype(np.intp)
+                tfs = pairs[:, 1].astype(np.float64)
+                term_scores = (idf * (k1 + 1)) * tfs / (tfs + self.length_norms[doc_ids])
+                if df * 8 > num_docs:
+                    scores += np.bincount(doc_ids, weights=term_scores, minlength=num_docs)
+                else:
+                    # A document occurs once in the postings of a term, so the fancy-indexed add is exact
+                    scores[doc_ids] += term_scores
+            matches = np.flatnonzero(scores)
+            if len(matches) > max_results:
+                matches = matches[np.argpartition(-scores[matches], max_results - 1)[:max_results]]
+            # Best first, ties broken by the lower document id
+            matches = matches[np.lexsort((matches, -scores[matches]))]
+            return [(float(scores[doc_id]), int(doc_id)) for doc_id in matches]
+
+    def snippet(self, doc_id, query, length=500):
+        """
+        Picks the window of the stored document prefix that best matches the query
+        Args:
+            doc_id: document id
+            query: search query
+            length: snippet length in characters
+
+        Returns:
+            str: snippet
+        """
+        doc = self.docs[doc_id]
+        text = bytes(self._snippets[doc[4]:doc[4] + doc[5]]).decode("utf-8", errors="ignore")
+        terms = set(tokenize(query))
+        best_start, best_hits = 0, 0
+        last_start = max(len(text) - length, 0)
+        for start in [*range(0, last_start, length // 2), last_start]:
+            hits = len(terms.intersection(tokenize(text[start:start + length])))
+            if hits > best_hits:
+                best_start, best_hits = start, hits
+        return " ".join(text[best_start:best_start + length].split())
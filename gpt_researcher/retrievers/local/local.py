@@ -0,0 +1,90 @@
+# Local Document Retriever
+
+# libraries
+import os
+import time
+import pathlib
+import threading
+from .index import LocalIndex
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_local_index(docs_path, index_path=None, refresh_seconds=60):
+    """
+    Gets the index for a documents directory, re-indexing added, changed and removed files when it was last
+    checked more than refresh_seconds ago, so that a long-running server sees document changes
+    Args:
+        docs_path: directory holding the documents
+        index_path: directory holding the index files
+        refresh_seconds: seconds between checks of the documents directory, 0 to check on every search
+
+    Returns:
+        LocalIndex
+    """
+    key = (os.path.abspath(docs_path), index_path)
+    with _indexes_lock:
+        index, checked = _indexes.get(key, (None, None))
+        now = time.monotonic()
+        if index is None:
+            index = LocalIndex(docs_path, index_path)
+            _indexes[key] = (index, None)
+        due = checked is None or now - checked >= refresh_seconds
+        if due and checked is not None:
+            # Later callers keep searching the current index instead of waiting for the re-index
+            _indexes[key] = (index, now)
+    # Re-indexed outside the lock, so that other documents directories are not held up; LocalIndex.update
+    # serializes updates of the same index and only swaps the new files in under index.lock
+    if due:
+        stats = index.update()
+        if checked is None or stats["added"] or stats["updated"] or stats["removed"]:
+            print(f"Local index ready: {len(index.docs)} documents "
+                  f"({stats['added']} added, {stats['updated']} updated, {stats['removed']} removed)")
+        if checked is None:
+            with _indexes_lock:
+                _indexes[key] = (index, now)
+    return index
+
+
+class LocalSearch():
+    """
+    Local Document Retriever
+    """
+    def __init__(self, query):
+        """
+        Initializes the LocalSearch object
+        Args:
+            query:
+        """
+        self.query = query
+        self.docs_path = self.get_docs_path()
+        self.index = get_local_index(self.docs_path, os.environ.get("LOCAL_INDEX_PATH"),
+                                     float(os.environ.get("LOCAL_INDEX_REFRESH_SECONDS", 60)))
+
+    def get_docs_path(self):
+        """
+        Gets the local documents directory
+        Returns:
+
+        """
+        try:
+            docs_path = os.environ["LOCAL_DOCS_PATH"]
+        except:
+            raise Exception("Local documents path not found. Please set the LOCAL_DOCS_PATH environment variable "
+                            "to a directory of HTML, PDF or text files.")
+        return docs_path
+
+    def search(self, max_results=5):
+        """
+        Searches the query
+        Returns:
+
+        """
+        # Held so that a concurrent re-index does not swap the index files between the search and the snippets
+        with self.index.lock:
+            results = self.index.search(self.query, max_results=max_results)
+            # Normalizing results to match the format of the other search APIs
+            search_response = [{"href": pathlib.Path(self.index.docs[doc_id][0]).as_uri(),
+                                "body": self.index.snippet(doc_id, self.query)} for _, doc_id in results]
+        return search_response
@@ -0,0 +1,44 @@
+# Mock Search Retriever, backed by the benchmark fixture server
+
+# libraries
+import os
+import requests
+
+
+class MockSearch():
+    """
+    Mock Search Retriever
+    """
+    def __init__(self, query):
+        """
+        Initializes the MockSearch object
+        Args:
+            query:
+        """
+        self.query = query
+        self.search_url = self.get_search_url()
+
+    def get_search_url(self):
+        """
+        Gets the url of the fixture server
+        Returns:
+
+        """
+        try:
+            search_url = os.environ["MOCK_SEARCH_URL"]
+        except:
+            raise Exception("Mock search URL not found. Please set the MOCK_SEARCH_URL environment variable "
+                            "to the url of a running benchmarks/fixture_server.py")
+        return search_url.rstrip("/")
+
+    def search(self, max_results=None):
+        """
+        Searches the query
+        Returns:
+
+        """
+        max_results = max_results or int(os.environ.get("MOCK_SEARCH_RESULTS", 5))
+        resp = requests.get(f"{self.search_url}/search", params={"q": self.query, "n": max_results}, timeout=10)
+        resp.raise_for_status()
+        # Results are already normalized to the format of the other search APIs
+        return [{"href": result["href"], "body": result["body"]} for result in resp.json()]
@@ -1,70 +1,177 @@
+from concurrent.futures import wait, FIRST_COMPLETED
 from concurrent.futures.thread import ThreadPoolExecutor
 from langchain.document_loaders import PyMuPDFLoader
 from langchain.retrievers import ArxivRetriever
 from functools import partial
+import os
+import time
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 import requests
 from bs4 import BeautifulSoup
 
+from gpt_researcher.utils.tracing import span, propagate
+from gpt_researcher.utils.metrics import SCRAPES, SCRAPE_SECONDS
+from gpt_researcher.utils.cassette import get_current_cassette
+
 
 class Scraper:
     """
     Scraper class to extract the content from the links
     """
-    def __init__(self, urls, user_agent):
+    def __init__(self, urls, user_agent, local_docs_path=None):
         """
         Initialize the Scraper class.
         Args:
             urls:
+            user_agent:
+            local_docs_path: directory that file:// links may be read from, None to reject every file:// link
         """
         self.urls = urls
+        self.local_docs_path = local_docs_path
         self.session = requests.Session()
         self.session.headers.update({
             "User-Agent": user_agent
         })
+        # Taken from the run creating the scraper, as the fetch threads do not share its context
+        self.cassette = get_current_cassette()
 
     def run(self):
         """
         Extracts the content from the links
         """
-        partial_extract = partial(self.extract_data_from_link, session=self.session)
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            contents = executor.map(partial_extract, self.urls)
-        res = [content for content in contents if content['raw_content'] is not None]
+        with span("scraper.run", urls=len(self.urls)) as run_span:
+            partial_extract = propagate(partial(self.extract_data_from_link, session=self.session))
+            with ThreadPoolExecutor(max_workers=20) as executor:
+                contents = executor.map(partial_extract, self.urls)
+            res = [content for content in contents if content['raw_content'] is not None]
+            run_span.set(extracted=len(res))
         return res
 
+    def run_until(self, is_enough, window=3):
+        """
+        Extracts the content from the links in the given order until is_enough returns True.
+        At most `window` links past the last checked one are fetched, and the next link is only submitted
+        while the budget is unmet, so lower ranked links are skipped once it is met. Contents are checked in link order,
+        whatever order their fetches complete in. Fetches still running then are discarded.
+        Args:
+            is_enough: called with each extracted content in link order, True once enough content was gathered
+            window: number of links fetched ahead of the checked ones
+
+        Returns:
+            tuple[list, dict]: the contents in link order, and the fetched, skipped and cancelled counts
+        """
+        executor = ThreadPoolExecutor(max_workers=window)
+        extract = propagate(self.extract_data_from_link)
+        running, completed, results = {}, {}, []
+        submitted = checked = 0
+        enough = False
+        try:
+            while not enough and (running or submitted < len(self.urls)):
+                # A slow link holds back the ones after it, as contents are checked in link order
+                while submitted < len(self.urls) and submitted - checked < window:
+                    running[executor.submit(extract, self.urls[submitted], self.session)] = submitted
+                    submitted += 1
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    completed[running.pop(future)] = future.result()
+                while not enough and checked in completed:
+                    content = completed[checked]
+                    checked += 1
+                    if content['raw_content'] is not None:
+                        results.append(content)
+                        enough = is_enough(content)
+        finally:
+            # Running fetches cannot be interrupted, their results are discarded
+            executor.shutdown(wait=False, cancel_futures=True)
+        stats = {"fetched": len(completed), "skipped": len(self.urls) - submitted, "cancelled": len(running)}
+        return results, stats
+
     def extract_data_from_link(self, link, session):
         """
         Extracts the data from the link
         """
         content = ""
+        source = "local" if link.startswith("file://") else "pdf" if link.endswith(".pdf") \
+            else "arxiv" if "arxiv.org" in link else "web"
+        start = time.perf_counter()
         try:
-            if link.endswith(".pdf"):
-                content = self.scrape_pdf_with_pymupdf(link)
-            elif "arxiv.org" in link:
-                doc_num = link.split("/")[-1]
-                content = self.scrape_pdf_with_arxiv(doc_num)
-            elif link:
-                content = self.scrape_text_with_bs(link, session)
-
+            with span("scraper.extract", url=link) as extract_span:
+                if self.cassette is not None:
+                    content = self.cassette.call("page", {"url": link}, link,
+                                                 partial(self.scrape_link, link, session))
+                else:
+                    content = self.scrape_link(link, session)
+                extract_span.set(chars=len(content))
+
+            SCRAPE_SECONDS.observe(time.perf_counter() - start, source=source)
             if len(content) < 100:
+                SCRAPES.inc(source=source, outcome="empty")
                 return {'url': link, 'raw_content': None}
+            SCRAPES.inc(source=source, outcome="success")
             return {'url': link, 'raw_content': content}
         except Exception as e:
+            SCRAPE_SECONDS.observe(time.perf_counter() - start, source=source)
+            SCRAPES.inc(source=source, outcome="error")
             return {'url': link, 'raw_content': None}
 
+    def scrape_link(self, link, session) -> str:
+        """Scrapes the text of a link with the scraper of its source type
+
+        Args:
+            link (str): The url to scrape
+            session (requests.Session): The session web pages are fetched with
+
+        Returns:
+            str: The text scraped from the link
+        """
+        if link.startswith("file://"):
+            return self.scrape_local_file(link)
+        elif link.endswith(".pdf"):
+            return self.scrape_pdf_with_pymupdf(link)
+        elif "arxiv.org" in link:
+            doc_num = link.split("/")[-1]
+            return self.scrape_pdf_with_arxiv(doc_num)
+        elif link:
+            return self.scrape_text_with_bs(link, session)
+        return ""
+
     def scrape_text_with_bs(self, link, session):
-        response = session.get(link, timeout=4)
-        soup = BeautifulSoup(response.content, 'lxml', from_encoding=response.encoding)
+        with span("scraper.fetch", url=link) as fetch_span:
+            response = session.get(link, timeout=4)
+            fetch_span.set(status=response.status_code, bytes=len(response.content))
+
+        with span("scraper.parse", url=link) as parse_span:
+            soup = BeautifulSoup(response.content, 'lxml', from_encoding=response.encoding)
 
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.extract()
+            for script_or_style in soup(["script", "style"]):
+                script_or_style.extract()
 
-        raw_content = self.get_content_from_url(soup)
-        lines = (line.strip() for line in raw_content.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        content = "\n".join(chunk for chunk in chunks if chunk)
+            raw_content = self.get_content_from_url(soup)
+            lines = (line.strip() for line in raw_content.splitlines())
+            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+            content = "\n".join(chunk for chunk in chunks if chunk)
+            parse_span.set(chars=len(content))
         return content
 
+    def scrape_local_file(self, link) -> str:
+        """Read a local document returned by the local retriever
+
+        Args:
+            link (str): The file:// url of the document
+
+        Returns:
+            str: The text of the document
+        """
+        from gpt_researcher.retrievers.local.index import load_document, SUPPORTED_EXTENSIONS
+        if not self.local_docs_path:
+            raise Exception(f"Local file {link} rejected: file:// links are only read for the local retriever")
+        docs_path = os.path.realpath(self.local_docs_path)
+        path = os.path.realpath(url2pathname(urlparse(link).path))
+        if os.path.commonpath([docs_path, path]) != docs_path or not path.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise Exception(f"Local file {link} rejected: it is not a document under {docs_path}")
+        return load_document(path)
+
     def scrape_pdf_with_pymupdf(self, url) -> str:
         """Scrape a pdf with pymupdf
 
@@ -0,0 +1,108 @@
+# Wall-clock and token budget of a research run
+from __future__ import annotations
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+STAGES = ("agent", "search", "scrape", "summarize", "report")
+DEFAULT_STAGE_SPLIT = {"agent": 0.05, "search": 0.1, "scrape": 0.25, "summarize": 0.3, "report": 0.3}
+# LLM call types and the stage whose budget they draw from
+CALL_TYPE_STAGES = {"agent": "agent", "sub_queries": "search", "summarize": "summarize", "draft": "summarize",
+                    "report": "report"}
+
+_current_budget: ContextVar[Optional["ResearchBudget"]] = ContextVar("research_budget", default=None)
+
+
+class ResearchBudget:
+    """Deadline and token budget of a research run, split across its stages.
+
+    Each stage owns a share of the deadline and of the token budget. Stages run in the order of STAGES and
+    a stage may use whatever earlier stages left unused, but never the shares reserved for later stages.
+    The report stage ends at the deadline: streamed reports are cut there and unwritten sections left out.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, token_budget: Optional[int] = None,
+                 split: Optional[dict] = None, cost_budget: Optional[float] = None):
+        """Initialize the budget.
+
+        Args:
+            deadline (float, optional): Total wall-clock seconds of the run. Defaults to no deadline.
+            token_budget (int, optional): Total LLM tokens of the run. Defaults to no limit.
+            split (dict, optional): Share of the budget per stage. Defaults to DEFAULT_STAGE_SPLIT.
+            cost_budget (float, optional): Total LLM cost of the run in USD. Defaults to no limit.
+        """
+        self.deadline = deadline
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.cost_used = 0.0
+        split = split or DEFAULT_STAGE_SPLIT
+        total = sum(split.get(stage, 0) for stage in STAGES) or 1
+        self.split = {stage: split.get(stage, 0) / total for stage in STAGES}
+        self.start = time.monotonic()
+        self.tokens_used = {stage: 0 for stage in STAGES}
+        self.partial = False
+        self.first_output = {}
+
+    def _cumulative_share(self, stage: str) -> float:
+        return sum(self.split[s] for s in STAGES[:STAGES.index(stage) + 1])
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def time_left(self) -> Optional[float]:
+        """Seconds left until the deadline, None without a deadline"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - self.elapsed(), 0.0)
+
+    def time_left_for(self, stage: str) -> Optional[float]:
+        """Seconds left until the given stage must be done, None without a deadline"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline * self._cumulative_share(stage) - self.elapsed(), 0.0)
+
+    def record_output(self, output_type: str = "report") -> None:
+        """Records the time of the first output of a type ("draft" or "report") streamed to the user"""
+        self.first_output.setdefault(output_type, self.elapsed())
+
+    def record_tokens(self, call_type: Optional[str], tokens: int) -> None:
+        self.tokens_used[CALL_TYPE_STAGES.get(call_type, "summarize")] += tokens
+
+    def tokens_left_for(self, stage: str) -> Optional[int]:
+        """Tokens the given stage may still use, None without a token budget"""
+        if self.token_budget is None:
+            return None
+        allowed = self.token_budget * self._cumulative_share(stage)
+        return max(int(allowed - sum(self.tokens_used.values())), 0)
+
+    def record_cost(self, cost: float) -> None:
+        self.cost_used += cost
+
+    def cost_left_for(self, stage: str) -> Optional[float]:
+        """USD the given stage may still spend, None without a cost budget"""
+        if self.cost_budget is None:
+            return None
+        return max(self.cost_budget * self._cumulative_share(stage) - self.cost_used, 0.0)
+
+    def exhausted(self, stage: str) -> bool:
+        """Whether the given stage ran out of time, tokens or money"""
+        return self.time_left_for(stage) == 0.0 or self.tokens_left_for(stage) == 0 \
+            or self.cost_left_for(stage) == 0.0
+
+
+def get_current_budget() -> Optional[ResearchBudget]:
+    """Gets the budget of the research run in the current context, if any"""
+    return _current_budget.get()
+
+
+def set_current_budget(budget: Optional[ResearchBudget]):
+    """Sets the budget of the research run in the current context
+
+    Returns:
+        Token: Token to restore the previous budget with reset_current_budget
+    """
+    return _current_budget.set(budget)
+
+
+def reset_current_budget(token) -> None:
+    _current_budget.reset(token)
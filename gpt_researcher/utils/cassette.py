@@ -0,0 +1,215 @@
+# Record and replay of the external interactions of research runs: searches, page extractions and LLM requests
+from __future__ import annotations
+import os
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from colorama import Fore, Style
+
+from gpt_researcher.master.prompts import current_date
+
+_current_cassette: ContextVar[Optional["Cassette"]] = ContextVar("cassette", default=None)
+
+# Interactions per cassette path, shared by the runs recording to or replaying the same cassette
+_tapes = {}
+_tapes_lock = threading.Lock()
+
+
+def _load(path: str) -> list:
+    with _tapes_lock:
+        if path not in _tapes:
+            interactions = []
+            if os.path.exists(path):
+                with (gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz")
+                      else open(path, "r", encoding="utf-8")) as file:
+                    interactions = json.load(file)["interactions"]
+            _tapes[path] = interactions
+        return _tapes[path]
+
+
+class Cassette:
+    """External interactions of research runs, recorded to or replayed from a JSON file, gzipped if it ends in .gz.
+
+    Interactions are matched by a hash of their request, with the current date left out so that prompts
+    recorded on another day still match. A request recorded several times is replayed in recorded order.
+    A request that was not recorded falls back to the next unused interaction of the same kind and model
+    or retriever, in recorded order. Replayed interactions take their recorded time divided by `speed`,
+    or no time at all with a speed of 0.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", speed: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.interactions = _load(path)
+        self.lock = threading.Lock()
+        self.keys = {}
+        for i, interaction in enumerate(self.interactions):
+            self.keys.setdefault(interaction["key"], []).append(i)
+        self.used = set()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @staticmethod
+    def key(kind: str, request: dict) -> str:
+        request = json.dumps(request, sort_keys=True, ensure_ascii=False).replace(current_date(), "<date>")
+        return hashlib.sha256(f"{kind}:{request}".encode("utf-8")).hexdigest()
+
+    def record(self, kind: str, request: dict, match: str, response, seconds: float,
+               first: Optional[float] = None, error: Optional[str] = None) -> None:
+        """Records an interaction
+
+        Args:
+            kind (str): "search", "page" or "llm"
+            request (dict): The request, only its hash is stored
+            match (str): The retriever, url or model that unrecorded requests fall back on
+            response: The JSON-serializable response
+            seconds (float): The time the interaction took
+            first (float, optional): The time to the first streamed chunk
+            error (str, optional): The error the interaction failed with
+        """
+        interaction = {"kind": kind, "key": self.key(kind, request), "match": match, "response": response,
+                       "seconds": round(seconds, 4)}
+        if first is not None:
+            interaction["first"] = round(first, 4)
+        if error is not None:
+            interaction["error"] = error
+        with _tapes_lock:
+            self.interactions.append(interaction)
+        with self.lock:
+            self.recorded += 1
+
+    def lookup(self, kind: str, request: dict, match: str) -> dict:
+        """Gets the recorded interaction of a request
+
+        Returns:
+            dict: The interaction, with its response, seconds and error if any
+        """
+        key = self.key(kind, request)
+        with self.lock:
+            indexes = self.keys.get(key, [])
+            index = next((i for i in indexes if i not in self.used), indexes[-1] if indexes else None)
+            if index is None:
+                self.misses += 1
+                index = next((i for i, interaction in enumerate(self.interactions) if i not in self.used
+                              and interaction["kind"] == kind and interaction["match"] == match), None)
+                if index is None:
+                    raise Exception(f"No recorded {kind} interaction for {match} in cassette {self.path}")
+                print(f"{Fore.YELLOW}Cassette replays an unmatched {kind} request for {match}{Style.RESET_ALL}")
+            self.used.add(index)
+            self.replayed += 1
+            return self.interactions[index]
+
+    def delay(self, seconds: float) -> float:
+        return seconds / self.speed if self.speed else 0.0
+
+    def call(self, kind: str, request: dict, match: str, function: Callable):
+        """Calls a blocking function through the cassette: timed and recorded, or replayed instead of called"""
+        if not self.recording:
+            interaction = self.lookup(kind, request, match)
+            time.sleep(self.delay(interaction["seconds"]))
+            if "error" in interaction:
+                raise Exception(interaction["error"])
+            return interaction["response"]
+        start = time.perf_counter()
+        try:
+            response = function()
+        except Exception as e:
+            self.record(kind, request, match, None, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            raise
+        self.record(kind, request, match, response, time.perf_counter() - start)
+        return response
+
+    async def acall(self, kind: str, request: dict, match: str, function: Callable[[], Awaitable]):
+        """Awaits a coroutine function through the cassette: timed and recorded, or replayed instead of awaited"""
+        if not self.recording:
+            interaction = self.lookup(kind, request, match)
+            await asyncio.sleep(self.delay(interaction["seconds"]))
+            if "error" in interaction:
+                raise Exception(interaction["error"])
+            return interaction["response"]
+        start = time.perf_counter()
+        try:
+            response = await function()
+        except Exception as e:
+            self.record(kind, request, match, None, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            raise
+        self.record(kind, request, match, response, time.perf_counter() - start)
+        return response
+
+    async def stream(self, kind: str, request: dict, match: str) -> AsyncIterator[str]:
+        """Replays a streamed response line by line, the first line after the recorded time to the first chunk"""
+        interaction = self.lookup(kind, request, match)
+        if "error" in interaction:
+            raise Exception(interaction["error"])
+        lines = interaction["response"]["content"].splitlines(keepends=True) or [""]
+        first = interaction.get("first", 0.0)
+        await asyncio.sleep(self.delay(first))
+        for i, line in enumerate(lines):
+            if i:
+                await asyncio.sleep(self.delay((interaction["seconds"] - first) / len(lines)))
+            yield line
+
+    def save(self) -> None:
+        """Writes the recorded interactions of every run using the cassette"""
+        if not self.recording:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with _tapes_lock:
+                document = json.dumps({"version": 1, "interactions": self.interactions}, ensure_ascii=False)
+            with (gzip.open(self.path, "wt", encoding="utf-8") if self.path.endswith(".gz")
+                  else open(self.path, "w", encoding="utf-8")) as file:
+                file.write(document)
+        except Exception as e:
+            print(f"{Fore.RED}Error in saving cassette: {e}{Style.RESET_ALL}")
+
+    def summary(self) -> dict:
+        if self.recording:
+            return {"mode": self.mode, "path": self.path, "recorded": self.recorded,
+                    "interactions": len(self.interactions)}
+        return {"mode": self.mode, "path": self.path, "speed": self.speed, "replayed": self.replayed,
+                "unmatched": self.misses}
+
+
+def get_cassette(cfg) -> Optional[Cassette]:
+    """Creates the cassette configured by `cassette_mode`, `cassette_path` and `cassette_speed`
+
+    Args:
+        cfg (Config): Config
+
+    Returns:
+        Cassette: The cassette, None if the cassette mode is "off"
+    """
+    if cfg.cassette_mode not in ("record", "replay"):
+        return None
+    return Cassette(cfg.cassette_path, cfg.cassette_mode, cfg.cassette_speed)
+
+
+def get_current_cassette() -> Optional[Cassette]:
+    """Gets the cassette of the research run in the current context, if any"""
+    return _current_cassette.get()
+
+
+def set_current_cassette(cassette: Optional[Cassette]):
+    """Sets the cassette of the research run in the current context
+
+    Returns:
+        Token: Token to restore the previous cassette with reset_current_cassette
+    """
+    return _current_cassette.set(cassette)
+
+
+def reset_current_cassette(token) -> None:
+    _current_cassette.reset(token)
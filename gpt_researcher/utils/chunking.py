@@ -0,0 +1,79 @@
+# Sentence and paragraph aware text chunking
+from __future__ import annotations
+import re
+from typing import Callable, Generator
+
+# Paragraph breaks, line breaks and sentence ends, including the whitespace that follows them
+BOUNDARY_PATTERN = re.compile(r"\n\s*\n\s*|\n\s*|(?<=[.!?])\s+")
+WORD_PATTERN = re.compile(r"\S+\s*")
+
+
+def _segments(text: str) -> Generator[tuple[int, int], None, None]:
+    """Yields the (start, end) offsets of the sentences and paragraphs of a text, trailing whitespace included"""
+    start = 0
+    for match in BOUNDARY_PATTERN.finditer(text):
+        if match.end() > start:
+            yield start, match.end()
+            start = match.end()
+    if start < len(text):
+        yield start, len(text)
+
+
+def chunk_text(text: str, max_size: int, overlap: int = 0,
+               length: Callable[[str], int] = len) -> Generator[str, None, None]:
+    """Splits a text into chunks of at most max_size, walking it once by offsets.
+
+    Chunks end on paragraph or sentence boundaries. A sentence longer than max_size on its own is split
+    between words, and a word longer than max_size between characters.
+
+    Args:
+        text (str): The text to split
+        max_size (int): The maximum size of a chunk, as measured by length
+        overlap (int, optional): Size of the trailing sentences of a chunk repeated at the start of the next one.
+            Defaults to 0.
+        length (Callable[[str], int], optional): Measures the size of a piece of text, e.g. a token counter.
+            Defaults to the number of characters.
+
+    Yields:
+        str: The next chunk of text
+    """
+    max_size = max(max_size, 1)
+    overlap = min(overlap, max_size // 2)
+    chunk = []  # (start, end, size) of the pieces in the current chunk
+    chunk_size = 0
+
+    def pieces():
+        for start, end in _segments(text):
+            size = length(text[start:end])
+            if size <= max_size:
+                yield start, end, size
+                continue
+            for word in WORD_PATTERN.finditer(text, start, end):
+                word_size = length(word.group())
+                if word_size <= max_size:
+                    yield word.start(), word.end(), word_size
+                    continue
+                step = max(int((word.end() - word.start()) * max_size / word_size), 1)
+                for cut in range(word.start(), word.end(), step):
+                    yield cut, min(cut + step, word.end()), length(text[cut:min(cut + step, word.end())])
+
+    for start, end, size in pieces():
+        if chunk and chunk_size + size > max_size:
+            content = text[chunk[0][0]:chunk[-1][1]].strip()
+            if content:
+                yield content
+            # Carry the trailing pieces that fit the overlap over to the next chunk
+            kept, kept_size = [], 0
+            for piece in reversed(chunk):
+                if kept_size + piece[2] > overlap or kept_size + piece[2] + size > max_size:
+                    break
+                kept.insert(0, piece)
+                kept_size += piece[2]
+            chunk, chunk_size = kept, kept_size
+        chunk.append((start, end, size))
+        chunk_size += size
+
+    if chunk:
+        content = text[chunk[0][0]:chunk[-1][1]].strip()
+        if content:
+            yield content
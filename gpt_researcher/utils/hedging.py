@@ -0,0 +1,185 @@
+# Hedged requests against tail latency
+from __future__ import annotations
+import time
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+_current_hedging: ContextVar[Optional["RequestHedging"]] = ContextVar("request_hedging", default=None)
+
+
+def quantile(samples, q: float) -> Optional[float]:
+    """Gets the q quantile of the samples by nearest rank, None without samples"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class LatencyTracker:
+    """Recent latencies of completed requests per (model, call type)"""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self.samples = {}
+
+    def record(self, key: tuple, seconds: float) -> None:
+        self.samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, key: tuple, q: float, min_samples: int) -> Optional[float]:
+        """Gets the q quantile latency of a key, None until it has min_samples samples"""
+        samples = self.samples.get(key, ())
+        return quantile(samples, q) if len(samples) >= min_samples else None
+
+    def expected_beyond(self, key: tuple, seconds: float) -> float:
+        """Estimates the latency of a request of a key still running after the given seconds, from the
+        mean of the recorded latencies beyond them, falling back to the seconds themselves"""
+        beyond = [sample for sample in self.samples.get(key, ()) if sample > seconds]
+        return sum(beyond) / len(beyond) if beyond else seconds
+
+
+# Latencies are shared across runs, so that later runs hedge from the first call on
+_latencies = LatencyTracker()
+
+
+class RequestHedging:
+    """Hedging policy and stats of a research run.
+
+    A request still running after the `quantile` latency observed for its model and call type gets a
+    duplicate request. The first response wins and the other request is cancelled. Duplicates are capped to
+    `budget` times the number of hedgeable requests, and stop while the cost of the losing requests exceeds
+    `budget` times the cost of the winning ones.
+    """
+
+    def __init__(self, quantile: float = 0.9, min_samples: int = 20, budget: float = 0.1):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.budget = budget
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.cost = 0.0
+        self.loser_cost = 0.0
+        self.latencies = {}
+        self.first_attempt_latencies = {}
+
+    async def run(self, key: tuple, request: Callable[[], Awaitable],
+                  on_loser: Optional[Callable[[Optional[Any]], None]] = None):
+        """Runs a request, hedging it once it is slower than usual
+
+        Args:
+            key (tuple): The (model, call type) of the request
+            request (Callable[[], Awaitable]): Starts the request, called again for the duplicate
+            on_loser (Callable, optional): Accounts for the losing request of a hedged call, called with its
+                result if it completed, or None if it was cancelled
+
+        Returns:
+            The result of the first request to complete successfully
+        """
+        self.calls += 1
+        delay = _latencies.quantile(key, self.quantile, self.min_samples)
+        start = time.perf_counter()
+        primary = asyncio.create_task(self._timed(key, request))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.hedges < self.budget * self.calls and self.loser_cost <= self.budget * self.cost:
+                self.hedges += 1
+                tasks.append(asyncio.create_task(self._timed(key, request)))
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if not task.exception()), None)
+                # A failed request leaves the other one to finish, and fails the call once both failed
+                if winner is not None or not pending:
+                    break
+            if winner is None:
+                raise done.pop().exception()
+            self.hedge_wins += winner is not primary
+            if on_loser is not None:
+                for task in tasks:
+                    # Failed requests are not billed
+                    if task is winner or (task.done() and not task.cancelled() and task.exception()):
+                        continue
+                    completed = task.done() and not task.cancelled()
+                    task.cancel()
+                    on_loser(task.result()[0] if completed else None)
+            return winner.result()[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+            elapsed = time.perf_counter() - start
+            self.latencies.setdefault(key[1], []).append(elapsed)
+            # The latency a cancelled first attempt would have had is estimated from the slower past requests
+            first_attempt = primary.result()[1] if primary.done() and not primary.cancelled() \
+                and not primary.exception() else _latencies.expected_beyond(key, elapsed)
+            self.first_attempt_latencies.setdefault(key[1], []).append(first_attempt)
+
+    def record_cost(self, cost: float, loser: bool = False) -> None:
+        """Records the cost of a request, of a losing duplicate or first attempt if `loser`"""
+        if loser:
+            self.loser_cost += cost
+        else:
+            self.cost += cost
+
+    async def _timed(self, key, request):
+        start = time.perf_counter()
+        result = await request()
+        _latencies.record(key, time.perf_counter() - start)
+        return result, time.perf_counter() - start
+
+    def summary(self) -> dict:
+        """Hedges issued and won, and the latency quantiles per call type with hedging and of first attempts
+
+        First-attempt latencies of cancelled requests are estimated from the recorded latencies of the
+        requests slower than the call, so the reported improvement is an estimate.
+
+        Returns:
+            dict: Hedging stats
+        """
+        call_types = {}
+        for call_type, latencies in self.latencies.items():
+            first_attempts = self.first_attempt_latencies[call_type]
+            call_types[call_type] = {
+                "calls": len(latencies),
+                "p50": round(quantile(latencies, 0.5), 3),
+                "p90": round(quantile(latencies, 0.9), 3),
+                "p99": round(quantile(latencies, 0.99), 3),
+                "first_attempt_p99": round(quantile(first_attempts, 0.99), 3),
+                "p99_saved": round(quantile(first_attempts, 0.99) - quantile(latencies, 0.99), 3),
+            }
+        return {"calls": self.calls, "hedges": self.hedges, "hedge_wins": self.hedge_wins,
+                "cost": round(self.cost, 6), "loser_cost": round(self.loser_cost, 6), "call_types": call_types}
+
+
+def get_request_hedging(cfg) -> Optional[RequestHedging]:
+    """Creates the request hedging configured by `hedged_requests`
+
+    Args:
+        cfg (Config): Config
+
+    Returns:
+        RequestHedging: The hedging policy, None if hedging is disabled
+    """
+    if not cfg.hedged_requests:
+        return None
+    return RequestHedging(cfg.hedge_quantile, cfg.hedge_min_samples, cfg.hedge_budget)
+
+
+def get_current_hedging() -> Optional[RequestHedging]:
+    """Gets the request hedging of the research run in the current context, if any"""
+    return _current_hedging.get()
+
+
+def set_current_hedging(hedging: Optional[RequestHedging]):
+    """Sets the request hedging of the research run in the current context
+
+    Returns:
+        Token: Token to restore the previous hedging with reset_current_hedging
+    """
+    return _current_hedging.set(hedging)
+
+
+def reset_current_hedging(token) -> None:
+    _current_hedging.reset(token)
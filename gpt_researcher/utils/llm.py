@@ -1,12 +1,187 @@
 # libraries
 from __future__ import annotations
 import json
+import time
+import asyncio
+import threading
+from contextvars import ContextVar
 from fastapi import WebSocket
 from langchain.adapters import openai as lc_openai
 from colorama import Fore, Style
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from gpt_researcher.master.prompts import auto_agent_instructions
+from gpt_researcher.utils.budget import get_current_budget, CALL_TYPE_STAGES
+from gpt_researcher.utils.tokens import count_tokens
+from gpt_researcher.utils.prompt_cache import record_prompt_cache_usage
+from gpt_researcher.utils.hedging import get_current_hedging
+from gpt_researcher.utils.usage import MODEL_PRICES, model_cost, get_current_usage
+from gpt_researcher.utils.tracing import span
+from gpt_researcher.utils.cassette import get_current_cassette
+from gpt_researcher.utils.metrics import LLM_REQUESTS, LLM_REQUEST_SECONDS, LLM_TOKENS, LLM_COST
+
+
+# Context window of known models
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-1106-preview": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+# Tier each call type starts from, classification-like calls start on the fast tier
+DEFAULT_MODEL_ROUTES = {"agent": "fast", "sub_queries": "fast", "summarize": "fast", "draft": "fast",
+                        "report": "smart"}
+
+_current_router: ContextVar[Optional["ModelRouter"]] = ContextVar("model_router", default=None)
+
+
+class ModelRouter:
+    """Routes every call to the cheapest declared model tier that fits it, and escalates to the next tier
+    when the output of a tier fails validation.
+
+    Tiers are ordered from cheapest to strongest, each with a "name", a "model", optional "prices" (USD per 1K
+    input and output tokens, defaulting to MODEL_PRICES), its "max_input_tokens" and its typical "latency"
+    in seconds. A call starts from the tier
+    its call type is routed to, skips tiers whose context is too small for it, and does not escalate to
+    tiers too slow for the time its research stage has left.
+    """
+
+    def __init__(self, tiers: list, routes: Optional[dict] = None):
+        self.tiers = tiers
+        self.routes = routes or DEFAULT_MODEL_ROUTES
+        self.stats = {}
+
+    def route(self, call_type: Optional[str], input_tokens: int) -> list:
+        """Gets the tiers to try for a call, in escalation order
+
+        Args:
+            call_type (str, optional): The research stage making the call
+            input_tokens (int): The prompt tokens plus the maximum completion tokens of the call
+
+        Returns:
+            list[dict]: The tiers, empty when the call type is not routed
+        """
+        names = [tier["name"] for tier in self.tiers]
+        if self.routes.get(call_type) not in names:
+            return []
+        tiers = self.tiers[names.index(self.routes[call_type]):]
+        tiers = [tier for tier in tiers if tier["max_input_tokens"] >= input_tokens] or tiers[-1:]
+        budget = get_current_budget()
+        time_left = budget.time_left_for(CALL_TYPE_STAGES.get(call_type, "summarize")) if budget else None
+        if time_left is not None:
+            tiers = tiers[:1] + [tier for tier in tiers[1:] if tier["latency"] <= time_left]
+        return tiers
+
+    def record(self, name: str, model: str, prompt_tokens: int, completion_tokens: int,
+               escalated: bool = False, prices: Optional[tuple] = None) -> None:
+        stats = self.stats.setdefault(name, {"model": model, "calls": 0, "escalations": 0,
+                                             "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+        stats["calls"] += 1
+        stats["escalations"] += escalated
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["cost"] += model_cost(model, prompt_tokens, completion_tokens, prices)
+
+    def summary(self) -> dict:
+        """Calls, escalations, tokens and estimated cost per tier, and the total cost
+
+        Returns:
+            dict: "tiers" -> tier name -> stats, "cost" -> total USD
+        """
+        tiers = {name: {**stats, "cost": round(stats["cost"], 4)} for name, stats in self.stats.items()}
+        return {"tiers": tiers, "cost": round(sum(stats["cost"] for stats in self.stats.values()), 4)}
+
+
+def get_model_router(cfg) -> Optional[ModelRouter]:
+    """Creates the model router configured by `model_routing`, `model_tiers` and `model_routes`
+
+    Without declared tiers, a fast and a smart tier are derived from `fast_llm_model` and `smart_llm_model`.
+    Tiers without declared prices are priced from `model_prices`, then MODEL_PRICES.
+
+    Args:
+        cfg (Config): Config
+
+    Returns:
+        ModelRouter: The router, None if routing is disabled
+    """
+    if not cfg.model_routing:
+        return None
+    tiers = cfg.model_tiers or [
+        {"name": "fast", "model": cfg.fast_llm_model, "latency": 2.0},
+        {"name": "smart", "model": cfg.smart_llm_model, "latency": 8.0},
+    ]
+    prices = {**MODEL_PRICES, **(cfg.model_prices or {})}
+    tiers = [{"max_input_tokens": MODEL_CONTEXT_WINDOWS.get(tier["model"], 8192), "latency": 0.0,
+              "prices": prices.get(tier["model"]), **tier} for tier in tiers]
+    return ModelRouter(tiers, cfg.model_routes)
+
+
+def get_current_router() -> Optional[ModelRouter]:
+    """Gets the model router of the research run in the current context, if any"""
+    return _current_router.get()
+
+
+def set_current_router(router: Optional[ModelRouter]):
+    """Sets the model router of the research run in the current context
+
+    Returns:
+        Token: Token to restore the previous router with reset_current_router
+    """
+    return _current_router.set(router)
+
+
+def reset_current_router(token) -> None:
+    _current_router.reset(token)
+
+
+def is_valid_response(response: str, validate: Optional[Callable[[str], Any]]) -> bool:
+    """Whether a response passes validation, a validator may return False or raise on invalid responses"""
+    if validate is None:
+        return True
+    try:
+        return bool(validate(response))
+    except Exception:
+        return False
+
+
+def record_usage(call_type: Optional[str], model: str, prompt_tokens: int, response: str, usage: Optional[dict],
+                 prices: Optional[tuple] = None) -> tuple:
+    """Records the tokens and cost of an LLM request in the usage ledger, the budget and the metrics
+
+    Args:
+        call_type (str, optional): The research stage making the call
+        model (str): The model of the request
+        prompt_tokens (int): The estimated prompt tokens, used when the provider reported no usage
+        response (str): The response content
+        usage (dict, optional): The usage block returned by the provider
+        prices (tuple, optional): The prices of the model, used without a usage ledger
+
+    Returns:
+        tuple: The prompt, completion and cached tokens and the cost in USD
+    """
+    # provider reported usage when present, else estimated tokens without cache discount
+    estimated = not usage or usage.get("prompt_tokens") is None
+    call_prompt_tokens = prompt_tokens if estimated else usage["prompt_tokens"]
+    completion_tokens = count_tokens(response, model) if estimated else usage.get("completion_tokens") or 0
+    cached_tokens = ((usage or {}).get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    ledger = get_current_usage()
+    cost = ledger.record(call_type, model, call_prompt_tokens, completion_tokens, cached_tokens, estimated) \
+        if ledger is not None else model_cost(model, call_prompt_tokens, completion_tokens, prices, cached_tokens)
+    LLM_REQUESTS.inc(model=model, call_type=call_type or "other")
+    source = "estimated" if estimated else "reported"
+    LLM_TOKENS.inc(call_prompt_tokens, model=model, kind="prompt", usage=source)
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion", usage=source)
+    LLM_TOKENS.inc(cached_tokens, model=model, kind="cached", usage=source)
+    LLM_COST.inc(cost, model=model, usage=source)
+    budget = get_current_budget()
+    if budget is not None:
+        budget.record_tokens(call_type, call_prompt_tokens + completion_tokens)
+        budget.record_cost(cost)
+    return call_prompt_tokens, completion_tokens, cached_tokens, cost
 
 
 async def create_chat_completion(
@@ -17,6 +192,8 @@ async def create_chat_completion(
         llm_provider: Optional[str] = None,
         stream: Optional[bool] = False,
         websocket: WebSocket | None = None,
+        call_type: Optional[str] = None,
+        validate: Optional[Callable[[str], Any]] = None,
 ) -> str:
     """Create a chat completion using the OpenAI API
     Args:
@@ -27,6 +204,9 @@ async def create_chat_completion(
         stream (bool, optional): Whether to stream the response. Defaults to False.
         llm_provider (str, optional): The LLM Provider to use.
         webocket (WebSocket): The websocket used in the currect request
+        call_type (str, optional): The research stage making the call, e.g. "summarize" or "report"
+        validate (Callable[[str], Any], optional): Validates the response, returning False or raising when it is
+            invalid. Routed calls escalate to the next model tier on invalid responses.
     Returns:
         str: The response from the chat completion
     """
@@ -37,12 +217,54 @@ async def create_chat_completion(
     if max_tokens is not None and max_tokens > 8001:
         raise ValueError(f"Max tokens cannot be more than 8001, but got {max_tokens}")
 
+    # route the call, a streamed response cannot be escalated once sent
+    router = get_current_router()
+    prompt = "".join(message["content"] for message in messages)
+    prompt_tokens = count_tokens(prompt, model)
+    tiers = router.route(call_type, prompt_tokens + (max_tokens or 0)) if router else []
+    tiers = tiers[:1] if stream else tiers
+    candidates = [(tier["name"], tier["model"], tier.get("prices")) for tier in tiers] or [(model, model, None)]
+
+    # only idempotent requests are hedged
+    hedging = get_current_hedging() if not stream and temperature == 0 else None
+
     # create response
     for attempt in range(10):  # maximum of 10 attempts
-        response = await send_chat_completion_request(
-            messages, model, temperature, max_tokens, stream, llm_provider, websocket
-        )
-        return response
+        for i, (name, tier_model, prices) in enumerate(candidates):
+            def request():
+                return send_chat_completion_request(
+                    messages, tier_model, temperature, max_tokens, stream, llm_provider, websocket
+                )
+
+            # a losing hedged request is billed for its prompt, and for its completion if one arrived
+            def account_loser(result):
+                response, usage = result if result is not None else ("", None)
+                _, _, _, cost = record_usage(call_type, tier_model, prompt_tokens, response, usage, prices)
+                hedging.record_cost(cost, loser=True)
+
+            with span("llm.chat_completion", model=tier_model, tier=name, call_type=call_type or "other",
+                      stream=bool(stream)) as llm_span:
+                start = time.perf_counter()
+                if hedging is not None:
+                    response, usage = await hedging.run((tier_model, call_type), request, account_loser)
+                else:
+                    response, usage = await request()
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, model=tier_model,
+                                            call_type=call_type or "other")
+                record_prompt_cache_usage(call_type, tier_model, messages, usage)
+                call_prompt_tokens, completion_tokens, cached_tokens, cost = record_usage(
+                    call_type, tier_model, prompt_tokens, response, usage, prices)
+                if hedging is not None:
+                    hedging.record_cost(cost)
+                llm_span.set(prompt_tokens=call_prompt_tokens, completion_tokens=completion_tokens,
+                             cached_tokens=cached_tokens, cost=round(cost, 6))
+                valid = stream or is_valid_response(response, validate)
+                escalate = not valid and i < len(candidates) - 1
+                llm_span.set(valid=valid, escalated=escalate)
+                if router is not None:
+                    router.record(name, tier_model, call_prompt_tokens, completion_tokens, escalate, prices)
+            if not escalate:
+                return response
 
     logging.error("Failed to get response from OpenAI API")
     raise RuntimeError("Failed to get response from OpenAI API")
@@ -54,41 +276,135 @@ import logging
 async def send_chat_completion_request(
         messages, model, temperature, max_tokens, stream, llm_provider, websocket
 ):
+    """Sends the chat completion request
+    Returns:
+        tuple[str, dict | None]: The response content, and the usage block when the provider returned one
+    """
     if not stream:
-        result = lc_openai.ChatCompletion.create(
-            model=model,  # Change model here to use different models
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            provider=llm_provider,  # Change provider here to use a different API
-        )
-        return result["choices"][0]["message"]["content"]
+        async def request():
+            result = await lc_openai.ChatCompletion.acreate(
+                model=model,  # Change model here to use different models
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                provider=llm_provider,  # Change provider here to use a different API
+            )
+            return {"content": result["choices"][0]["message"]["content"], "usage": result.get("usage")}
+
+        cassette = get_current_cassette()
+        if cassette is not None:
+            response = await cassette.acall("llm", cassette_request(messages, model, temperature, max_tokens, stream),
+                                            model, request)
+        else:
+            response = await request()
+        return response["content"], response["usage"]
     else:
-        return await stream_response(model, messages, temperature, max_tokens, llm_provider, websocket)
+        return await stream_response(model, messages, temperature, max_tokens, llm_provider, websocket), None
+
+
+def cassette_request(messages, model, temperature, max_tokens, stream) -> dict:
+    """Gets the request an LLM call is recorded and replayed under"""
+    return {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens,
+            "stream": stream}
+
+
+async def stream_chunks(model, messages, temperature, max_tokens, llm_provider):
+    """Streams the content chunks of a completion.
+    The langchain stream is blocking, so it is read in a worker thread that hands the chunks to the event loop.
+    Once the consumer stops, the thread stops at the next chunk."""
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+    end = object()
+    stop = threading.Event()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(chunks.put_nowait, item)
+        except RuntimeError:
+            # The event loop is closed
+            pass
+
+    def read():
+        try:
+            for chunk in lc_openai.ChatCompletion.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    provider=llm_provider,
+                    stream=True,
+            ):
+                if stop.is_set():
+                    break
+                content = chunk["choices"][0].get("delta", {}).get("content")
+                if content is not None:
+                    put(content)
+        except Exception as e:
+            put(e)
+        finally:
+            put(end)
+
+    loop.run_in_executor(None, read)
+    try:
+        while True:
+            item = await chunks.get()
+            if item is end:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
 
 
 async def stream_response(model, messages, temperature, max_tokens, llm_provider, websocket=None):
+    """Streams a response to the websocket paragraph by paragraph.
+    The stream is cut at the deadline of the research budget, returning the response streamed so far."""
     paragraph = ""
     response = ""
+    cassette = get_current_cassette()
+    request = cassette_request(messages, model, temperature, max_tokens, True)
+    if cassette is not None and not cassette.recording:
+        chunks = cassette.stream("llm", request, model)
+    else:
+        chunks = stream_chunks(model, messages, temperature, max_tokens, llm_provider)
+    budget = get_current_budget()
+    time_left = budget.time_left() if budget is not None else None
+    start = time.perf_counter()
+    first = None
 
-    for chunk in lc_openai.ChatCompletion.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            provider=llm_provider,
-            stream=True,
-    ):
-        content = chunk["choices"][0].get("delta", {}).get("content")
-        if content is not None:
-            response += content
-            paragraph += content
-            if "\n" in paragraph:
-                if websocket is not None:
-                    await websocket.send_json({"type": "report", "output": paragraph})
-                else:
-                    print(f"{Fore.GREEN}{paragraph}{Style.RESET_ALL}")
-                paragraph = ""
+    while True:
+        try:
+            timeout = None if time_left is None else max(time_left - (time.perf_counter() - start), 0.0)
+            content = await asyncio.wait_for(anext(chunks), timeout)
+        except StopAsyncIteration:
+            break
+        except asyncio.TimeoutError:
+            await chunks.aclose()
+            print(f"{Fore.YELLOW}Research deadline reached, stopped streaming the response of {model}"
+                  f"{Style.RESET_ALL}")
+            break
+        if first is None:
+            first = time.perf_counter() - start
+        response += content
+        paragraph += content
+        if "\n" in paragraph:
+            budget = get_current_budget()
+            if budget is not None:
+                budget.record_output()
+            if websocket is not None:
+                await websocket.send_json({"type": "report", "output": paragraph})
+            else:
+                print(f"{Fore.GREEN}{paragraph}{Style.RESET_ALL}")
+            paragraph = ""
+    if paragraph:
+        if websocket is not None:
+            await websocket.send_json({"type": "report", "output": paragraph})
+        else:
+            print(f"{Fore.GREEN}{paragraph}{Style.RESET_ALL}")
+    if cassette is not None and cassette.recording:
+        cassette.record("llm", request, model, {"content": response, "usage": None}, time.perf_counter() - start,
+                        first=first)
     return response
 
 
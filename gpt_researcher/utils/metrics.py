@@ -0,0 +1,192 @@
+# Prometheus-style metrics registry
+from __future__ import annotations
+import math
+import asyncio
+import threading
+from bisect import bisect_left
+from typing import Callable, Optional
+
+# Label sets a metric keeps apart, further ones are folded into a single "other" label set
+MAX_LABEL_SETS = 100
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Base of the metric types, keeping one value per bounded set of label values"""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        if key not in self.values and len(self.values) >= MAX_LABEL_SETS:
+            return ("other",) * len(self.labelnames)
+        return key
+
+    def _labels(self, key: tuple, extra: Optional[dict] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> list:
+        with self.lock:
+            return [(self.name + self._labels(key), value) for key, value in self.values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{sample} {_format_value(value)}" for sample, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        with self.lock:
+            key = self._key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down, or is read from a callback when rendered"""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        with self.lock:
+            key = self._key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> list:
+        if self.callback is not None:
+            return [(self.name, self.callback())]
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            key = self._key(labels)
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [[0] * len(self.buckets), 0.0]
+            counts[0][index] += 1
+            counts[1] += value
+
+    def samples(self) -> list:
+        samples = []
+        with self.lock:
+            for key, (counts, total) in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket" + self._labels(key, {"le": _format_value(bound)}),
+                                    cumulative))
+                samples.append((f"{self.name}_sum" + self._labels(key), total))
+                samples.append((f"{self.name}_count" + self._labels(key), cumulative))
+        return samples
+
+
+class Registry:
+    """Metrics exposed together in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = (),
+              callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+RESEARCH_RUNS = REGISTRY.counter("gpt_researcher_research_runs_total", "Research runs by report type and outcome",
+                                 ("report_type", "outcome"))
+ACTIVE_RUNS = REGISTRY.gauge("gpt_researcher_active_runs", "Research runs in progress")
+RESEARCH_SECONDS = REGISTRY.histogram("gpt_researcher_research_seconds", "Duration of research runs",
+                                      ("report_type",), (10, 30, 60, 120, 180, 300, 600, 1200))
+WEBSOCKET_CONNECTIONS = REGISTRY.gauge("gpt_researcher_websocket_connections", "Connected websockets")
+REPORT_CACHE_REQUESTS = REGISTRY.counter("gpt_researcher_report_cache_requests_total",
+                                         "Research requests by report cache outcome", ("outcome",))
+REPORT_CACHE_WAITING = REGISTRY.gauge("gpt_researcher_report_cache_waiting",
+                                      "Requests waiting on an identical research run in flight")
+LLM_REQUESTS = REGISTRY.counter("gpt_researcher_llm_requests_total", "LLM requests by model and call type",
+                                ("model", "call_type"))
+LLM_REQUEST_SECONDS = REGISTRY.histogram("gpt_researcher_llm_request_seconds", "Latency of LLM requests",
+                                         ("model", "call_type"))
+# "usage" tells tokens reported by the provider from tokens estimated with the tokenizer
+LLM_TOKENS = REGISTRY.counter("gpt_researcher_llm_tokens_total", "LLM tokens by model, kind and usage source",
+                              ("model", "kind", "usage"))
+LLM_COST = REGISTRY.counter("gpt_researcher_llm_cost_usd_total", "Estimated LLM cost in USD by model and usage source",
+                            ("model", "usage"))
+RETRIEVER_SEARCHES = REGISTRY.counter("gpt_researcher_retriever_searches_total",
+                                      "Retriever searches by retriever and outcome", ("retriever", "outcome"))
+RETRIEVER_SEARCH_SECONDS = REGISTRY.histogram("gpt_researcher_retriever_search_seconds",
+                                              "Latency of retriever searches", ("retriever",))
+SCRAPES = REGISTRY.counter("gpt_researcher_scrapes_total", "Url extractions by source type and outcome",
+                           ("source", "outcome"))
+SCRAPE_SECONDS = REGISTRY.histogram("gpt_researcher_scrape_seconds", "Latency of url extractions", ("source",))
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram("gpt_researcher_event_loop_lag_seconds",
+                                            "Delay of event loop wakeups past their scheduled time", (),
+                                            (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+
+async def monitor_event_loop_lag(interval: float = 0.1) -> None:
+    """Observes how late the event loop wakes up from sleeps of `interval` seconds, until cancelled.
+    Lag grows when blocking calls or too many ready callbacks hold up the loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - start - interval, 0.0))
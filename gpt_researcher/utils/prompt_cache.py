@@ -0,0 +1,129 @@
+# Prompt prefix cache instrumentation
+from __future__ import annotations
+import hashlib
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+
+from gpt_researcher.utils.tokens import CHARS_PER_TOKEN
+
+# Providers cache prompt prefixes in fixed blocks once a prompt reaches a minimal length
+CACHE_BLOCK_TOKENS = 128
+CACHE_MIN_TOKENS = 1024
+
+
+class PrefixCacheSimulator:
+    """Local stand-in for a provider-side prompt prefix cache, used when responses carry no cached-token usage.
+
+    Every prompt is cut into blocks of CACHE_BLOCK_TOKENS (estimated from characters), and the hash of each
+    prefix ending on a block boundary is remembered per model. A new prompt is estimated to hit the cache
+    for as many leading blocks as have a remembered prefix hash.
+    """
+
+    def __init__(self, max_prefixes: int = 100000):
+        self.max_prefixes = max_prefixes
+        self.prefixes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def cached_tokens(self, model: str, prompt: str) -> int:
+        """Estimates the cached tokens of a prompt and remembers its prefixes
+
+        Args:
+            model (str): The model the prompt is sent to
+            prompt (str): The full prompt, messages concatenated in order
+
+        Returns:
+            int: The estimated number of cached prompt tokens
+        """
+        block_chars = CACHE_BLOCK_TOKENS * CHARS_PER_TOKEN
+        if len(prompt) < CACHE_MIN_TOKENS * CHARS_PER_TOKEN:
+            return 0
+        digest = hashlib.blake2b(model.encode("utf-8"), digest_size=16)
+        cached_blocks, hit = 0, True
+        with self.lock:
+            for end in range(block_chars, len(prompt) + 1, block_chars):
+                digest.update(prompt[end - block_chars:end].encode("utf-8"))
+                key = digest.copy().digest()
+                if hit and key in self.prefixes:
+                    cached_blocks += 1
+                    self.prefixes.move_to_end(key)
+                else:
+                    hit = False
+                    self.prefixes[key] = None
+            while len(self.prefixes) > self.max_prefixes:
+                self.prefixes.popitem(last=False)
+        cached = cached_blocks * CACHE_BLOCK_TOKENS
+        return cached if cached >= CACHE_MIN_TOKENS else 0
+
+
+class PromptCacheStats:
+    """Prompt and cached-token counts per call type"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def record(self, call_type: Optional[str], prompt_tokens: int, cached_tokens: int, source: str) -> None:
+        stats = self.calls.setdefault(call_type or "other", {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                             "source": source})
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached_tokens
+        if stats["source"] != source:
+            stats["source"] = "mixed"
+
+    def summary(self) -> dict:
+        """Cached-token share per call type
+
+        Returns:
+            dict: call type -> calls, prompt tokens, cached tokens, cached share and whether the counts
+                come from the provider, the local estimate or both
+        """
+        return {call_type: {**stats, "cached_share": round(stats["cached_tokens"] / stats["prompt_tokens"], 3)
+                            if stats["prompt_tokens"] else 0.0}
+                for call_type, stats in self.calls.items()}
+
+
+_simulator = PrefixCacheSimulator()
+_global_stats = PromptCacheStats()
+_current_stats: ContextVar[Optional[PromptCacheStats]] = ContextVar("prompt_cache_stats", default=None)
+
+
+def record_prompt_cache_usage(call_type: Optional[str], model: str, messages: list, usage: Optional[dict]) -> None:
+    """Records the cached share of a prompt, from the provider usage when present, else from the local estimate
+
+    Args:
+        call_type (str, optional): The research stage making the call
+        model (str): The model the prompt was sent to
+        messages (list[dict[str, str]]): The messages sent
+        usage (dict, optional): The usage block of the response
+    """
+    prompt = "".join(message["content"] for message in messages)
+    details = (usage or {}).get("prompt_tokens_details") or {}
+    if usage and usage.get("prompt_tokens") is not None and details.get("cached_tokens") is not None:
+        prompt_tokens, cached_tokens, source = usage["prompt_tokens"], details["cached_tokens"], "provider"
+    else:
+        prompt_tokens = (len(prompt) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+        cached_tokens, source = _simulator.cached_tokens(model, prompt), "estimate"
+    _global_stats.record(call_type, prompt_tokens, cached_tokens, source)
+    run_stats = _current_stats.get()
+    if run_stats is not None:
+        run_stats.record(call_type, prompt_tokens, cached_tokens, source)
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    """Gets the stats of the research run in the current context, or the process wide stats outside of a run"""
+    return _current_stats.get() or _global_stats
+
+
+def set_prompt_cache_stats(stats: Optional[PromptCacheStats]):
+    """Sets the stats of the research run in the current context
+
+    Returns:
+        Token: Token to restore the previous stats with reset_prompt_cache_stats
+    """
+    return _current_stats.set(stats)
+
+
+def reset_prompt_cache_stats(token) -> None:
+    _current_stats.reset(token)
@@ -0,0 +1,136 @@
+# Report cache with single-flight coalescing of identical research requests
+import time
+import json
+import asyncio
+import hashlib
+from collections import OrderedDict
+from gpt_researcher.utils.metrics import REPORT_CACHE_REQUESTS, REPORT_CACHE_WAITING
+
+
+class BroadcastWebSocket:
+    """Websocket stand-in that fans the output of one research run out to every subscribed websocket"""
+    def __init__(self):
+        """Initialize the BroadcastWebSocket class."""
+        self.messages = []
+        self.subscribers = []
+
+    async def subscribe(self, websocket):
+        """Replay the output sent so far to a websocket, then forward everything sent afterwards."""
+        sent = 0
+        while sent < len(self.messages):
+            await websocket.send_json(self.messages[sent])
+            sent += 1
+        self.subscribers.append(websocket)
+
+    async def send_json(self, message):
+        """Send a message to every subscriber, dropping the ones that disconnected."""
+        self.messages.append(message)
+        for websocket in list(self.subscribers):
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                self.subscribers.remove(websocket)
+
+
+class ReportCache:
+    """Caches finished reports for a TTL and coalesces concurrent identical requests onto one run"""
+    def __init__(self, ttl, max_entries=256):
+        """
+        Initialize the ReportCache class.
+        Args:
+            ttl: seconds a finished report is served from the cache, 0 disables caching but still coalesces
+            max_entries: number of reports kept, least recently used ones are evicted first
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.stats = {"hits": 0, "coalesced": 0, "misses": 0}
+
+    @staticmethod
+    def key(task, report_type, cfg):
+        """Build the cache key from the normalized task, the report type and the config."""
+        normalized_task = " ".join(task.lower().split())
+        config = {key: value for key, value in vars(cfg).items() if key != "config_file"}
+        payload = json.dumps([normalized_task, report_type, config], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Get the cached report and its streamed messages of a key, None if missing or expired."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, report, messages = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return report, messages
+
+    def put(self, key, report, messages):
+        """Cache the report and its streamed messages of a finished run."""
+        if self.ttl <= 0:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, report, messages)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def run(self, key, websocket, research):
+        """
+        Serve a request from the cache, join the identical run in flight, or start a new one.
+        Args:
+            key: cache key of the request
+            websocket: websocket of the requesting client
+            research: coroutine function running the research, called with the websocket to stream to,
+                returning the report and whether it is partial. Partial reports are not cached.
+
+        Returns:
+            report
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            REPORT_CACHE_REQUESTS.inc(outcome="hit")
+            await websocket.send_json({"type": "logs", "output": "♻️ Serving a cached report for this research task"})
+            report, messages = cached
+            for message in messages:
+                await websocket.send_json(message)
+            return report
+
+        if key in self.in_flight:
+            self.stats["coalesced"] += 1
+            REPORT_CACHE_REQUESTS.inc(outcome="coalesced")
+            task, broadcast = self.in_flight[key]
+            REPORT_CACHE_WAITING.inc()
+            try:
+                await broadcast.subscribe(websocket)
+                report, _ = await asyncio.shield(task)
+            finally:
+                REPORT_CACHE_WAITING.dec()
+            return report
+
+        self.stats["misses"] += 1
+        REPORT_CACHE_REQUESTS.inc(outcome="miss")
+        broadcast = BroadcastWebSocket()
+        await broadcast.subscribe(websocket)
+        # The run is shielded so that a disconnecting client does not cancel it for the others
+        task = asyncio.create_task(research(broadcast))
+        entry = (task, broadcast)
+        self.in_flight[key] = entry
+
+        def release(_=None):
+            # A run started after this one finished may already hold the key
+            if self.in_flight.get(key) is entry:
+                del self.in_flight[key]
+
+        try:
+            report, partial = await asyncio.shield(task)
+        finally:
+            if task.done():
+                release()
+            else:
+                task.add_done_callback(release)
+        if report and not partial:
+            self.put(key, report, [message for message in broadcast.messages if message.get("type") == "report"])
+        return report
@@ -0,0 +1,86 @@
+# Lexical similarity helpers
+from __future__ import annotations
+import re
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were what when "
+    "where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into lowercase terms, dropping stopwords
+
+    Args:
+        text (str): The text to tokenize
+
+    Returns:
+        list[str]: The terms of the text
+    """
+    return [term for term in WORD_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+def stem_terms(text: str) -> set[str]:
+    """Builds the set of terms of a text, with plural endings stripped so that "risk" and "risks" match
+
+    Args:
+        text (str): The text
+
+    Returns:
+        set[str]: The stemmed terms of the text
+    """
+    return {term[:-1] if len(term) > 3 and term.endswith("s") and not term.endswith("ss") else term
+            for term in tokenize(text)}
+
+
+def relevance(query: str, text: str) -> float:
+    """Scores how well a text covers the terms of a query
+
+    Args:
+        query (str): The query
+        text (str): The text to score, e.g. a search snippet
+
+    Returns:
+        float: Share of distinct query terms found in the text, plus a small bonus for term density
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return 0.0
+    terms = tokenize(text)
+    if not terms:
+        return 0.0
+    hits = sum(1 for term in terms if term in query_terms)
+    coverage = len(query_terms.intersection(terms)) / len(query_terms)
+    return coverage + min(hits / len(terms), 1.0) * 0.1
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    """Builds the set of word n-grams of a text
+
+    Args:
+        text (str): The text
+        size (int, optional): Number of words per shingle. Defaults to 3.
+
+    Returns:
+        set[str]: The shingles of the text
+    """
+    terms = tokenize(text)
+    if len(terms) < size:
+        return {" ".join(terms)} if terms else set()
+    return {" ".join(terms[i:i + size]) for i in range(len(terms) - size + 1)}
+
+
+def jaccard(first: set, second: set) -> float:
+    """Jaccard similarity of two sets
+
+    Args:
+        first (set): The first set
+        second (set): The second set
+
+    Returns:
+        float: |first & second| / |first | second|, 0 when both are empty
+    """
+    if not first and not second:
+        return 0.0
+    return len(first & second) / len(first | second)
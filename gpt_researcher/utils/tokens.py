@@ -0,0 +1,46 @@
+# Token counting helpers
+from __future__ import annotations
+from functools import lru_cache
+from typing import Optional
+
+from colorama import Fore, Style
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional, fall back to a character based estimate
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model: Optional[str]):
+    """Gets the tokenizer of a model, None when it cannot be loaded.
+    tiktoken downloads encodings missing from its cache, which fails without network access."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"{Fore.RED}Error in loading the tokenizer, estimating tokens from the text length: {e}"
+              f"{Style.RESET_ALL}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Counts the tokens of a text
+
+    Args:
+        text (str): The text to count
+        model (str, optional): The model whose tokenizer to use. Defaults to cl100k_base.
+
+    Returns:
+        int: The number of tokens, estimated from the text length when no tokenizer can be loaded
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model) if tiktoken is not None else None
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
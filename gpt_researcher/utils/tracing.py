@@ -0,0 +1,187 @@
+# Span tracing of research runs, exported as Chrome trace events and OTLP JSON
+from __future__ import annotations
+import os
+import json
+import time
+import asyncio
+import threading
+from contextvars import ContextVar, copy_context
+from typing import Callable, Optional
+
+from colorama import Fore, Style
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+class NoopSpan:
+    """Span returned while no trace is active, so that disabled tracing costs a context variable lookup"""
+    recording = False
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOOP_SPAN = NoopSpan()
+
+
+class Span:
+    """A timed operation of a trace, with attributes such as url, bytes, tokens or model"""
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start_ns = self.end_ns = 0
+        self.lane = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.lane = self.tracer.lane()
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.end_ns = time.time_ns()
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.tracer.finish(self)
+        if self.parent_id is None:
+            self.tracer.export()
+        return False
+
+
+class Tracer:
+    """Collects the spans of one trace and exports them once its root span ends"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self.lanes = {}
+        self.lock = threading.Lock()
+
+    def lane(self) -> int:
+        """Gets the Chrome trace lane of the current thread and asyncio task, so that spans of a lane nest"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = (threading.get_ident(), id(task) if task is not None else None)
+        with self.lock:
+            return self.lanes.setdefault(key, len(self.lanes) + 1)
+
+    def finish(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+    def to_chrome(self) -> dict:
+        """Exports the spans as Chrome trace events, viewable in chrome://tracing or Perfetto"""
+        pid = os.getpid()
+        events = [{"name": span.name, "cat": "gpt_researcher", "ph": "X", "pid": pid, "tid": span.lane,
+                   "ts": span.start_ns / 1000, "dur": (span.end_ns - span.start_ns) / 1000,
+                   "args": {**span.attributes, **({"error": span.error} if span.error else {})}}
+                  for span in self.spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": self.trace_id}}
+
+    def to_otlp(self) -> dict:
+        """Exports the spans in the OTLP JSON encoding of ExportTraceServiceRequest"""
+        spans = []
+        for span in self.spans:
+            otlp_span = {"traceId": self.trace_id, "spanId": span.span_id, "name": span.name, "kind": 1,
+                         "startTimeUnixNano": str(span.start_ns), "endTimeUnixNano": str(span.end_ns),
+                         "attributes": [{"key": key, "value": _otlp_value(value)}
+                                        for key, value in span.attributes.items()],
+                         "status": {"code": 2, "message": span.error} if span.error else {"code": 1}}
+            if span.parent_id is not None:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "gpt-researcher"}}]},
+            "scopeSpans": [{"scope": {"name": "gpt_researcher"}, "spans": spans}],
+        }]}
+
+    def export(self) -> None:
+        """Writes the trace to <trace id>.trace.json and <trace id>.otlp.json in the trace directory"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, self.trace_id)
+            with open(f"{path}.trace.json", "w", encoding="utf-8") as file:
+                json.dump(self.to_chrome(), file, default=str)
+            with open(f"{path}.otlp.json", "w", encoding="utf-8") as file:
+                json.dump(self.to_otlp(), file, default=str)
+            print(f"Trace written to {path}.trace.json and {path}.otlp.json")
+        except Exception as e:
+            print(f"{Fore.RED}Error in exporting trace: {e}{Style.RESET_ALL}")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def span(name: str, **attributes):
+    """Starts a span as a child of the current span, a no-op span while no trace is active
+
+    Args:
+        name (str): The span name, e.g. "scraper.fetch"
+        **attributes: The span attributes
+
+    Returns:
+        Span | NoopSpan: The span, to be used as a context manager
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_SPAN
+    return Span(parent.tracer, name, parent, attributes)
+
+
+def start_trace(name: str, directory: str, enabled: bool = True, **attributes):
+    """Starts a trace with a root span, or a child span when a trace is already active
+
+    Args:
+        name (str): The root span name
+        directory (str): The directory the trace is exported to when the root span ends
+        enabled (bool, optional): Whether to start a new trace. Defaults to True.
+        **attributes: The span attributes
+
+    Returns:
+        Span | NoopSpan: The span, to be used as a context manager
+    """
+    if _current_span.get() is not None or not enabled:
+        return span(name, **attributes)
+    return Span(Tracer(directory), name, None, attributes)
+
+
+def propagate(function: Callable) -> Callable:
+    """Wraps a function run in another thread so that its spans join the current trace
+
+    Args:
+        function (Callable): The function, e.g. submitted to a thread pool
+
+    Returns:
+        Callable: The function itself while no trace is active
+    """
+    if _current_span.get() is None:
+        return function
+    context = copy_context()
+    return lambda *args, **kwargs: context.copy().run(function, *args, **kwargs)
@@ -0,0 +1,210 @@
+# URL canonicalization and seen-url tracking
+from __future__ import annotations
+import re
+import math
+import zlib
+import base64
+import hashlib
+import posixpath
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "yclid", "mc_cid", "mc_eid", "igshid", "ref_src",
+                   "_hsenc", "_hsmi", "spm", "usqp"}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+# Subdomain labels of mobile sites, stripped anywhere before the registered domain (en.m.wikipedia.org)
+MOBILE_LABELS = {"m", "mobile"}
+# Second-level labels of country code domains such as example.co.uk, which belong to the registered domain
+SECOND_LEVEL_LABELS = {"co", "com", "org", "net", "gov", "ac", "edu"}
+# AMP caches serving a copy of a page under /c/[s/]<origin host>/<path>, "s" standing for https
+AMP_CACHE_HOST_SUFFIXES = (".cdn.ampproject.org", ".bing-amp.com")
+AMP_CACHE_PATH_PREFIXES = ("/c/", "/v/")
+# Google's AMP viewer, serving a page under /amp/[s/]<origin host>/<path>
+GOOGLE_HOST = re.compile(r"^(www\.)?google(\.[a-z]{2,3}){1,2}$")
+AMP_VIEWER_PATH_PREFIX = "/amp/"
+UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+PERCENT_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+STRAY_PERCENT = re.compile(r"%(?![0-9A-Fa-f]{2})")
+
+
+def canonicalize_url(url: str) -> str:
+    """Canonicalizes a url so that trivially different variants of a page compare equal.
+
+    http and https, host case, `www.`/mobile hosts, AMP cache and viewer copies, default ports, percent-encoding,
+    dot segments, duplicate and trailing slashes, fragments, tracking parameters and query parameter order
+    are normalized.
+    The result is only meant as a deduplication key; it is not guaranteed to be fetchable.
+
+    Args:
+        url (str): The url to canonicalize
+
+    Returns:
+        str: The canonical form of the url
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url if not scheme else urlunsplit((scheme, parts.netloc, parts.path, parts.query, ""))
+
+    host = (parts.hostname or "").rstrip(".")
+    origin = _amp_origin(host, parts.path)
+    if origin is not None:
+        return canonicalize_url(urlunsplit(("https", origin.split("/", 1)[0], "/" + origin.partition("/")[2],
+                                            parts.query, "")))
+    if ":" in host:
+        # IPv6 literal
+        host = f"[{host}]"
+    else:
+        host = _strip_mobile_labels(host)
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    path = _normalize_percent_encoding(parts.path)
+    if path:
+        path = posixpath.normpath(path)
+        path = path[1:] if path.startswith("//") else path
+    path = path.rstrip("/")
+
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)]
+    # http and https variants of a page are treated as the same page
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def _amp_origin(host: str, path: str):
+    """Returns the `<origin host>/<path>` of a page served by an AMP cache or viewer, None for other urls"""
+    if host.endswith(AMP_CACHE_HOST_SUFFIXES) and path.startswith(AMP_CACHE_PATH_PREFIXES):
+        origin = path[len("/c/"):]
+    elif GOOGLE_HOST.match(host) and path.startswith(AMP_VIEWER_PATH_PREFIX):
+        origin = path[len(AMP_VIEWER_PATH_PREFIX):]
+    else:
+        return None
+    origin = origin[2:] if origin.startswith("s/") else origin
+    return origin if "." in origin.split("/", 1)[0] else None
+
+
+def _strip_mobile_labels(host: str) -> str:
+    """Drops a leading `www` and any `m`/`mobile` label before the registered domain of a host"""
+    labels = host.split(".")
+    registered = 3 if len(labels) >= 3 and labels[-2] in SECOND_LEVEL_LABELS and len(labels[-1]) == 2 else 2
+    if len(labels) <= registered:
+        return host
+    subdomain = [label for i, label in enumerate(labels[:-registered])
+                 if label not in MOBILE_LABELS and not (i == 0 and label == "www")]
+    return ".".join(subdomain + labels[-registered:])
+
+
+def _normalize_percent_encoding(path: str) -> str:
+    """Normalizes percent-encoding as RFC 3986 does: escapes of unreserved characters are decoded, other escapes
+    are upper-cased and characters that need it are encoded. Escaped reserved characters such as %2F stay escaped,
+    as decoding them would change the resource the path names."""
+    def normalize_escape(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in UNRESERVED else f"%{match.group(1).upper()}"
+
+    path = STRAY_PERCENT.sub("%25", PERCENT_ESCAPE.sub(normalize_escape, path))
+    return quote(path, safe="/:@!$&'()*+,;=-._~%")
+
+
+class SeenUrls:
+    """Exact set of canonical urls"""
+
+    def __init__(self):
+        self._urls = set()
+
+    def __contains__(self, url: str) -> bool:
+        return canonicalize_url(url) in self._urls
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def add(self, url: str) -> None:
+        self._urls.add(canonicalize_url(url))
+
+    def to_state(self) -> dict:
+        return {"backend": "set", "urls": sorted(self._urls)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SeenUrls":
+        seen_urls = cls()
+        seen_urls._urls = set(state["urls"])
+        return seen_urls
+
+
+class BloomSeenUrls:
+    """Bloom-filter backed set of canonical urls with bounded memory.
+
+    Membership tests may return false positives at roughly `error_rate` once `capacity` urls were added,
+    so a small share of new urls can be skipped; there are no false negatives.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, url: str):
+        digest = hashlib.blake2b(canonicalize_url(url).encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, url: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(url))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, url: str) -> None:
+        is_new = False
+        for pos in self._positions(url):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+                is_new = True
+        self.count += is_new
+
+    def to_state(self) -> dict:
+        return {"backend": "bloom", "capacity": self.capacity, "error_rate": self.error_rate,
+                "count": self.count, "bits": base64.b64encode(zlib.compress(bytes(self.bits))).decode("ascii")}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BloomSeenUrls":
+        seen_urls = cls(state["capacity"], state["error_rate"])
+        seen_urls.bits = bytearray(zlib.decompress(base64.b64decode(state["bits"])))
+        seen_urls.count = state["count"]
+        return seen_urls
+
+
+def get_seen_urls(cfg=None):
+    """Creates the seen-url set configured by `seen_urls_backend`
+
+    Args:
+        cfg (Config, optional): Config
+
+    Returns:
+        SeenUrls | BloomSeenUrls: An empty seen-url set
+    """
+    if cfg is not None and cfg.seen_urls_backend == "bloom":
+        return BloomSeenUrls(cfg.seen_urls_capacity, cfg.seen_urls_error_rate)
+    return SeenUrls()
+
+
+def restore_seen_urls(state: dict):
+    """Restores a seen-url set saved with `to_state`
+
+    Args:
+        state (dict): The saved state
+
+    Returns:
+        SeenUrls | BloomSeenUrls: The restored seen-url set
+    """
+    if state.get("backend") == "bloom":
+        return BloomSeenUrls.from_state(state)
+    return SeenUrls.from_state(state)
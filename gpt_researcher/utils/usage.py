@@ -0,0 +1,129 @@
+# Token usage and cost accounting of research runs
+from __future__ import annotations
+from contextvars import ContextVar
+from typing import Optional
+
+# USD per 1K prompt and completion tokens, optionally followed by the price of 1K cached prompt tokens
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-3.5-turbo-16k": (0.003, 0.004),
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-32k": (0.06, 0.12),
+    "gpt-4-1106-preview": (0.01, 0.03),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.005, 0.015, 0.0025),
+    "gpt-4o-mini": (0.00015, 0.0006, 0.000075),
+}
+# Share of the prompt price charged for cached prompt tokens when a model declares no cached price
+CACHED_PROMPT_PRICE_SHARE = 0.5
+
+_current_usage: ContextVar[Optional["UsageLedger"]] = ContextVar("usage_ledger", default=None)
+
+
+def model_cost(model: str, prompt_tokens: int, completion_tokens: int, prices: Optional[tuple] = None,
+               cached_tokens: int = 0) -> float:
+    """Estimates the USD cost of a call
+
+    Args:
+        model (str): The model of the call
+        prompt_tokens (int): The prompt tokens, cached ones included
+        completion_tokens (int): The completion tokens
+        prices (tuple, optional): The prices of the model. Defaults to MODEL_PRICES, and to 0 for unknown models.
+        cached_tokens (int, optional): The prompt tokens served from the provider's prompt cache
+
+    Returns:
+        float: The cost in USD
+    """
+    prices = prices or MODEL_PRICES.get(model, (0.0, 0.0))
+    input_price, output_price = prices[0], prices[1]
+    cached_price = prices[2] if len(prices) > 2 else input_price * CACHED_PROMPT_PRICE_SHARE
+    return ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + completion_tokens * output_price) / 1000
+
+
+class UsageLedger:
+    """Prompt, completion and cached tokens and cost of every LLM call of a research run"""
+
+    def __init__(self, prices: Optional[dict] = None):
+        """Initialize the ledger.
+
+        Args:
+            prices (dict, optional): Model prices overriding MODEL_PRICES
+        """
+        self.prices = {**MODEL_PRICES, **(prices or {})}
+        self.call_types = {}
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        return model_cost(model, prompt_tokens, completion_tokens, self.prices.get(model, (0.0, 0.0)), cached_tokens)
+
+    def affordable_completion_tokens(self, model: str, prompt_tokens: int, cost: float) -> int:
+        """Gets the completion tokens a call with the given prompt can use within a cost, unlimited for free models"""
+        output_price = self.prices.get(model, (0.0, 0.0))[1]
+        if not output_price:
+            return 8001
+        return max(int((cost - self.cost(model, prompt_tokens, 0)) * 1000 / output_price), 0)
+
+    def record(self, call_type: Optional[str], model: str, prompt_tokens: int, completion_tokens: int,
+               cached_tokens: int = 0, estimated: bool = False) -> float:
+        """Records the usage of a call
+
+        Args:
+            call_type (str, optional): The research stage making the call
+            model (str): The model of the call
+            prompt_tokens (int): The prompt tokens, cached ones included
+            completion_tokens (int): The completion tokens
+            cached_tokens (int, optional): The cached prompt tokens
+            estimated (bool, optional): Whether the tokens were estimated rather than reported by the provider
+
+        Returns:
+            float: The cost of the call in USD
+        """
+        cost = self.cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        usage = self.call_types.setdefault(call_type or "other", {
+            "calls": 0, "estimated_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+            "cost": 0.0})
+        usage["calls"] += 1
+        usage["estimated_calls"] += estimated
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        usage["cached_tokens"] += cached_tokens
+        usage["cost"] += cost
+        return cost
+
+    def total_cost(self) -> float:
+        return sum(usage["cost"] for usage in self.call_types.values())
+
+    def totals(self) -> dict:
+        """Usage per call type and of the whole run. Usage is marked "estimated" when the provider reported
+        no usage for some of its calls, whose tokens were counted with the tokenizer instead.
+
+        Returns:
+            dict: "call_types" -> call type -> usage, "total" -> usage of the run
+        """
+        total = {"calls": 0, "estimated_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+                 "cost": 0.0}
+        for usage in self.call_types.values():
+            for key in total:
+                total[key] += usage[key]
+        call_types = {call_type: {**usage, "cost": round(usage["cost"], 6), "estimated": usage["estimated_calls"] > 0}
+                      for call_type, usage in self.call_types.items()}
+        return {"call_types": call_types,
+                "total": {**total, "cost": round(total["cost"], 6), "estimated": total["estimated_calls"] > 0}}
+
+
+def get_current_usage() -> Optional[UsageLedger]:
+    """Gets the usage ledger of the research run in the current context, if any"""
+    return _current_usage.get()
+
+
+def set_current_usage(ledger: Optional[UsageLedger]):
+    """Sets the usage ledger of the research run in the current context
+
+    Returns:
+        Token: Token to restore the previous ledger with reset_current_usage
+    """
+    return _current_usage.set(ledger)
+
+
+def reset_current_usage(token) -> None:
+    _current_usage.reset(token)
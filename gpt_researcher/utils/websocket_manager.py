@@ -1,9 +1,16 @@
 # connect any client to gpt-researcher using websocket
+import os
 import asyncio
 import datetime
 from typing import List, Dict
 from fastapi import WebSocket
 from gpt_researcher.master.agent import GPTResearcher
+from gpt_researcher.config import Config
+from gpt_researcher.utils.report_cache import ReportCache
+from gpt_researcher.utils.metrics import ACTIVE_RUNS, RESEARCH_RUNS, RESEARCH_SECONDS, WEBSOCKET_CONNECTIONS
+
+# add customized JSON config file path here, or set it in the CONFIG_PATH environment variable
+CONFIG_PATH = os.getenv("CONFIG_PATH")
 
 
 class WebSocketManager:
@@ -13,6 +20,10 @@ class WebSocketManager:
         self.active_connections: List[WebSocket] = []
         self.sender_tasks: Dict[WebSocket, asyncio.Task] = {}
         self.message_queues: Dict[WebSocket, asyncio.Queue] = {}
+        cfg = Config(CONFIG_PATH)
+        self.report_cache = ReportCache(cfg.report_cache_ttl, cfg.report_cache_max_entries)
+        self.tracing = cfg.tracing
+        self.trace_dir = cfg.trace_dir
 
     async def start_sender(self, websocket: WebSocket):
         """Start the sender task."""
@@ -34,6 +45,7 @@ class WebSocketManager:
         """Connect a websocket."""
         await websocket.accept()
         self.active_connections.append(websocket)
+        WEBSOCKET_CONNECTIONS.inc()
         self.message_queues[websocket] = asyncio.Queue()
         self.sender_tasks[websocket] = asyncio.create_task(self.start_sender(websocket))
 
@@ -41,28 +53,42 @@ class WebSocketManager:
         """Disconnect a websocket."""
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+            WEBSOCKET_CONNECTIONS.dec()
             self.sender_tasks[websocket].cancel()
             await self.message_queues[websocket].put(None)
             del self.sender_tasks[websocket]
             del self.message_queues[websocket]
 
-    async def start_streaming(self, task, report_type, websocket):
-        """Start streaming the output."""
-        report = await run_agent(task, report_type, websocket)
+    async def start_streaming(self, task, report_type, websocket, run_id=None):
+        """Start streaming the output.
+        Identical tasks share one run and recently finished ones are served from the report cache.
+        Runs resumed by ID bypass the cache."""
+        if run_id:
+            report, _ = await run_agent(task, report_type, websocket, run_id)
+            return report
+        key = self.report_cache.key(task, report_type, Config(CONFIG_PATH))
+        report = await self.report_cache.run(key, websocket, lambda stream: run_agent(task, report_type, stream))
         return report
 
 
-async def run_agent(task, report_type, websocket):
-    """Run the agent."""
+async def run_agent(task, report_type, websocket, run_id=None):
+    """Run the agent. Passing the run_id of an interrupted run resumes it from its last checkpoint.
+    Returns the report and whether it is partial, cut short by the research budget."""
     # measure time
     start_time = datetime.datetime.now()
-    # add customized JSON config file path here
-    config_path = None
     # run agent
-    researcher = GPTResearcher(task, report_type, config_path, websocket)
-    report = await researcher.run()
+    researcher = GPTResearcher(task, report_type, CONFIG_PATH, websocket, run_id)
+    ACTIVE_RUNS.inc()
+    outcome = "failed"
+    try:
+        report = await researcher.run()
+        outcome = "partial" if researcher.budget.partial else "completed"
+    finally:
+        ACTIVE_RUNS.dec()
+        RESEARCH_RUNS.inc(report_type=report_type, outcome=outcome)
     # measure time
     end_time = datetime.datetime.now()
+    RESEARCH_SECONDS.observe((end_time - start_time).total_seconds(), report_type=report_type)
     await websocket.send_json({"type": "logs", "output": f"\nTotal run time: {end_time - start_time}\n"})
 
-    return report
+    return report, researcher.budget.partial
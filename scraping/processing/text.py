@@ -6,6 +6,7 @@ from selenium.webdriver.remote.webdriver import WebDriver
 
 from config import Config
 from gpt_researcher_old.retriever.llm_utils import create_chat_completion
+from gpt_researcher.utils.chunking import chunk_text
 import os
 from md2pdf.core import md2pdf
 
@@ -18,26 +19,9 @@ def split_text(text: str, max_length: int = 8192) -> Generator[str, None, None]:
         max_length (int, optional): The maximum length of each chunk. Defaults to 8192.
 
     Yields:
-        str: The next chunk of text
-
-    Raises:
-        ValueError: If the text is longer than the maximum length
+        str: The next chunk of text, split on paragraph and sentence boundaries
     """
-    paragraphs = text.split("\n")
-    current_length = 0
-    current_chunk = []
-
-    for paragraph in paragraphs:
-        if current_length + len(paragraph) + 1 <= max_length:
-            current_chunk.append(paragraph)
-            current_length += len(paragraph) + 1
-        else:
-            yield "\n".join(current_chunk)
-            current_chunk = [paragraph]
-            current_length = len(paragraph) + 1
-
-    if current_chunk:
-        yield "\n".join(current_chunk)
+    yield from chunk_text(text, max_length)
 
 
 def summarize_text(
@@ -0,0 +1,62 @@
+import time
+import asyncio
+import pytest
+
+from gpt_researcher.utils import llm
+from gpt_researcher.utils.budget import ResearchBudget, set_current_budget, reset_current_budget
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send_json(self, message):
+        self.messages.append(message)
+
+
+def test_stages_may_use_the_time_earlier_stages_left():
+    budget = ResearchBudget(deadline=100, split={"agent": 0.1, "search": 0.1, "scrape": 0.2, "summarize": 0.3,
+                                                 "report": 0.3})
+    assert budget.time_left_for("agent") == pytest.approx(10, abs=0.1)
+    assert budget.time_left_for("summarize") == pytest.approx(70, abs=0.1)
+    assert budget.time_left_for("report") == pytest.approx(budget.time_left(), abs=0.1)
+    assert ResearchBudget().time_left_for("report") is None
+
+
+def test_tokens_and_cost_of_later_stages_are_reserved():
+    budget = ResearchBudget(token_budget=1000, cost_budget=1.0)
+    budget.record_tokens("summarize", 600)
+    budget.record_cost(0.5)
+    assert budget.tokens_left_for("summarize") == 100
+    assert budget.tokens_left_for("report") == 400
+    assert budget.exhausted("summarize") is False
+    budget.record_tokens("draft", 100)
+    assert budget.exhausted("summarize") is True
+    assert budget.cost_left_for("report") == pytest.approx(0.5)
+    assert not budget.exhausted("report")
+
+
+def test_streamed_responses_stop_at_the_deadline(monkeypatch):
+    async def stream_chunks(*args, **kwargs):
+        for i in range(100):
+            await asyncio.sleep(0.02)
+            yield f"line {i}\n" if i % 2 else f"line {i} "
+
+    monkeypatch.setattr(llm, "stream_chunks", stream_chunks)
+
+    async def scenario():
+        token = set_current_budget(ResearchBudget(deadline=0.3))
+        try:
+            websocket = FakeWebSocket()
+            start = time.perf_counter()
+            response = await llm.stream_response("gpt-4o", [], 0, None, "openai", websocket)
+            return response, websocket.messages, time.perf_counter() - start
+        finally:
+            reset_current_budget(token)
+
+    response, messages, seconds = asyncio.run(scenario())
+    assert seconds < 1.0
+    assert response.startswith("line 0 line 1\n")
+    assert "line 99" not in response
+    # Everything returned was streamed, the last unfinished paragraph included
+    assert "".join(message["output"] for message in messages) == response
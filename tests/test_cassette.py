@@ -0,0 +1,92 @@
+import time
+import asyncio
+import pytest
+
+from gpt_researcher.utils import cassette as cassette_module
+from gpt_researcher.utils.cassette import Cassette, get_cassette
+from gpt_researcher.config import Config
+
+
+@pytest.fixture(autouse=True)
+def tapes(monkeypatch):
+    # Tapes are shared by path within a process, each test starts from the files on disk
+    monkeypatch.setattr(cassette_module, "_tapes", {})
+
+
+def record(path):
+    recorder = Cassette(path, "record")
+    assert recorder.call("search", {"query": "cloud"}, "tavily", lambda: [{"href": "https://a"}]) == \
+        [{"href": "https://a"}]
+
+    def not_found():
+        raise ValueError("404")
+
+    with pytest.raises(ValueError):
+        recorder.call("page", {"url": "https://b"}, "https://b", not_found)
+
+    async def completion():
+        return {"content": "first line\nsecond line\n", "usage": None}
+
+    assert asyncio.run(recorder.acall("llm", {"model": "gpt-4o", "prompt": "p"}, "gpt-4o", completion)) == \
+        {"content": "first line\nsecond line\n", "usage": None}
+    recorder.save()
+    return recorder
+
+
+@pytest.mark.parametrize("name", ["cassette.json", "cassette.json.gz"])
+def test_recorded_interactions_are_replayed(tmp_path, monkeypatch, name):
+    path = str(tmp_path / name)
+    assert record(path).summary() == {"mode": "record", "path": path, "recorded": 3, "interactions": 3}
+    monkeypatch.setattr(cassette_module, "_tapes", {})
+
+    replayer = Cassette(path, "replay", speed=0)
+
+    def unexpected():
+        raise AssertionError("replayed interactions are not called")
+
+    assert replayer.call("search", {"query": "cloud"}, "tavily", unexpected) == [{"href": "https://a"}]
+    with pytest.raises(Exception, match="ValueError: 404"):
+        replayer.call("page", {"url": "https://b"}, "https://b", unexpected)
+
+    async def stream():
+        return [line async for line in replayer.stream("llm", {"model": "gpt-4o", "prompt": "p"}, "gpt-4o")]
+
+    assert asyncio.run(stream()) == ["first line\n", "second line\n"]
+    assert replayer.summary()["replayed"] == 3
+    assert replayer.summary()["unmatched"] == 0
+
+
+def test_unmatched_requests_fall_back_to_the_next_interaction_of_their_kind(tmp_path, monkeypatch):
+    path = str(tmp_path / "cassette.json")
+    record(path)
+    monkeypatch.setattr(cassette_module, "_tapes", {})
+    replayer = Cassette(path, "replay", speed=0)
+    assert replayer.call("search", {"query": "a reworded query"}, "tavily", None) == [{"href": "https://a"}]
+    assert replayer.misses == 1
+    with pytest.raises(Exception, match="No recorded search interaction"):
+        replayer.call("search", {"query": "another query"}, "tavily", None)
+
+
+def test_replays_take_the_recorded_time_divided_by_the_speed(tmp_path, monkeypatch):
+    path = str(tmp_path / "cassette.json")
+    recorder = Cassette(path, "record")
+    recorder.call("page", {"url": "https://a"}, "https://a", lambda: time.sleep(0.2) or "content")
+    recorder.save()
+    monkeypatch.setattr(cassette_module, "_tapes", {})
+    start = time.perf_counter()
+    assert Cassette(path, "replay", speed=4).call("page", {"url": "https://a"}, "https://a", None) == "content"
+    assert 0.04 <= time.perf_counter() - start < 0.15
+
+
+def test_prompts_recorded_on_another_day_still_match(monkeypatch):
+    request = {"messages": [{"content": f"Today is {cassette_module.current_date()}"}]}
+    key = Cassette.key("llm", request)
+    monkeypatch.setattr(cassette_module, "current_date", lambda: "January 1, 2099")
+    assert Cassette.key("llm", {"messages": [{"content": "Today is January 1, 2099"}]}) == key
+
+
+def test_the_cassette_is_off_by_default(tmp_path):
+    cfg = Config()
+    assert get_cassette(cfg) is None
+    cfg.cassette_mode, cfg.cassette_path = "record", str(tmp_path / "cassette.json")
+    assert get_cassette(cfg).recording
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+
+from gpt_researcher import GPTResearcher
+from gpt_researcher.master import agent as agent_module
+from gpt_researcher.master.checkpoint import CheckpointStore
+from gpt_researcher.utils.budget import ResearchBudget
+
+QUERY = "impact of AI on the labor market"
+SUB_QUERIES = [QUERY, "AI labor market risks", "AI labor market wages"]
+
+
+def test_checkpoints_are_saved_loaded_and_deleted(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints"))
+    assert store.load("run") is None
+    store.save("run", {"query": QUERY, "context": []})
+    store.save("run", {"query": QUERY, "context": [["q", []]]})
+    assert store.load("run") == {"query": QUERY, "context": [["q", []]]}
+    assert [path.name for path in (tmp_path / "checkpoints").iterdir()] == ["run.json"]
+    store.delete("run")
+    store.delete("run")
+    assert store.load("run") is None
+
+
+def test_run_ids_cannot_escape_the_directory(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    assert store.path("../../etc/passwd").startswith(str(tmp_path))
+    store.save("../escape", {})
+    assert (tmp_path / ".._escape.json").exists()
+
+
+def test_unreadable_checkpoints_are_ignored(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    (tmp_path / "run.json").write_text("{not json")
+    assert store.load("run") is None
+
+
+def researcher(tmp_path, monkeypatch, run):
+    async def run_sub_query(sub_query):
+        if sub_query in run["fail"]:
+            raise ConnectionError("search failed")
+        run["queries"].append(sub_query)
+        return [{"url": f"https://example.com/{len(run['queries'])}", "summary": f"findings of {sub_query}"}]
+
+    async def stream_output(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(agent_module, "stream_output", stream_output)
+    agent = GPTResearcher(QUERY, "research_report", run_id="run-1")
+    agent.checkpoints = CheckpointStore(str(tmp_path))
+    agent.budget = ResearchBudget()
+    monkeypatch.setattr(agent, "run_sub_query", run_sub_query)
+    return agent
+
+
+def test_resumed_runs_skip_the_completed_sub_queries(tmp_path, monkeypatch):
+    run = {"queries": [], "fail": {"AI labor market wages"}}
+    first = researcher(tmp_path, monkeypatch, run)
+    first.agent, first.role, first.sub_queries = "💼 Labor Agent", "You are a labor economist.", SUB_QUERIES
+    with pytest.raises(ConnectionError):
+        asyncio.run(first.run_sub_queries(SUB_QUERIES))
+    assert run["queries"] == SUB_QUERIES[:2]
+
+    run = {"queries": [], "fail": set()}
+    second = researcher(tmp_path, monkeypatch, run)
+    state = asyncio.run(second.restore_checkpoint())
+    assert state["sub_queries"] == SUB_QUERIES
+    assert (second.agent, second.role) == ("💼 Labor Agent", "You are a labor economist.")
+    assert second.completed_sub_queries == SUB_QUERIES[:2]
+    asyncio.run(second.run_sub_queries(second.sub_queries))
+    assert run["queries"] == ["AI labor market wages"]
+    assert second.completed_sub_queries == SUB_QUERIES
+    assert [summaries[0]["summary"] for summaries in second.context] == [f"findings of {q}" for q in SUB_QUERIES]
+
+
+def test_checkpoints_of_another_query_are_not_resumed(tmp_path, monkeypatch):
+    CheckpointStore(str(tmp_path)).save("run-1", {"query": "another query", "report_type": "research_report"})
+    agent = researcher(tmp_path, monkeypatch, {"queries": [], "fail": set()})
+    assert asyncio.run(agent.restore_checkpoint()) is None
+
+
+def test_completed_runs_delete_their_checkpoint(tmp_path, monkeypatch):
+    run = {"queries": [], "fail": set()}
+    agent = researcher(tmp_path, monkeypatch, run)
+
+    async def plan_research():
+        return SUB_QUERIES
+
+    async def generate_report(**kwargs):
+        assert agent.checkpoints.load("run-1")["sub_queries"] == SUB_QUERIES
+        return "report"
+
+    monkeypatch.setattr(agent, "plan_research", plan_research)
+    monkeypatch.setattr(agent_module, "generate_report", generate_report)
+    asyncio.run(agent.run())
+    assert agent.checkpoints.load("run-1") is None
+
+    # The run ID then starts a new run instead of returning the old report
+    run["queries"].clear()
+    again = researcher(tmp_path, monkeypatch, run)
+    monkeypatch.setattr(again, "plan_research", plan_research)
+    asyncio.run(again.run())
+    assert run["queries"] == SUB_QUERIES
@@ -0,0 +1,50 @@
+import pytest
+
+from gpt_researcher.utils.chunking import chunk_text
+
+TEXT = ("Cloud spending grew quickly. Most of it went to AI workloads!\n\n"
+        "Storage prices fell again. Is that sustainable?\nAnalysts disagree.")
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_short_texts_are_one_chunk():
+    assert list(chunk_text(TEXT, 1000)) == [TEXT]
+    assert list(chunk_text("", 10)) == []
+    assert list(chunk_text("  \n\n ", 10)) == []
+
+
+def test_chunks_end_on_sentence_and_paragraph_boundaries():
+    chunks = list(chunk_text(TEXT, 70))
+    assert chunks == ["Cloud spending grew quickly. Most of it went to AI workloads!",
+                      "Storage prices fell again. Is that sustainable?\nAnalysts disagree."]
+    assert all(len(chunk) <= 70 for chunk in chunks)
+
+
+@pytest.mark.parametrize("max_size", [5, 12, 30, 64])
+def test_chunks_respect_the_size_and_cover_the_text(max_size):
+    chunks = list(chunk_text(TEXT, max_size))
+    assert all(len(chunk) <= max_size for chunk in chunks)
+    assert "".join(chunks).replace(" ", "").replace("\n", "") == TEXT.replace(" ", "").replace("\n", "")
+
+
+def test_long_words_are_split_between_characters():
+    chunks = list(chunk_text("a" * 25, 10))
+    assert chunks == ["a" * 10, "a" * 10, "a" * 5]
+
+
+def test_sizes_are_measured_by_the_given_length():
+    chunks = list(chunk_text(TEXT, 6, length=words))
+    assert all(words(chunk) <= 6 for chunk in chunks)
+    # The second sentence has more than 6 words, so it is split between words
+    assert chunks[:2] == ["Cloud spending grew quickly. Most of", "it went to AI workloads!"]
+
+
+def test_trailing_sentences_overlap_into_the_next_chunk():
+    text = "One two. Three four. Five six. Seven eight. Nine ten."
+    chunks = list(chunk_text(text, 6, overlap=2, length=words))
+    assert chunks == ["One two. Three four. Five six.", "Five six. Seven eight. Nine ten."]
+    assert list(chunk_text(text, 6, overlap=0, length=words)) == ["One two. Three four. Five six.",
+                                                                   "Seven eight. Nine ten."]
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+
+from gpt_researcher.utils import hedging, llm
+from gpt_researcher.utils.hedging import LatencyTracker, RequestHedging, set_current_hedging, reset_current_hedging
+from gpt_researcher.utils.usage import UsageLedger, set_current_usage, reset_current_usage
+
+KEY = ("gpt-4o", "summarize")
+
+
+@pytest.fixture(autouse=True)
+def latencies(monkeypatch):
+    # Requests of KEY usually take 10 ms, so that a request still running after 10 ms is hedged
+    tracker = LatencyTracker()
+    for _ in range(20):
+        tracker.record(KEY, 0.01)
+    monkeypatch.setattr(hedging, "_latencies", tracker)
+    return tracker
+
+
+def slow_first_request():
+    calls = []
+
+    async def request():
+        calls.append(len(calls))
+        await asyncio.sleep(0.2 if len(calls) == 1 else 0.02)
+        return f"response {len(calls)}", {"prompt_tokens": 1000, "completion_tokens": 100}
+
+    return request, calls
+
+
+def test_cancelled_losers_are_accounted():
+    request, calls = slow_first_request()
+    losers = []
+    policy = RequestHedging(min_samples=20, budget=1.0)
+    result = asyncio.run(policy.run(KEY, request, losers.append))
+    assert result[0] == "response 2"
+    assert len(calls) == 2
+    assert losers == [None]
+    assert policy.hedge_wins == 1
+
+
+def test_hedges_stop_once_losers_cost_more_than_the_budget():
+    request, calls = slow_first_request()
+    policy = RequestHedging(min_samples=20, budget=0.5)
+    policy.record_cost(1.0)
+    policy.record_cost(0.6, loser=True)
+    asyncio.run(policy.run(KEY, request))
+    assert len(calls) == 1
+    assert policy.hedges == 0
+
+
+def test_losing_requests_are_billed_in_the_usage_ledger(monkeypatch):
+    request, calls = slow_first_request()
+
+    async def send_chat_completion_request(*args):
+        return await request()
+
+    monkeypatch.setattr(llm, "send_chat_completion_request", send_chat_completion_request)
+    ledger, policy = UsageLedger(), RequestHedging(min_samples=20, budget=1.0)
+
+    async def scenario():
+        usage_token, hedging_token = set_current_usage(ledger), set_current_hedging(policy)
+        try:
+            return await llm.create_chat_completion([{"role": "user", "content": "Summarize the text " * 50}],
+                                                    model="gpt-4o", temperature=0, call_type="summarize")
+        finally:
+            reset_current_hedging(hedging_token)
+            reset_current_usage(usage_token)
+
+    assert asyncio.run(scenario()) == "response 2"
+    usage = ledger.totals()["call_types"]["summarize"]
+    # The winner as reported, the cancelled loser for its estimated prompt tokens only
+    assert usage["calls"] == 2
+    assert usage["estimated_calls"] == 1
+    assert 1000 < usage["prompt_tokens"] < 2000
+    assert usage["completion_tokens"] == 100
+    assert policy.loser_cost > 0
+    assert policy.summary()["loser_cost"] == round(policy.loser_cost, 6)
+    assert ledger.total_cost() == pytest.approx(policy.cost + policy.loser_cost)
@@ -0,0 +1,182 @@
+import math
+import os
+import time
+import threading
+
+import pytest
+
+from gpt_researcher.retrievers.local.index import LocalIndex, tokenize
+
+DOCS = {
+    "cloud.txt": "Cloud computing market growth is driven by software demand. Cloud revenue grows.",
+    "energy.txt": "Energy prices and climate policy shape investment in renewable energy.",
+    "chips.md": "Chip supply chains limit hardware growth while demand for inference keeps rising.",
+    "notes.html": "<html><body><p>Market research notes on cloud security and privacy.</p>"
+                  "<script>var ignored = 'cloud';</script></body></html>",
+}
+
+
+@pytest.fixture
+def docs(tmp_path):
+    docs_path = tmp_path / "docs"
+    docs_path.mkdir()
+    for name, text in DOCS.items():
+        (docs_path / name).write_text(text)
+    return docs_path
+
+
+def reference_bm25(index, query):
+    """Scores every document with a plain Python BM25, as the index did before numpy scoring"""
+    lengths = [doc[3] for doc in index.docs]
+    avg_length = sum(lengths) / len(lengths)
+    scores = {}
+    for term in set(tokenize(query)):
+        pairs = index.postings(term)
+        df = len(pairs) // 2
+        idf = math.log(1 + (len(index.docs) - df + 0.5) / (df + 0.5))
+        for i in range(0, len(pairs), 2):
+            doc_id, tf = pairs[i], pairs[i + 1]
+            norm = index.k1 * (1 - index.b + index.b * lengths[doc_id] / avg_length)
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (index.k1 + 1) / (tf + norm)
+    return scores
+
+
+def names(index, results):
+    return [os.path.basename(index.docs[doc_id][0]) for _, doc_id in results]
+
+
+def test_search_matches_reference_bm25(docs):
+    index = LocalIndex(str(docs))
+    index.update()
+    for query in ["cloud growth", "energy climate investment", "demand", "unknown words"]:
+        expected = reference_bm25(index, query)
+        results = index.search(query, max_results=10)
+        assert [doc_id for _, doc_id in results] == sorted(expected, key=lambda doc_id: (-expected[doc_id], doc_id))
+        for score, doc_id in results:
+            assert score == pytest.approx(expected[doc_id])
+    assert names(index, index.search("cloud revenue", max_results=1)) == ["cloud.txt"]
+    assert index.search("cloud", max_results=0) == []
+
+
+def test_html_scripts_are_not_indexed(docs):
+    index = LocalIndex(str(docs))
+    index.update()
+    assert "ignored" not in index.vocab
+
+
+def test_update_adds_changes_and_removes_documents(docs):
+    index = LocalIndex(str(docs))
+    assert index.update() == {"added": 4, "updated": 0, "removed": 0, "unchanged": 0}
+    assert index.update() == {"added": 0, "updated": 0, "removed": 0, "unchanged": 4}
+
+    (docs / "energy.txt").unlink()
+    (docs / "ocean.txt").write_text("Ocean shipping routes and freight rates.")
+    chips = docs / "chips.md"
+    chips.write_text("Quantum computing research papers.")
+    os.utime(chips, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert index.update() == {"added": 1, "updated": 1, "removed": 1, "unchanged": 2}
+
+    assert index.search("energy climate") == []
+    assert names(index, index.search("freight")) == ["ocean.txt"]
+    assert names(index, index.search("quantum")) == ["chips.md"]
+    assert index.search("inference") == []
+    assert names(index, index.search("cloud", max_results=1)) == ["cloud.txt"]
+
+
+def test_index_persists_across_instances(docs, tmp_path):
+    index_path = str(tmp_path / "index")
+    index = LocalIndex(str(docs), index_path)
+    index.update()
+    expected = index.search("cloud market growth")
+    index.close()
+
+    reopened = LocalIndex(str(docs), index_path)
+    assert len(reopened.docs) == 4
+    assert reopened.search("cloud market growth") == expected
+    assert reopened.update()["unchanged"] == 4
+    assert "Cloud computing" in reopened.snippet(expected[0][1], "cloud")
+
+
+def test_sparse_and_dense_terms_match_reference_bm25(tmp_path):
+    docs_path = tmp_path / "many"
+    docs_path.mkdir()
+    for i in range(40):
+        rare = " zebra" if i == 7 else ""
+        (docs_path / f"{i}.txt").write_text(f"report {'market ' * (i % 5)}growth{rare} number{i % 3}")
+    index = LocalIndex(str(docs_path))
+    index.update()
+    query = "zebra market number1"
+    expected = reference_bm25(index, query)
+    results = index.search(query, max_results=40)
+    assert {doc_id: pytest.approx(score) for score, doc_id in results} == expected
+    assert names(index, results[:1]) == ["7.txt"]
+
+
+def test_local_search_sees_document_changes_after_the_refresh_interval(docs, monkeypatch):
+    from gpt_researcher.retrievers.local import local
+
+    monkeypatch.setattr(local, "_indexes", {})
+    index = local.get_local_index(str(docs), refresh_seconds=0)
+    assert index.search("freight") == []
+    (docs / "ocean.txt").write_text("Ocean freight rates.")
+    assert local.get_local_index(str(docs), refresh_seconds=3600).search("freight") == []
+    assert names(index, local.get_local_index(str(docs), refresh_seconds=0).search("freight")) == ["ocean.txt"]
+
+
+def test_carried_over_postings_match_a_fresh_index(tmp_path):
+    docs_path = tmp_path / "many"
+    docs_path.mkdir()
+    for i in range(30):
+        (docs_path / f"{i}.txt").write_text(f"report {'market ' * (i % 4)}growth topic{i % 5} doc{i}")
+    index = LocalIndex(str(docs_path), str(tmp_path / "incremental"))
+    index.update()
+    for i in range(0, 30, 3):
+        (docs_path / f"{i}.txt").unlink()
+    (docs_path / "new.txt").write_text("market growth topic1 newcomer")
+    assert index.update() == {"added": 1, "updated": 0, "removed": 10, "unchanged": 20}
+
+    fresh = LocalIndex(str(docs_path), str(tmp_path / "fresh"))
+    fresh.update()
+    assert sorted(doc[0] for doc in index.docs) == sorted(doc[0] for doc in fresh.docs)
+    assert set(index.vocab) == set(fresh.vocab)
+    for term in fresh.vocab:
+        postings = {(index.docs[doc_id][0], tf) for doc_id, tf in zip(*[iter(index.postings(term))] * 2)}
+        assert postings == {(fresh.docs[doc_id][0], tf) for doc_id, tf in zip(*[iter(fresh.postings(term))] * 2)}
+    assert names(index, index.search("newcomer")) == ["new.txt"]
+
+
+def test_searches_run_while_the_next_index_is_written(docs, monkeypatch):
+    index = LocalIndex(str(docs))
+    index.update()
+    (docs / "ocean.txt").write_text("Ocean freight rates.")
+    write_files = index._write_files
+
+    def searching_write_files(*args):
+        # Another thread searches the current index while the new files are written
+        results = []
+        thread = threading.Thread(target=lambda: results.append(index.search("cloud")))
+        thread.start()
+        thread.join(timeout=5)
+        assert results and names(index, results[0])[0] == "cloud.txt"
+        write_files(*args)
+
+    monkeypatch.setattr(index, "_write_files", searching_write_files)
+    index.update()
+    assert names(index, index.search("freight")) == ["ocean.txt"]
+
+
+def test_the_index_cache_is_not_locked_during_updates(docs, monkeypatch):
+    from gpt_researcher.retrievers.local import local
+
+    monkeypatch.setattr(local, "_indexes", {})
+    locked = []
+    update = LocalIndex.update
+
+    def checked_update(self):
+        locked.append(local._indexes_lock.locked())
+        return update(self)
+
+    monkeypatch.setattr(LocalIndex, "update", checked_update)
+    local.get_local_index(str(docs), refresh_seconds=0)
+    local.get_local_index(str(docs), refresh_seconds=0)
+    assert locked == [False, False]
@@ -0,0 +1,76 @@
+import time
+import asyncio
+import sqlite3
+
+from gpt_researcher.memory import LocalMemory
+from gpt_researcher.memory import local
+
+URL = "https://example.com/cloud"
+CONTENT = "Cloud spending grew 20% in 2023, driven by AI workloads."
+ROLE = "You are a seasoned finance analyst AI assistant."
+
+
+def test_summaries_are_reused_for_similar_sub_queries_with_the_same_role(tmp_path):
+    memory = LocalMemory(str(tmp_path / "memory.sqlite3"))
+
+    async def scenario():
+        await memory.add(URL, CONTENT, "cloud market growth drivers", ROLE, "AI drives cloud growth")
+        return (await memory.lookup(URL, CONTENT, "drivers of cloud market growth", ROLE, 0.7),
+                await memory.lookup(URL, CONTENT, "cloud security incidents", ROLE, 0.7),
+                await memory.lookup(URL, CONTENT + " More.", "cloud market growth drivers", ROLE, 0.7),
+                await memory.lookup(URL, CONTENT, "cloud market growth drivers", "You are a travel guide.", 0.7))
+
+    assert asyncio.run(scenario()) == ("AI drives cloud growth", None, None, None)
+    assert memory.stats == {"hits": 1, "misses": 3}
+
+
+def test_memory_persists_across_instances(tmp_path):
+    path = str(tmp_path / "memory.sqlite3")
+    asyncio.run(LocalMemory(path).add(URL, CONTENT, "cloud market growth", ROLE, "summary"))
+    assert asyncio.run(LocalMemory(path).lookup(URL, CONTENT, "cloud market growth", ROLE, 0.7)) == "summary"
+
+
+def test_records_beyond_the_bounds_are_pruned_periodically(tmp_path, monkeypatch):
+    monkeypatch.setattr(local, "PRUNE_INTERVAL", 5)
+    memory = LocalMemory(str(tmp_path / "memory.sqlite3"), max_records=3)
+
+    def count():
+        return memory.connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    async def scenario():
+        for i in range(4):
+            await memory.add(URL, f"{CONTENT} {i}", "cloud market growth", ROLE, f"summary {i}")
+        assert count() == 4
+        await memory.add(URL, f"{CONTENT} 4", "cloud market growth", ROLE, "summary 4")
+        assert count() == 3
+        # The least recently used records were evicted
+        assert await memory.lookup(URL, f"{CONTENT} 0", "cloud market growth", ROLE, 0.7) is None
+        assert await memory.lookup(URL, f"{CONTENT} 4", "cloud market growth", ROLE, 0.7) == "summary 4"
+
+    asyncio.run(scenario())
+
+
+def test_expired_records_are_not_reused(tmp_path):
+    memory = LocalMemory(str(tmp_path / "memory.sqlite3"), max_age_days=1)
+
+    async def scenario():
+        await memory.add(URL, CONTENT, "cloud market growth", ROLE, "summary")
+        memory.connection.execute("UPDATE summaries SET created = ?", (time.time() - 2 * 24 * 3600,))
+        return await memory.lookup(URL, CONTENT, "cloud market growth", ROLE, 0.7)
+
+    assert asyncio.run(scenario()) is None
+    memory.prune()
+    assert memory.connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0] == 0
+
+
+def test_databases_without_the_role_column_are_migrated(tmp_path):
+    path = str(tmp_path / "memory.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE summaries (id INTEGER PRIMARY KEY, url TEXT NOT NULL, content_hash TEXT "
+                       "NOT NULL, sub_query TEXT NOT NULL, summary TEXT NOT NULL, created REAL NOT NULL, "
+                       "last_used REAL NOT NULL)")
+    connection.commit()
+    connection.close()
+    memory = LocalMemory(path)
+    asyncio.run(memory.add(URL, CONTENT, "cloud market growth", ROLE, "summary"))
+    assert asyncio.run(memory.lookup(URL, CONTENT, "cloud market growth", ROLE, 0.7)) == "summary"
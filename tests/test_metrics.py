@@ -0,0 +1,65 @@
+import asyncio
+
+from gpt_researcher.utils import metrics
+from gpt_researcher.utils.metrics import Registry
+
+
+def test_counters_render_in_the_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter("test_requests_total", "Requests by outcome", ("outcome",))
+    requests.inc(outcome="success")
+    requests.inc(2, outcome="success")
+    requests.inc(0.5, outcome='say "hi"\n')
+    assert registry.render() == (
+        "# HELP test_requests_total Requests by outcome\n"
+        "# TYPE test_requests_total counter\n"
+        'test_requests_total{outcome="success"} 3\n'
+        'test_requests_total{outcome="say \\"hi\\"\\n"} 0.5\n')
+
+
+def test_gauges_can_be_read_from_a_callback():
+    registry = Registry()
+    active = registry.gauge("test_active", "Active runs")
+    active.inc()
+    active.inc()
+    active.dec()
+    depth = registry.gauge("test_depth", "Queue depth", callback=lambda: 7)
+    assert "test_active 1\n" in registry.render()
+    assert "test_depth 7\n" in registry.render()
+    assert depth.samples() == [("test_depth", 7)]
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("test_seconds", "Latency", ("stage",), (0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, stage="search")
+    lines = registry.render().splitlines()
+    assert lines[2:] == ['test_seconds_bucket{stage="search",le="0.1"} 1',
+                         'test_seconds_bucket{stage="search",le="1"} 3',
+                         'test_seconds_bucket{stage="search",le="+Inf"} 4',
+                         'test_seconds_sum{stage="search"} 4.05',
+                         'test_seconds_count{stage="search"} 4']
+
+
+def test_label_sets_beyond_the_bound_are_folded(monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_LABEL_SETS", 2)
+    counter = Registry().counter("test_urls_total", "Urls", ("url",))
+    for url in ("a", "b", "c", "d"):
+        counter.inc(url=url)
+    assert counter.values == {("a",): 1, ("b",): 1, ("other",): 2}
+
+
+def test_event_loop_lag_is_observed(monkeypatch):
+    histogram = Registry().histogram("test_lag_seconds", "Lag", (), (0.01, 0.1))
+    monkeypatch.setattr(metrics, "EVENT_LOOP_LAG_SECONDS", histogram)
+
+    async def scenario():
+        monitor = asyncio.create_task(metrics.monitor_event_loop_lag(0.01))
+        await asyncio.sleep(0.05)
+        monitor.cancel()
+
+    asyncio.run(scenario())
+    counts, total = histogram.values[()]
+    assert sum(counts) >= 2
+    assert total >= 0
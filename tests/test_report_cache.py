@@ -0,0 +1,93 @@
+import asyncio
+
+from gpt_researcher.utils.metrics import REPORT_CACHE_WAITING
+from gpt_researcher.utils.report_cache import ReportCache
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send_json(self, message):
+        self.messages.append(message)
+
+
+def research(report, partial=False, started=None, release=None):
+    async def run(stream):
+        if started is not None:
+            started.append(stream)
+        if release is not None:
+            await release.wait()
+        await stream.send_json({"type": "report", "output": report})
+        return report, partial
+    return run
+
+
+def test_serves_finished_reports_from_the_cache():
+    async def scenario():
+        cache, runs = ReportCache(ttl=60), []
+        assert await cache.run("k", FakeWebSocket(), research("report", started=runs)) == "report"
+        websocket = FakeWebSocket()
+        assert await cache.run("k", websocket, research("other", started=runs)) == "report"
+        assert len(runs) == 1
+        assert {"type": "report", "output": "report"} in websocket.messages
+        assert cache.stats == {"hits": 1, "coalesced": 0, "misses": 1}
+
+    asyncio.run(scenario())
+
+
+def test_does_not_cache_partial_reports():
+    async def scenario():
+        cache, runs = ReportCache(ttl=60), []
+        assert await cache.run("k", FakeWebSocket(), research("partial", partial=True, started=runs)) == "partial"
+        assert await cache.run("k", FakeWebSocket(), research("full", started=runs)) == "full"
+        assert len(runs) == 2
+        assert cache.get("k")[0] == "full"
+
+    asyncio.run(scenario())
+
+
+def test_coalesces_identical_requests_in_flight():
+    async def scenario():
+        cache, runs, release = ReportCache(ttl=0), [], asyncio.Event()
+        first = asyncio.create_task(cache.run("k", FakeWebSocket(), research("report", started=runs,
+                                                                               release=release)))
+        await asyncio.sleep(0)
+        second_websocket = FakeWebSocket()
+        second = asyncio.create_task(cache.run("k", second_websocket, research("other", started=runs)))
+        await asyncio.sleep(0)
+        assert REPORT_CACHE_WAITING.samples() == [("gpt_researcher_report_cache_waiting", 1)]
+        release.set()
+        assert await asyncio.gather(first, second) == ["report", "report"]
+        assert REPORT_CACHE_WAITING.samples() == [("gpt_researcher_report_cache_waiting", 0)]
+        assert len(runs) == 1
+        assert {"type": "report", "output": "report"} in second_websocket.messages
+        assert cache.stats["coalesced"] == 1
+        assert cache.in_flight == {}
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_request_does_not_release_a_newer_run():
+    async def scenario():
+        cache, first_release, second_release = ReportCache(ttl=0), asyncio.Event(), asyncio.Event()
+        waiter = asyncio.create_task(cache.run("k", FakeWebSocket(), research("first", release=first_release)))
+        await asyncio.sleep(0)
+        first_task, _ = cache.in_flight["k"]
+        # The client disconnects while the shielded run goes on
+        waiter.cancel()
+        await asyncio.sleep(0)
+        # The key is taken over by a newer run before the first one finishes
+        cache.in_flight.pop("k")
+        newer = asyncio.create_task(cache.run("k", FakeWebSocket(), research("second", release=second_release)))
+        await asyncio.sleep(0)
+        newer_entry = cache.in_flight["k"]
+        first_release.set()
+        await first_task
+        await asyncio.sleep(0)
+        assert cache.in_flight.get("k") is newer_entry
+        second_release.set()
+        assert await newer == "second"
+        assert cache.in_flight == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+import os
+import time
+import pytest
+
+from gpt_researcher.config import Config
+from gpt_researcher.master.functions import get_local_docs_path
+from gpt_researcher.scraper import Scraper
+
+TEXT = "Local documents are read from the documents directory of the local retriever only. " * 3
+
+
+@pytest.fixture
+def docs(tmp_path):
+    docs_path = tmp_path / "docs"
+    docs_path.mkdir()
+    (docs_path / "notes.txt").write_text(TEXT)
+    (tmp_path / "secret.txt").write_text(TEXT)
+    return docs_path
+
+
+def test_reads_documents_under_the_docs_path(docs):
+    scraper = Scraper([], "test", str(docs))
+    assert scraper.scrape_link((docs / "notes.txt").as_uri(), None) == TEXT
+
+
+@pytest.mark.parametrize("link", ["file:///etc/passwd", "{docs}/../secret.txt", "{docs}/.gptr_index/meta.json"])
+def test_rejects_files_outside_the_docs_path(docs, link):
+    scraper = Scraper([], "test", str(docs))
+    with pytest.raises(Exception, match="rejected"):
+        scraper.scrape_link(link.replace("{docs}", docs.as_uri()), None)
+
+
+def test_rejects_file_links_without_the_local_retriever(docs):
+    link = (docs / "notes.txt").as_uri()
+    assert Scraper([link], "test").run() == []
+
+
+def test_local_docs_path_only_for_the_local_retriever(monkeypatch, docs):
+    monkeypatch.setenv("LOCAL_DOCS_PATH", str(docs))
+    cfg = Config()
+    assert get_local_docs_path(cfg) is None
+    cfg.retriever = "local"
+    assert get_local_docs_path(cfg) == str(docs)
+
+
+def fake_extract(delays, fetched):
+    def extract(link, session):
+        fetched.append(link)
+        time.sleep(delays.get(link, 0.01))
+        return {"url": link, "raw_content": None if link.startswith("bad") else f"content of {link}"}
+    return extract
+
+
+def test_run_until_fetches_in_rank_order_within_the_window(monkeypatch):
+    links = [f"url{i}" for i in range(10)]
+    fetched = []
+    scraper = Scraper(links, "test")
+    monkeypatch.setattr(scraper, "extract_data_from_link", fake_extract({}, fetched))
+    seen = []
+
+    def is_enough(content):
+        seen.append(content["url"])
+        return len(seen) == 3
+
+    results, stats = scraper.run_until(is_enough, window=2)
+    assert [content["url"] for content in results] == ["url0", "url1", "url2"]
+    assert seen == ["url0", "url1", "url2"]
+    # Requests in the window run concurrently, so they may start in any order
+    assert sorted(fetched) == links[:len(fetched)] and len(fetched) <= 4
+    assert stats["skipped"] == 10 - len(fetched)
+    assert stats["fetched"] + stats["cancelled"] == len(fetched)
+
+
+def test_run_until_checks_the_budget_in_rank_order(monkeypatch):
+    links = ["slow", "bad", "fast"]
+    scraper = Scraper(links, "test")
+    monkeypatch.setattr(scraper, "extract_data_from_link", fake_extract({"slow": 0.2}, []))
+    seen = []
+    results, stats = scraper.run_until(lambda content: seen.append(content["url"]), window=3)
+    assert seen == ["slow", "fast"]
+    assert [content["url"] for content in results] == ["slow", "fast"]
+    assert stats == {"fetched": 3, "skipped": 0, "cancelled": 0}
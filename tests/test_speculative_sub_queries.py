@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+
+from gpt_researcher import GPTResearcher
+from gpt_researcher.master import agent as agent_module
+from gpt_researcher.master.functions import DEFAULT_AGENT_ROLE_PROMPT, role_similarity
+
+FINANCE_ROLE = ("You are a seasoned finance analyst AI assistant. Your primary goal is to compose comprehensive, "
+                "astute, impartial, and methodically arranged financial reports based on provided data and trends.")
+TRAVEL_ROLE = ("You are a world-travelled AI tour guide assistant. Your main purpose is to draft engaging, "
+               "insightful, unbiased, and well-structured travel reports on given locations, including history, "
+               "attractions, and cultural insights.")
+
+
+def test_role_prompts_are_compared_without_their_boilerplate():
+    assert role_similarity("Default Agent", DEFAULT_AGENT_ROLE_PROMPT) == 1.0
+    assert role_similarity("💰 Finance Agent", FINANCE_ROLE) == 0.0
+    assert role_similarity("🌍 Travel Agent", TRAVEL_ROLE) == 0.0
+    reworded = ("You are an AI critical thinker research assistant. Your main goal is to write objective, "
+                "critically acclaimed reports on given text.")
+    assert role_similarity("🧠 Research Agent", reworded) == 1.0
+
+
+@pytest.mark.parametrize("agent, role, regenerated", [
+    ("Default Agent", DEFAULT_AGENT_ROLE_PROMPT, False),
+    ("💰 Finance Agent", FINANCE_ROLE, True),
+])
+def test_a_different_role_regenerates_the_sub_queries(monkeypatch, agent, role, regenerated):
+    roles = []
+
+    async def choose_agent(query, cfg):
+        return agent, role
+
+    async def get_sub_queries(query, agent_role_prompt, cfg):
+        roles.append(agent_role_prompt)
+        return [f"{query} for {len(roles)}"]
+
+    async def stream_output(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(agent_module, "choose_agent", choose_agent)
+    monkeypatch.setattr(agent_module, "get_sub_queries", get_sub_queries)
+    monkeypatch.setattr(agent_module, "stream_output", stream_output)
+    researcher = GPTResearcher("stock market outlook", "research_report")
+    sub_queries = asyncio.run(researcher.choose_agent_with_speculative_sub_queries())
+    assert roles == ([DEFAULT_AGENT_ROLE_PROMPT, role] if regenerated else [DEFAULT_AGENT_ROLE_PROMPT])
+    assert sub_queries == [f"stock market outlook for {len(roles)}"]
@@ -0,0 +1,65 @@
+import time
+import asyncio
+import pytest
+
+from gpt_researcher.utils import llm
+
+
+def blocking_stream(chunks, delay, read):
+    def create(**kwargs):
+        for content in chunks:
+            time.sleep(delay)
+            read.append(content)
+            if content is None:
+                raise ConnectionError("stream interrupted")
+            yield {"choices": [{"delta": {"content": content}}]}
+    return create
+
+
+def test_blocking_streams_do_not_block_the_event_loop(monkeypatch):
+    read = []
+    monkeypatch.setattr(llm.lc_openai.ChatCompletion, "create", blocking_stream(["a", "b", "c", "d"], 0.05, read))
+
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        chunks = [chunk async for chunk in llm.stream_chunks("gpt-4o", [], 0, None, "openai")]
+        ticker.cancel()
+        return chunks, ticks
+
+    chunks, ticks = asyncio.run(scenario())
+    assert chunks == ["a", "b", "c", "d"]
+    # The loop kept running while the stream was read
+    assert ticks >= 10
+
+
+def test_stream_errors_reach_the_consumer(monkeypatch):
+    monkeypatch.setattr(llm.lc_openai.ChatCompletion, "create", blocking_stream(["a", None], 0, []))
+
+    async def scenario():
+        return [chunk async for chunk in llm.stream_chunks("gpt-4o", [], 0, None, "openai")]
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(scenario())
+
+
+def test_the_reader_stops_once_the_consumer_stops(monkeypatch):
+    read = []
+    monkeypatch.setattr(llm.lc_openai.ChatCompletion, "create", blocking_stream(list("abcdefghij"), 0.02, read))
+
+    async def scenario():
+        chunks = llm.stream_chunks("gpt-4o", [], 0, None, "openai")
+        first = await anext(chunks)
+        await chunks.aclose()
+        await asyncio.sleep(0.2)
+        return first
+
+    assert asyncio.run(scenario()) == "a"
+    assert len(read) < 5
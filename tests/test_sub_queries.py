@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+
+from gpt_researcher import GPTResearcher
+from gpt_researcher.config import Config
+from gpt_researcher.master import agent as agent_module
+from gpt_researcher.master.functions import merge_duplicate_sub_queries
+from gpt_researcher.utils.budget import ResearchBudget
+
+
+def test_merging_is_off_by_default():
+    assert not Config().sub_query_similarity_threshold
+
+
+@pytest.mark.parametrize("query, first, second", [
+    ("covid vaccine side effects", "covid vaccine side effects in children", "covid vaccine side effects in adults"),
+    ("python release dates", "python 3.11 release date", "python 3.12 release date"),
+])
+def test_distinct_angles_sharing_a_wording_are_kept(query, first, second):
+    unique, duplicates = merge_duplicate_sub_queries(query, [first, second], 0.6)
+    assert unique == [query, first, second]
+    assert duplicates == []
+
+
+def test_angles_of_the_original_query_are_kept():
+    query = "What drives the growth of the cloud computing market?"
+    sub_queries = [f"{query} history", f"{query} risks", f"{query} expert opinions"]
+    unique, duplicates = merge_duplicate_sub_queries(query, sub_queries, 0.6)
+    assert unique == [query] + sub_queries
+
+
+def test_duplicates_are_merged():
+    query = "impact of AI on the labor market"
+    sub_queries = ["AI labor market risks", "labor market risk of AI", "AI in the labor market",
+                   "AI labor market wages"]
+    unique, duplicates = merge_duplicate_sub_queries(query, sub_queries, 0.6)
+    assert unique == [query, "AI labor market risks", "AI labor market wages"]
+    assert duplicates == ["labor market risk of AI", "AI in the labor market"]
+
+
+def test_adaptive_research_runs_the_original_query_first_and_estimates_saved_calls(monkeypatch):
+    researcher = GPTResearcher("impact of AI on the labor market", "research_report")
+    researcher.cfg.adaptive_research = True
+    researcher.budget = ResearchBudget(researcher.cfg.deadline, researcher.cfg.token_budget,
+                                       researcher.cfg.budget_split, researcher.cfg.cost_budget)
+    run = []
+
+    async def run_sub_query(sub_query):
+        run.append(sub_query)
+        for _ in range(3):
+            researcher.usage.record("summarize", "gpt-4o-mini", 100, 10)
+        # Every sub-query finds the same two sources
+        return [{"url": f"https://example.com/{i}", "summary": "AI automates routine tasks in many jobs"}
+                for i in range(2)]
+
+    async def stream_output(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(researcher, "run_sub_query", run_sub_query)
+    monkeypatch.setattr(agent_module, "stream_output", stream_output)
+    sub_queries = asyncio.run(researcher.deduplicate_sub_queries(["AI labor market risks", "AI labor market wages",
+                                                                  "AI labor market policy"]))
+    asyncio.run(researcher.run_sub_queries(sub_queries))
+    assert run == ["impact of AI on the labor market", "AI labor market risks"]
+    assert researcher.adaptive_stats["skipped_sub_queries"] == ["AI labor market wages", "AI labor market policy"]
+    assert researcher.adaptive_stats["saved_scrapes_estimate"] == 4
+    assert researcher.adaptive_stats["saved_llm_calls_estimate"] == 6
+
+
+def test_sub_queries_without_content_do_not_stop_adaptive_research(monkeypatch):
+    researcher = GPTResearcher("impact of AI on the labor market", "research_report")
+    researcher.cfg.adaptive_research = True
+    researcher.budget = ResearchBudget(researcher.cfg.deadline, researcher.cfg.token_budget,
+                                       researcher.cfg.budget_split, researcher.cfg.cost_budget)
+    run = []
+
+    async def run_sub_query(sub_query):
+        run.append(sub_query)
+        # The original query finds nothing, the sub-queries find distinct content
+        if sub_query == researcher.query:
+            return []
+        return [{"url": f"https://example.com/{len(run)}", "summary": f"{sub_query} findings number {len(run)}"}]
+
+    async def stream_output(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(researcher, "run_sub_query", run_sub_query)
+    monkeypatch.setattr(agent_module, "stream_output", stream_output)
+    sub_queries = [researcher.query, "AI labor market risks", "AI labor market wages", "AI labor market policy"]
+    asyncio.run(researcher.run_sub_queries(sub_queries))
+    assert run == sub_queries
+    assert researcher.adaptive_stats["skipped_sub_queries"] == []
+    # Only sub-queries that added content are sampled
+    assert len(researcher.adaptive_stats["novelty"]) == 2
@@ -0,0 +1,32 @@
+import pytest
+
+from gpt_researcher.utils import tokens
+
+
+@pytest.fixture(autouse=True)
+def clear_encodings():
+    tokens._get_encoding.cache_clear()
+    yield
+    tokens._get_encoding.cache_clear()
+
+
+def test_estimates_tokens_when_the_encoding_cannot_be_downloaded(monkeypatch):
+    calls = []
+
+    def offline(*args, **kwargs):
+        calls.append(args)
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(tokens.tiktoken, "get_encoding", offline)
+    monkeypatch.setattr(tokens.tiktoken, "encoding_for_model", offline)
+    assert tokens.count_tokens("a" * 10) == 3
+    assert tokens.count_tokens("b" * 8, "gpt-4") == 2
+    assert tokens.count_tokens("c" * 4) == 1
+    # Failed loads are cached rather than retried on every call
+    assert len(calls) == 2
+
+
+def test_estimates_tokens_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(tokens, "tiktoken", None)
+    assert tokens.count_tokens("") == 0
+    assert tokens.count_tokens("abcde") == 2
@@ -0,0 +1,74 @@
+import pytest
+
+from gpt_researcher.config import Config
+from gpt_researcher.utils.urls import (SeenUrls, BloomSeenUrls, canonicalize_url, get_seen_urls,
+                                       restore_seen_urls)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("http://Example.com/a", "https://example.com/a"),
+    ("https://www.example.com/a/", "https://example.com/a"),
+    ("https://m.example.com/a", "https://example.com/a"),
+    ("https://example.com:443/a//b/./c#section", "https://example.com/a/b/c"),
+    ("https://example.com/a?utm_source=x&b=2&a=1&fbclid=y", "https://example.com/a?a=1&b=2"),
+    ("https://www-example-com.cdn.ampproject.org/c/s/www.example.com/news/story", "https://example.com/news/story"),
+    ("https://example-com.cdn.ampproject.org/v/example.com/news/story?usqp=mq331AQ", "https://example.com/news/story"),
+    ("https://en.m.wikipedia.org/wiki/Cloud", "https://en.wikipedia.org/wiki/Cloud"),
+    ("https://www.mobile.example.co.uk/a", "https://example.co.uk/a"),
+    ("https://www.google.com/amp/s/example.com/news/story", "https://example.com/news/story"),
+    ("https://www.google.co.uk/amp/www.example.com/x", "http://example.com/x"),
+    ("https://example.com/caf%c3%a9/%7Euser", "https://example.com/café/~user"),
+    ("https://example.com/a%2fb", "https://example.com/a%2Fb"),
+])
+def test_variants_of_a_page_are_equal(first, second):
+    assert canonicalize_url(first) == canonicalize_url(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    # "ref" and "amp" select content on many sites
+    ("https://github.com/org/repo/blob/x?ref=main", "https://github.com/org/repo/blob/x?ref=dev"),
+    ("https://example.com/search?amp=1", "https://example.com/search"),
+    # AMP paths and hosts are only stripped on AMP caches
+    ("https://example.com/guitar/amp", "https://example.com/guitar"),
+    ("https://amp.example.com/a", "https://example.com/a"),
+    ("https://example.com/a", "http://example.com:8080/a"),
+    # An escaped slash is part of a path segment, not a separator
+    ("https://example.com/a%2Fb", "https://example.com/a/b"),
+    ("https://example.com/a%3Fb", "https://example.com/a?b"),
+    # "m" is only a mobile label in front of the registered domain
+    ("https://m.co.uk/a", "https://co.uk/a"),
+    ("https://www.google.com/search/amp/s/example.com/x", "https://example.com/x"),
+])
+def test_distinct_pages_are_not_equal(first, second):
+    assert canonicalize_url(first) != canonicalize_url(second)
+
+
+@pytest.mark.parametrize("url, canonical", [
+    ("https://[::1]:8080/x", "https://[::1]:8080/x"),
+    ("http://[2001:DB8::1]/a/", "https://[2001:db8::1]/a"),
+])
+def test_ipv6_hosts_keep_their_brackets(url, canonical):
+    assert canonicalize_url(url) == canonical
+
+
+def test_non_web_urls_are_left_alone():
+    assert canonicalize_url("mailto:someone@example.com") == "mailto:someone@example.com"
+    assert canonicalize_url("not a url") == "not a url"
+
+
+@pytest.mark.parametrize("seen_urls", [SeenUrls(), BloomSeenUrls(capacity=1000)])
+def test_seen_urls_match_variants_and_survive_a_checkpoint(seen_urls):
+    seen_urls.add("http://www.example.com/a?utm_source=x")
+    assert "https://example.com/a" in seen_urls
+    assert "https://example.com/b" not in seen_urls
+    restored = restore_seen_urls(seen_urls.to_state())
+    assert type(restored) is type(seen_urls)
+    assert "https://example.com/a" in restored
+    assert len(restored) == 1
+
+
+def test_the_seen_url_backend_is_configurable():
+    cfg = Config()
+    assert isinstance(get_seen_urls(cfg), SeenUrls)
+    cfg.seen_urls_backend = "bloom"
+    assert isinstance(get_seen_urls(cfg), BloomSeenUrls)
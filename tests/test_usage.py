@@ -0,0 +1,41 @@
+import pytest
+
+from gpt_researcher.utils import llm
+from gpt_researcher.utils.metrics import LLM_COST, LLM_TOKENS
+from gpt_researcher.utils.usage import UsageLedger, model_cost, set_current_usage, reset_current_usage
+
+
+def test_costs_discount_cached_prompt_tokens():
+    assert model_cost("gpt-4o", 1000, 1000) == pytest.approx(0.02)
+    assert model_cost("gpt-4o", 1000, 0, cached_tokens=1000) == pytest.approx(0.0025)
+    assert model_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_totals_are_marked_estimated_when_a_call_had_no_reported_usage():
+    ledger = UsageLedger()
+    ledger.record("summarize", "gpt-4o-mini", 1000, 100)
+    totals = ledger.totals()
+    assert totals["total"]["estimated"] is False
+    ledger.record("report", "gpt-4o", 2000, 500, estimated=True)
+    totals = ledger.totals()
+    assert totals["call_types"]["summarize"]["estimated"] is False
+    assert totals["call_types"]["report"]["estimated"] is True
+    assert totals["total"]["estimated"] is True
+    assert totals["total"]["estimated_calls"] == 1
+    assert totals["total"]["calls"] == 2
+
+
+def test_metrics_tell_reported_from_estimated_tokens():
+    def tokens(usage):
+        return LLM_TOKENS.values.get(("test-model", "completion", usage), 0)
+
+    reported, estimated = tokens("reported"), tokens("estimated")
+    token = set_current_usage(UsageLedger())
+    try:
+        llm.record_usage("summarize", "test-model", 10, "ignored", {"prompt_tokens": 12, "completion_tokens": 7})
+        llm.record_usage("report", "test-model", 10, "one two three four", None)
+    finally:
+        reset_current_usage(token)
+    assert tokens("reported") - reported == 7
+    assert tokens("estimated") - estimated == llm.count_tokens("one two three four", "test-model")
+    assert ("test-model", "estimated") in LLM_COST.values